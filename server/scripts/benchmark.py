@@ -0,0 +1,404 @@
+"""
+Load-test and benchmark harness.
+
+Drives the generation endpoints and reports throughput, latency percentiles,
+time to first token (streams), server CPU and RSS, and the framework overhead
+per request: time spent in the routers, services, models and serialization,
+i.e. the server-side request duration minus the time spent waiting on the
+upstream, taken from the server's own metrics.
+
+By default it starts a server with the fake providers (see "Offline Mode" in the
+README) in a temporary working directory, so runs are reproducible and offline.
+
+Requests shed by admission control (503) are reported as their own series
+rather than as errors: they show the server protecting itself, not failing.
+The image endpoint is driven with its own, lower load (--image-concurrency,
+--image-rate), sized to the server's default image concurrency cap.
+
+Usage (from the server directory):
+    python scripts/benchmark.py                                    # all endpoints, closed loop
+    python scripts/benchmark.py -e generate-stream --mode open --rate 50 --duration 30
+    python scripts/benchmark.py --ttft 0 --tokens-per-second 100000 --image-latency 0   # framework only
+    python scripts/benchmark.py --url http://localhost:8000 --pid 1234                  # running server
+    python scripts/benchmark.py --output run.json --baseline previous.json
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+import psutil
+
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+API_PREFIX = "/api/v1"
+ENDPOINTS = ("generate", "generate-stream", "generate-image")
+# Upstream operation recorded by the server for each endpoint (adgen_upstream_duration_seconds)
+UPSTREAM_OPERATIONS = {"generate": "chat", "generate-stream": "chat_stream", "generate-image": "generate_image"}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    """p50/p95/p99 and mean in milliseconds (nearest rank)"""
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None}
+    ordered = sorted(values)
+    pick = lambda q: round(ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000, 2)
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "mean": round(sum(ordered) / len(ordered) * 1000, 2)}
+
+
+def _metric_total(text: str, name: str, label: str) -> float:
+    """Sum of all samples of `name` whose labels contain `label` (e.g. 'endpoint="generate"')"""
+    total = 0.0
+    for line in text.splitlines():
+        if line.startswith(name + "{") and label in line:
+            total += float(line.rsplit(" ", 1)[1])
+    return total
+
+
+def _request_body(endpoint: str, product_id: str) -> Dict[str, Any]:
+    """A unique product per request, so response/image caches and request coalescing never kick in"""
+    name = f"Benchmark Product {product_id}"
+    if endpoint == "generate-image":
+        return {"product_name": name, "brand_name": "Bench", "description": "A product used for benchmarking"}
+    return {
+        "product_name": name,
+        "brand_name": "Bench",
+        "category": ["benchmark"],
+        "description": "A product used for benchmarking",
+        "price": 19.99,
+        "ad_type": "social_media",
+        "ad_tone": "friendly",
+        "bypass_cache": True,
+    }
+
+
+class ServerProcess:
+    """Server under test: either started here with fake upstreams or an existing process"""
+
+    def __init__(self, url: Optional[str], pid: Optional[int], env: Dict[str, str]) -> None:
+        self.url = url
+        self.pid = pid
+        self.env = env
+        self._popen: Optional[subprocess.Popen] = None
+        self._workdir: Optional[tempfile.TemporaryDirectory] = None
+        self._log = None
+
+    def start(self) -> None:
+        if self.url:
+            return
+        port = _free_port()
+        self._workdir = tempfile.TemporaryDirectory(prefix="adgen-bench-")
+        # Server logs go to a file; a pipe nobody reads would block the server once full
+        self._log = open(Path(self._workdir.name) / "server.log", "w+b")
+        self._popen = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "src.main:app", "--app-dir", str(SERVER_DIR),
+             "--port", str(port), "--log-level", "warning", "--no-access-log"],
+            cwd=self._workdir.name,  # logs, uploads and SQLite files stay out of the tree
+            env={**os.environ, **self.env},
+            stdout=self._log,
+            stderr=subprocess.STDOUT,
+        )
+        self.url = f"http://127.0.0.1:{port}"
+        self.pid = self._popen.pid
+
+    async def wait_ready(self, client: httpx.AsyncClient, timeout: float = 60.0) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._popen is not None and self._popen.poll() is not None:
+                self._log.seek(0)
+                raise RuntimeError(f"Server exited during startup:\n{self._log.read().decode()[-2000:]}")
+            try:
+                if (await client.get(f"{self.url}/readiness")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+        raise RuntimeError(f"Server at {self.url} not ready after {timeout}s")
+
+    def processes(self) -> List[psutil.Process]:
+        if self.pid is None:
+            return []
+        process = psutil.Process(self.pid)
+        return [process] + process.children(recursive=True)
+
+    def cpu_seconds(self) -> float:
+        return sum(sum(p.cpu_times()[:2]) for p in self.processes())
+
+    def rss(self) -> int:
+        return sum(p.memory_info().rss for p in self.processes())
+
+    def stop(self) -> None:
+        if self._popen is not None:
+            self._popen.terminate()
+            try:
+                self._popen.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self._popen.kill()
+        if self._log is not None:
+            self._log.close()
+        if self._workdir is not None:
+            self._workdir.cleanup()
+
+
+class EndpointRun:
+    """Samples collected while load testing one endpoint"""
+
+    def __init__(self, endpoint: str) -> None:
+        self.endpoint = endpoint
+        self.latencies: List[float] = []
+        self.ttfts: List[float] = []
+        self.statuses: Dict[str, int] = {}
+        self.errors = 0
+        self.shed = 0  # 503 from admission control
+        # Per-run nonce, so warmup, measured runs and earlier runs against --url never share products
+        self.nonce = uuid.uuid4().hex[:12]
+        self._index = 0
+
+    def next_product_id(self) -> str:
+        self._index += 1
+        return f"{self.nonce}-{self._index}"
+
+    def record(self, status: str, ok: bool, latency: float, ttft: Optional[float] = None) -> None:
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status == "503":
+            self.shed += 1
+            return
+        if not ok:
+            self.errors += 1
+            return
+        self.latencies.append(latency)
+        if ttft is not None:
+            self.ttfts.append(ttft)
+
+
+async def _send(client: httpx.AsyncClient, url: str, run: EndpointRun, scheduled: Optional[float] = None) -> None:
+    """
+    Issue one request and record it. In open-loop mode latency is measured from
+    the scheduled send time, so a slow server cannot hide queueing delay.
+    """
+    start = scheduled if scheduled is not None else time.perf_counter()
+    body = _request_body(run.endpoint, run.next_product_id())
+    try:
+        if run.endpoint != "generate-stream":
+            response = await client.post(f"{url}{API_PREFIX}/{run.endpoint}", json=body)
+            run.record(str(response.status_code), response.status_code == 200, time.perf_counter() - start)
+            return
+
+        ttft, ok = None, True
+        async with client.stream("POST", f"{url}{API_PREFIX}/generate-stream", json=body) as response:
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                status = json.loads(line).get("status")
+                if status == "streaming" and ttft is None:
+                    ttft = time.perf_counter() - start
+                elif status == "error":
+                    ok = False
+        status = str(response.status_code) if response.status_code != 200 or ok else "stream_error"
+        run.record(status, ok and response.status_code == 200, time.perf_counter() - start, ttft)
+    except httpx.HTTPError as e:
+        run.record(type(e).__name__, False, time.perf_counter() - start)
+
+
+async def _closed_loop(client: httpx.AsyncClient, url: str, run: EndpointRun, concurrency: int, duration: float) -> None:
+    """`concurrency` workers, each sending its next request as soon as the previous one finished"""
+    deadline = time.perf_counter() + duration
+
+    async def worker() -> None:
+        while time.perf_counter() < deadline:
+            await _send(client, url, run)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def _open_loop(client: httpx.AsyncClient, url: str, run: EndpointRun, rate: float, duration: float) -> None:
+    """Requests arrive at a fixed rate regardless of how fast the server answers"""
+    start = time.perf_counter()
+    tasks = []
+    for i in range(int(rate * duration)):
+        scheduled = start + i / rate
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        tasks.append(asyncio.create_task(_send(client, url, run, scheduled)))
+    await asyncio.gather(*tasks)
+
+
+async def _sample_rss(server: ServerProcess, peak: List[int], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        peak[0] = max(peak[0], server.rss())
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=0.1)
+        except TimeoutError:
+            pass
+
+
+async def bench_endpoint(client: httpx.AsyncClient, server: ServerProcess, endpoint: str, args) -> Dict[str, Any]:
+    warmup = EndpointRun(endpoint)
+    await asyncio.gather(*(_send(client, server.url, warmup) for _ in range(args.warmup_requests)))
+
+    run = EndpointRun(endpoint)
+    metrics_before = (await client.get(f"{server.url}/metrics")).text
+    cpu_before = server.cpu_seconds()
+    client_process = psutil.Process()
+    client_cpu_before = sum(client_process.cpu_times()[:2])
+    peak, stop = [server.rss()], asyncio.Event()
+    sampler = asyncio.create_task(_sample_rss(server, peak, stop))
+
+    image = endpoint == "generate-image"
+    start = time.perf_counter()
+    if args.mode == "open":
+        await _open_loop(client, server.url, run, args.image_rate if image else args.rate, args.duration)
+    else:
+        await _closed_loop(client, server.url, run, args.image_concurrency if image else args.concurrency, args.duration)
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await sampler
+    cpu = server.cpu_seconds() - cpu_before
+    client_cpu = sum(client_process.cpu_times()[:2]) - client_cpu_before
+    metrics_after = (await client.get(f"{server.url}/metrics")).text
+
+    def delta(name: str, label: str) -> float:
+        return _metric_total(metrics_after, name, label) - _metric_total(metrics_before, name, label)
+
+    server_requests = delta("adgen_request_duration_seconds_count", f'endpoint="{endpoint}"')
+    server_time = delta("adgen_request_duration_seconds_sum", f'endpoint="{endpoint}"')
+    upstream_time = delta("adgen_upstream_duration_seconds_sum", f'operation="{UPSTREAM_OPERATIONS[endpoint]}"')
+    total = len(run.latencies) + run.errors + run.shed
+
+    return {
+        "requests": total,
+        "ok": len(run.latencies),
+        "errors": run.errors,
+        "shed": run.shed,
+        "statuses": run.statuses,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(run.latencies) / elapsed, 2),
+        "latency_ms": _percentiles(run.latencies),
+        "ttft_ms": _percentiles(run.ttfts) if endpoint == "generate-stream" else None,
+        # Close to `elapsed_s` means the load generator itself was the bottleneck
+        "client_cpu_s": round(client_cpu, 3),
+        "server": {
+            "cpu_s": round(cpu, 3),
+            "cpu_ms_per_request": round(cpu / total * 1000, 3) if total else None,
+            "rss_peak_mib": round(peak[0] / (1024 * 1024), 1),
+            # Server-side request time not spent waiting on the upstream (includes admission queueing)
+            "framework_overhead_ms": (
+                round((server_time - upstream_time) / server_requests * 1000, 3) if server_requests else None
+            ),
+        },
+    }
+
+
+def _fake_env(args) -> Dict[str, str]:
+    """Server settings for the fake upstreams and an unthrottled server"""
+    return {
+        "LLM_PROVIDER": "fake",
+        "IMAGE_PROVIDER": "fake",
+        "FAKE_LLM_TTFT": str(args.ttft),
+        "FAKE_LLM_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "FAKE_LLM_OUTPUT_TOKENS": str(args.output_tokens),
+        "FAKE_LLM_ERROR_RATE": str(args.error_rate),
+        "FAKE_IMAGE_LATENCY": str(args.image_latency),
+        "FAKE_IMAGE_BYTES": str(args.image_bytes),
+        "FAKE_IMAGE_ERROR_RATE": str(args.error_rate),
+        "FAKE_SEED": str(args.seed),
+        "RATE_LIMIT_ENABLED": "false",
+        "UPLOAD_DIR": "uploads",
+    }
+
+
+def _print_report(results: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    print(f"{'endpoint':<16} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ttft p50':>9} "
+          f"{'errors':>7} {'shed':>6} {'cpu ms/req':>10} {'overhead ms':>11} {'rss MiB':>8}")
+    for endpoint, result in results.items():
+        latency, ttft, server = result["latency_ms"], result["ttft_ms"] or {}, result["server"]
+        fmt = lambda value, width: f"{value:>{width}}" if value is not None else f"{'-':>{width}}"
+        print(f"{endpoint:<16} {result['throughput_rps']:>8} {fmt(latency['p50'], 9)} {fmt(latency['p95'], 9)} "
+              f"{fmt(latency['p99'], 9)} {fmt(ttft.get('p50'), 9)} {result['errors']:>7} {result.get('shed', 0):>6} "
+              f"{fmt(server['cpu_ms_per_request'], 10)} {fmt(server['framework_overhead_ms'], 11)} "
+              f"{server['rss_peak_mib']:>8}")
+        previous = (baseline or {}).get(endpoint)
+        if previous:
+            change = lambda new, old: f"{(new - old) / old * 100:+.1f}%" if new is not None and old else "n/a"
+            print(f"{'  vs baseline':<16} {change(result['throughput_rps'], previous['throughput_rps']):>8} "
+                  f"{change(latency['p50'], previous['latency_ms']['p50']):>9} "
+                  f"{change(latency['p95'], previous['latency_ms']['p95']):>9} "
+                  f"{change(latency['p99'], previous['latency_ms']['p99']):>9}")
+
+
+async def run(args) -> Dict[str, Any]:
+    server = ServerProcess(args.url, args.pid, _fake_env(args))
+    server.start()
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    try:
+        async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+            await server.wait_ready(client)
+            results = {}
+            for endpoint in args.endpoints:
+                print(f"Benchmarking {endpoint} ({args.mode} loop, {args.duration}s)...", file=sys.stderr)
+                results[endpoint] = await bench_endpoint(client, server, endpoint, args)
+    finally:
+        server.stop()
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "baseline")}
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": config,
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the generation endpoints")
+    parser.add_argument("-e", "--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--mode", choices=("closed", "open"), default="closed",
+                        help="closed: fixed concurrency; open: fixed arrival rate")
+    parser.add_argument("-c", "--concurrency", type=int, default=32, help="Workers in closed-loop mode")
+    parser.add_argument("-r", "--rate", type=float, default=20.0, help="Requests per second in open-loop mode")
+    # One image takes --image-latency seconds and the server runs IMAGE_MAX_CONCURRENCY (4) at a time
+    parser.add_argument("--image-concurrency", type=int, default=4, help="Closed-loop workers for generate-image")
+    parser.add_argument("--image-rate", type=float, default=1.5, help="Open-loop requests per second for generate-image")
+    parser.add_argument("-d", "--duration", type=float, default=15.0, help="Seconds per endpoint")
+    parser.add_argument("--warmup-requests", type=int, default=5, help="Unmeasured requests before each endpoint")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Client timeout per request (seconds)")
+    parser.add_argument("--url", help="Benchmark a running server instead of starting one")
+    parser.add_argument("--pid", type=int, help="Server process id, for CPU and RSS when using --url")
+    # Fake upstream behaviour (ignored with --url)
+    parser.add_argument("--ttft", type=float, default=0.3, help="Fake LLM time to first token (seconds)")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--output-tokens", type=int, default=120)
+    parser.add_argument("--image-latency", type=float, default=2.0, help="Fake image latency (seconds)")
+    parser.add_argument("--image-bytes", type=int, default=256 * 1024)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fake upstream error rate")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("-o", "--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Previous JSON results to compare against")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    baseline = json.loads(Path(args.baseline).read_text())["results"] if args.baseline else None
+    _print_report(report["results"], baseline)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"Results written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
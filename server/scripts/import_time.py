@@ -0,0 +1,82 @@
+"""
+Import-time benchmark.
+
+Imports a module in a fresh interpreter with `python -X importtime` and reports
+the total import time, the resident memory it adds and the most expensive
+modules by cumulative time.
+
+Usage (from the server directory):
+    python scripts/import_time.py                    # import src.main
+    python scripts/import_time.py -m src.cli -n 30
+    ENABLE_IMAGE_ROUTER=false python scripts/import_time.py
+"""
+import os
+import sys
+import argparse
+import subprocess
+from pathlib import Path
+from typing import List, Tuple
+
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+
+RSS_SNIPPET = """
+import os, psutil
+process = psutil.Process(os.getpid())
+before = process.memory_info().rss
+import {module}
+print(process.memory_info().rss - before)
+"""
+
+
+def _run(args: List[str]) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=SERVER_DIR,
+        env=os.environ.copy(),
+        capture_output=True,
+        text=True,
+    )
+
+
+def measure_import_times(module: str) -> List[Tuple[str, int, int]]:
+    """Return (module, self_us, cumulative_us) for every module imported by `module`"""
+    result = _run(["-X", "importtime", "-c", f"import {module}"])
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure_rss(module: str) -> int:
+    """Return the resident memory (bytes) added by importing `module`"""
+    result = _run(["-c", RSS_SNIPPET.format(module=module)])
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    return int(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Report per-module import cost")
+    parser.add_argument("-m", "--module", default="src.main", help="Module to import (default: src.main)")
+    parser.add_argument("-n", "--top", type=int, default=20, help="Number of modules to list")
+    args = parser.parse_args()
+
+    rows = measure_import_times(args.module)
+    total = next((cumulative for name, _, cumulative in rows if name == args.module), 0)
+    rss = measure_rss(args.module)
+
+    print(f"import {args.module}: {total / 1000:.1f} ms, +{rss / (1024 * 1024):.1f} MiB RSS, {len(rows)} modules")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda row: row[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
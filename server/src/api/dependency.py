@@ -0,0 +1,140 @@
+import asyncio
+from time import perf_counter
+from loguru import logger
+from typing import TYPE_CHECKING, Optional
+
+from src.service.ad_service import get_ad_service, AdService
+from src.prompts.registry import get_prompt_registry
+from src.config import settings
+
+if TYPE_CHECKING:
+    from src.service.imagen_service import ImageService
+    from src.service.image_jobs import ImageJobQueue
+
+
+class ServiceContainer:
+    """
+    Owns the application services for the lifetime of the app.
+    On startup it builds the services, renders the prompts and optionally warms up
+    the upstream connections, and only then marks the app ready. On shutdown it
+    stops background workers, lets pending image renders finish and closes the
+    upstream clients. Draining requests is left to the server: uvicorn stops
+    accepting connections and waits for open requests and streams (bounded by
+    `--timeout-graceful-shutdown`) before it runs the lifespan shutdown, so the
+    in-flight wait here only covers requests a server left open.
+    """
+
+    def __init__(self) -> None:
+        self.ready = False
+        self.draining = False
+        self.ad_service: Optional[AdService] = None
+        self.imagen_service: Optional["ImageService"] = None
+        self.image_job_queue: Optional["ImageJobQueue"] = None
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    async def startup(self) -> None:
+        start = perf_counter()
+        self.ad_service = get_ad_service()
+        registry = get_prompt_registry()
+        registry.start()
+        logger.info(f"Rendered {len(registry.list())} prompts")
+
+        if settings.ENABLE_IMAGE_ROUTER:
+            from src.service.imagen_service import get_imagen_service
+            from src.service.image_jobs import get_image_job_queue
+
+            self.imagen_service = get_imagen_service()
+            self.image_job_queue = get_image_job_queue()
+            await self.image_job_queue.start()
+
+        if settings.WARMUP_ENABLED:
+            await self._warmup()
+
+        self.ready = True
+        logger.info(f"Services ready in {perf_counter() - start:.2f}s")
+
+    async def _warmup(self) -> None:
+        """Pre-open upstream connections; failures are logged and do not block startup"""
+        probes = {"llm": self.ad_service.warmup()}
+        if self.imagen_service is not None:
+            probes["image"] = self.imagen_service.warmup()
+        try:
+            async with asyncio.timeout(settings.WARMUP_TIMEOUT):
+                results = await asyncio.gather(*probes.values(), return_exceptions=True)
+        except TimeoutError:
+            logger.warning(f"Warmup did not finish within {settings.WARMUP_TIMEOUT}s")
+            return
+        for name, result in zip(probes, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Warmup of {name} client failed: {result}")
+            else:
+                logger.info(f"Warmed up {name} client")
+
+    async def shutdown(self) -> None:
+        self.ready = False
+        self.draining = True
+        # Normally zero by now; uvicorn has already waited for its connections
+        if self._in_flight:
+            logger.info(f"Draining {self._in_flight} in-flight requests")
+            try:
+                async with asyncio.timeout(settings.SHUTDOWN_DRAIN_TIMEOUT):
+                    await self._idle.wait()
+            except TimeoutError:
+                logger.warning(f"Shutdown with {self._in_flight} requests still in flight")
+
+        await get_prompt_registry().stop()
+        if self.image_job_queue is not None:
+            await self.image_job_queue.stop()
+        if self.imagen_service is not None:
+            await self.imagen_service.image_generator.drain(settings.SHUTDOWN_DRAIN_TIMEOUT)
+            from src.core.image_variants import shutdown_process_pool
+            await asyncio.to_thread(shutdown_process_pool)
+        if self.ad_service is not None:
+            await self.ad_service.close()
+
+        from src.llm.http import close_http_pool
+        await close_http_pool()
+        logger.info("Services stopped")
+
+    def request_started(self) -> None:
+        self._in_flight += 1
+        self._idle.clear()
+
+    def request_finished(self) -> None:
+        self._in_flight -= 1
+        if self._in_flight == 0:
+            self._idle.set()
+
+
+class InFlightMiddleware:
+    """
+    ASGI middleware that counts requests in flight, including the time spent
+    streaming the response body, so shutdown can wait for open streams.
+    """
+
+    def __init__(self, app, container: ServiceContainer) -> None:
+        self.app = app
+        self.container = container
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        self.container.request_started()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.container.request_finished()
+
+
+# Singleton container instance
+_service_container_instance: Optional[ServiceContainer] = None
+
+def get_service_container() -> ServiceContainer:
+    """Get singleton service container instance"""
+    global _service_container_instance
+    if _service_container_instance is None:
+        _service_container_instance = ServiceContainer()
+    return _service_container_instance
@@ -1,16 +1,26 @@
-import json
 from loguru import logger
-from typing import Annotated
+from typing import Annotated, List, Literal, Optional
 from fastapi import (
     APIRouter, 
     HTTPException, 
-    Depends
+    Depends,
+    Header,
+    Query
 )
 from fastapi.responses import StreamingResponse
 
-from src.models import AdGenerationRequest, AdGenerationResponse
+from src.models import (
+    AdGenerationRequest,
+    AdGenerationResponse,
+    AdVariantsRequest,
+    AdVariantsResponse
+)
 from src.service.ad_service import get_ad_service, AdService
+from src.core.admission import OverloadedError
+from src.prompts.registry import get_prompt_registry, PromptRegistry
 from src.utils.helpers import generate_request_id
+from src.utils.streaming import coalesce_stream, dumps_json, format_sse, prime_stream
+from src.utils.metrics import track_request
 from src.config import settings
 
 
@@ -36,10 +46,11 @@ async def generate_ad(
     - AdGenerationResponse with generated ad content and metadata.
     """
     try:
-        response = await ad_service.generate_ad(request)
+        async with track_request("generate", ad_service.model_name, request.ad_type, request.ad_tone):
+            response = await ad_service.generate_ad(request)
         return response
     
-    except HTTPException:
+    except (HTTPException, OverloadedError):
         raise
     except Exception as e:
         raise HTTPException(
@@ -54,25 +65,55 @@ async def generate_ad(
 @router.post(
     "/generate-stream",
     summary="Generate Advertisement (Streaming)",
-    description="Generate advertisement with streaming response"
+    description="Generate advertisement with streaming response (NDJSON, or Server-Sent Events with format=sse)"
 )
 async def generate_ad_streaming(
     request: AdGenerationRequest,
     ad_service: Annotated[AdService, Depends(get_ad_service)],
+    format: Annotated[Optional[Literal["ndjson", "sse"]], Query(description="Stream framing; defaults to SSE when Accept is text/event-stream")] = None,
+    accept: Annotated[Optional[str], Header()] = None,
 ):
     """
     Generate advertisement content with streaming response.
     
     Parameters:
     - request: AdGenerationRequest containing product details and ad settings.
+    - format: `ndjson` (default, one JSON line per upstream delta) or `sse`
+      (`text/event-stream` with event ids and coalesced content chunks).
     
     Returns:
     - StreamingResponse with chunks of generated ad content.
     """
+    use_sse = format == "sse" or (format is None and accept is not None and "text/event-stream" in accept)
+    # Raises OverloadedError (503) before any bytes are sent when admission control sheds the request
+    chunks = await prime_stream(ad_service.generate_ad_streaming(request))
+
     async def stream_response():
         try:
-            async for chunk in ad_service.generate_ad_streaming(request):
-                yield json.dumps(chunk, default=str) + "\n"
+            async with track_request("generate-stream", ad_service.model_name, request.ad_type, request.ad_tone):
+                async for chunk in chunks:
+                    yield dumps_json(chunk) + b"\n"
+        except Exception as e:
+            logger.info(e)
+            error_response = {
+                "status": "error",
+                "error_code": "generation_failed",
+                "message": str(e),
+                "request_id": generate_request_id()
+            }
+            yield dumps_json(error_response) + b"\n"
+
+    async def stream_events():
+        event_id = 0
+        try:
+            async with track_request("generate-stream", ad_service.model_name, request.ad_type, request.ad_tone):
+                async for chunk in coalesce_stream(
+                    chunks,
+                    max_bytes=settings.SSE_FLUSH_BYTES,
+                    max_delay=settings.SSE_FLUSH_INTERVAL,
+                ):
+                    event_id += 1
+                    yield format_sse(chunk, event_id)
         except Exception as e:
             logger.info(e)
             error_response = {
@@ -81,14 +122,123 @@ async def generate_ad_streaming(
                 "message": str(e),
                 "request_id": generate_request_id()
             }
-            yield json.dumps(error_response) + "\n"
+            yield format_sse(error_response, event_id + 1)
 
     return StreamingResponse(
-        stream_response(),
-        media_type="text/plain",
+        stream_events() if use_sse else stream_response(),
+        media_type="text/event-stream" if use_sse else "text/plain",
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
             "X-Accel-Buffering": "no"  # Disable nginx buffering
         }
-    )
\ No newline at end of file
+    )
+
+@router.post(
+    "/generate-batch",
+    summary="Generate Advertisements (Batch)",
+    description="Generate advertisements for many products, streaming NDJSON results as they complete"
+)
+async def generate_ad_batch(
+    requests: List[AdGenerationRequest],
+    ad_service: Annotated[AdService, Depends(get_ad_service)],
+    max_concurrency: Annotated[Optional[int], Query(ge=1, description="Concurrent generations for this batch")] = None,
+):
+    """
+    Generate advertisements for a batch of products.
+    
+    Parameters:
+    - requests: List of AdGenerationRequest, one per product.
+    - max_concurrency: Optional concurrency limit, capped at BATCH_MAX_CONCURRENCY.
+    
+    Returns:
+    - StreamingResponse with one NDJSON line per item in completion order.
+      Each line carries the item `index` and either the `response` or an error.
+    """
+    if not requests:
+        raise HTTPException(status_code=422, detail="Batch must contain at least one request")
+    if len(requests) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(requests)} items (max {settings.BATCH_MAX_ITEMS})"
+        )
+    concurrency = min(max_concurrency or settings.BATCH_MAX_CONCURRENCY, settings.BATCH_MAX_CONCURRENCY)
+
+    async def stream_results():
+        async with track_request("generate-batch", ad_service.model_name):
+            async for result in ad_service.generate_ads_batch(requests, max_concurrency=concurrency):
+                yield dumps_json(result) + b"\n"
+
+    return StreamingResponse(
+        stream_results(),
+        media_type="application/x-ndjson",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+@router.post(
+    "/generate-variants",
+    response_model=AdVariantsResponse,
+    summary="Generate Advertisement Variants",
+    description="Generate the same product ad in several ad type/tone combinations concurrently"
+)
+async def generate_ad_variants(
+    request: AdVariantsRequest,
+    ad_service: Annotated[AdService, Depends(get_ad_service)],
+    stream: Annotated[bool, Query(description="Stream each variant as NDJSON as soon as it completes")] = False,
+):
+    """
+    Generate advertisement variants for one product.
+    
+    Parameters:
+    - request: AdVariantsRequest with product details and `variants` (list of type/tone pairs or "all").
+    - stream: If true, stream one NDJSON line per variant in completion order.
+    
+    Returns:
+    - AdVariantsResponse keyed by `ad_type:ad_tone`, or a StreamingResponse in stream mode.
+    """
+    if stream:
+        async def stream_variants():
+            async with track_request("generate-variants", ad_service.model_name):
+                async for result in ad_service.generate_ad_variants_streaming(request):
+                    yield dumps_json(result) + b"\n"
+
+        return StreamingResponse(
+            stream_variants(),
+            media_type="application/x-ndjson",
+            headers={
+                "Cache-Control": "no-cache",
+                "X-Accel-Buffering": "no"
+            }
+        )
+
+    try:
+        async with track_request("generate-variants", ad_service.model_name):
+            return await ad_service.generate_ad_variants(request)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "error": "generation_failed",
+                "message": str(e),
+                "request_id": generate_request_id()
+            }
+        )
+
+@router.get(
+    "/prompts",
+    summary="List Prompts",
+    description="List the compiled system prompts with their versions and lengths"
+)
+async def list_prompts(
+    registry: Annotated[PromptRegistry, Depends(get_prompt_registry)],
+):
+    """
+    List the compiled system prompts for every ad type and tone.
+    
+    Returns:
+    - List of prompt metadata (ad type, tone, version, character and estimated token length).
+    """
+    return [prompt.model_dump(exclude={"text"}) for prompt in registry.list()]
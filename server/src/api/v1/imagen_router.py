@@ -1,49 +1,69 @@
+import mimetypes
 from loguru import logger
-from pathlib import Path
-from typing import Annotated
+from typing import Annotated, Literal, Optional, Union
 from fastapi import (
     APIRouter, 
     HTTPException, 
-    Depends
+    Depends,
+    Header,
+    Query,
+    Response
 )
+from fastapi.responses import StreamingResponse
 
-from fastapi.responses import FileResponse
-
+from src.models import AdGenerationRequest, AdGenerationResponse
 from src.models.requests import ImageGenerationRequest
-from src.models.response import ImageResult
+from src.models.response import ImageResult, ImageJobStatus
 from src.service.imagen_service import get_imagen_service, ImageService
+from src.service.ad_image_service import get_ad_image_service, AdImageService
+from src.service.image_jobs import get_image_job_queue, ImageJobQueue
+from src.core.admission import OverloadedError
+from src.core.image_cache import ImageCache
+from src.core.image_variants import VARIANT_MEDIA_TYPES, select_variant
 from src.config import settings
 from src.utils.helpers import generate_request_id
+from src.utils.metrics import track_request
+from src.utils.streaming import coalesce_stream, dumps_json, format_sse
+from src.utils.logger import sampled_logger
 
 
 router = APIRouter(prefix=settings.API_V1_PREFIX, tags=["Image Generation"])
 
 @router.post(
     "/generate-image",
-    response_model=ImageResult,
+    response_model=Union[ImageResult, ImageJobStatus],
     summary="Generate Image",
-    description="Generate an image based on product details"
+    description="Generate an image based on product details, optionally as a background job"
 )
 async def generate_image(
     request: ImageGenerationRequest,
     imagen_service: Annotated[ImageService, Depends(get_imagen_service)],
+    job_queue: Annotated[ImageJobQueue, Depends(get_image_job_queue)],
+    response: Response,
+    async_mode: Annotated[bool, Query(description="Queue the generation and return a job id immediately")] = False,
 ):
     """
     Generate an image based on the provided product details.
     
     Parameters:
     - request: ImageGenerationRequest containing product details.
+    - async_mode: If true, queue the job and return its status (HTTP 202) immediately.
     
     Returns:
-    - ImageResult with generated image URL and metadata.
+    - ImageResult with generated image URL and metadata, or ImageJobStatus in async mode.
     """
     try:
-        result = imagen_service.generate_image(request)
+        if async_mode:
+            response.status_code = 202
+            return await job_queue.submit(request)
+
+        async with track_request("generate-image", imagen_service.model_name):
+            result = await imagen_service.generate_image(request)
         if result is None:
             raise HTTPException(status_code=500, detail="Image generation failed")
         return result
     
-    except HTTPException:
+    except (HTTPException, OverloadedError):
         raise
     except Exception as e:
         raise HTTPException(
@@ -55,38 +75,183 @@ async def generate_image(
             }
         )
 
-from pathlib import Path
+@router.post(
+    "/generate-with-image",
+    response_model=AdGenerationResponse,
+    summary="Generate Advertisement with Image",
+    description="Generate the advertisement text and product image concurrently"
+)
+async def generate_ad_with_image(
+    request: AdGenerationRequest,
+    ad_image_service: Annotated[AdImageService, Depends(get_ad_image_service)],
+):
+    """
+    Generate advertisement content and a product image in one call.
+    Both are generated concurrently; if the image fails the ad is still returned.
+    
+    Parameters:
+    - request: AdGenerationRequest containing product details and ad settings.
+    
+    Returns:
+    - AdGenerationResponse with `image_info` set, or null when the image failed.
+    """
+    try:
+        async with track_request("generate-with-image", ad_image_service.model_name, request.ad_type, request.ad_tone):
+            return await ad_image_service.generate(request)
+    
+    except (HTTPException, OverloadedError):
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "error": "generation_failed",
+                "message": str(e),
+                "request_id": generate_request_id()
+            }
+        )
+
+@router.post(
+    "/generate-with-image-stream",
+    summary="Generate Advertisement with Image (Streaming)",
+    description="Stream the advertisement text while the product image is generated, then send the image"
+)
+async def generate_ad_with_image_streaming(
+    request: AdGenerationRequest,
+    ad_image_service: Annotated[AdImageService, Depends(get_ad_image_service)],
+    format: Annotated[Optional[Literal["ndjson", "sse"]], Query(description="Stream framing; defaults to SSE when Accept is text/event-stream")] = None,
+    accept: Annotated[Optional[str], Header()] = None,
+):
+    """
+    Generate advertisement content with streaming response and a product image.
+    The chunks are those of `/generate-stream`, followed by a final `image` chunk
+    with the ImageResult, or `image_failed` if only the image failed.
+    
+    Parameters:
+    - request: AdGenerationRequest containing product details and ad settings.
+    - format: `ndjson` (default) or `sse`, as for `/generate-stream`.
+    
+    Returns:
+    - StreamingResponse with ad chunks and the final image chunk.
+    """
+    use_sse = format == "sse" or (format is None and accept is not None and "text/event-stream" in accept)
+    # Raises OverloadedError (503) before any bytes are sent when admission control sheds the ad
+    chunks = await ad_image_service.generate_streaming(request)
+
+    async def stream_chunks():
+        try:
+            async with track_request("generate-with-image-stream", ad_image_service.model_name, request.ad_type, request.ad_tone):
+                if not use_sse:
+                    async for chunk in chunks:
+                        yield chunk
+                    return
+                async for chunk in coalesce_stream(
+                    chunks,
+                    max_bytes=settings.SSE_FLUSH_BYTES,
+                    max_delay=settings.SSE_FLUSH_INTERVAL,
+                ):
+                    yield chunk
+        except Exception as e:
+            logger.info(e)
+            yield {
+                "status": "error",
+                "error_code": "generation_failed",
+                "message": str(e),
+                "request_id": generate_request_id()
+            }
+
+    async def stream_response():
+        event_id = 0
+        async for chunk in stream_chunks():
+            event_id += 1
+            yield format_sse(chunk, event_id) if use_sse else dumps_json(chunk) + b"\n"
+
+    return StreamingResponse(
+        stream_response(),
+        media_type="text/event-stream" if use_sse else "text/plain",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"  # Disable nginx buffering
+        }
+    )
+
+@router.get(
+    "/images/jobs/{job_id}",
+    response_model=ImageJobStatus,
+    summary="Get Image Job",
+    description="Retrieve the status and result of a background image generation job"
+)
+async def get_image_job(
+    job_id: str,
+    job_queue: Annotated[ImageJobQueue, Depends(get_image_job_queue)],
+):
+    """
+    Retrieve the status of a background image generation job.
+    
+    Parameters:
+    - job_id: Identifier returned by `/generate-image?async_mode=true`.
+    
+    Returns:
+    - ImageJobStatus with the job state and, once completed, its ImageResult.
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Image job not found")
+    return job
 
 @router.get(
     "/images/{file_name}",
     summary="Get Image",
-    description="Retrieve an image by its file name"
+    description="Retrieve an image by its file name, optionally as a resized WebP/AVIF variant"
 )
-async def get_image(file_name: str):
+async def get_image(
+    file_name: str,
+    imagen_service: Annotated[ImageService, Depends(get_imagen_service)],
+    w: Annotated[Optional[int], Query(gt=0, description="Desired width in pixels")] = None,
+    format: Annotated[Optional[Literal["png", "webp", "avif"]], Query(description="Image format")] = None,
+    accept: Annotated[Optional[str], Header()] = None,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+    range: Annotated[Optional[str], Header()] = None,
+):
     """
     Retrieve an image by its file name.
+    Responses carry an `ETag` and long-lived immutable `Cache-Control`; a matching
+    `If-None-Match` gets 304 and a `Range` request gets 206 with the requested bytes.
     
     Parameters:
     - file_name: Name of the image file to retrieve.
+    - w: Desired width; the smallest variant at least this wide is served.
+    - format: `png` for the original, or `webp`/`avif`. Without it the most
+      compact format listed in the `Accept` header is used.
     
     Returns:
     - Image file if found, otherwise raises HTTP 404 error.
     """
-    logger.info(f"Retrieving image: {file_name}")
+    sampled_logger.debug(f"Retrieving image: {file_name}")
     try:
-        upload_dir = Path(settings.UPLOAD_DIR)
-        file_path = upload_dir / file_name
-
-        if not file_path.exists():
-            logger.warning(f"Image not found: {file_name}")
+        if not ImageCache.is_valid_name(file_name):
             raise HTTPException(status_code=404, detail="Image not found")
-        
-        logger.info(f"Image retrieved successfully: {file_name}")
-        return FileResponse(
-            path=file_path,
-            media_type="image/png",
-            filename=file_name
-        )
+
+        cache = imagen_service.image_generator.cache
+        key = file_name.removesuffix(".png")
+        candidates = []
+        variant = select_variant(await cache.variants(key), w, format, accept)
+        if variant is not None:
+            candidates.append((cache.variant_name_for(key, variant), VARIANT_MEDIA_TYPES[variant.rsplit(".", 1)[1]]))
+        # Fall back to the original when no variant applies or its object is gone
+        original_type = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+        candidates.append((file_name, original_type))
+
+        for name, media_type in candidates:
+            response = await imagen_service.delivery.respond(name, media_type, if_none_match, range)
+            if response is not None:
+                return response
+
+        logger.warning(f"Image not found: {file_name}")
+        raise HTTPException(status_code=404, detail="Image not found")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.critical(f"Critical error during image retrieval: {e}")
         raise HTTPException(
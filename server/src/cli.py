@@ -0,0 +1,250 @@
+"""
+Offline catalog ingestion.
+
+Streams a CSV or JSONL product catalog, generates an ad for every row with
+AIAdGenerator and appends the results to a JSONL file. Progress is recorded
+in a checkpoint file so an interrupted run resumes where it stopped; rows
+that failed are skipped on resume unless --retry-failed is given. Concurrency
+is bounded by --concurrency alone, so the server's admission control is not used.
+
+Usage:
+    python -m src.cli catalog.csv --output ads.jsonl --concurrency 8
+"""
+import os
+import csv
+import json
+import time
+import asyncio
+import argparse
+from pathlib import Path
+from loguru import logger
+from typing import Any, Dict, Iterator, Optional, Set, Tuple, Union
+
+from src.core.ad_generator import AIAdGenerator
+from src.llm.http import close_http_pool
+from src.models import AdGenerationRequest
+
+
+def read_catalog(path: Path) -> Iterator[Tuple[int, Union[Dict[str, Any], ValueError]]]:
+    """Lazily yield (row index, raw row) pairs from a CSV or JSONL catalog; unreadable rows yield the error"""
+    with path.open("r", encoding="utf-8", newline="") as f:
+        if path.suffix.lower() in {".jsonl", ".ndjson"}:
+            for index, line in enumerate(f):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield index, ValueError(f"Malformed JSON: {e}")
+                    continue
+                yield index, row if isinstance(row, dict) else ValueError("Row is not a JSON object")
+        else:
+            for index, row in enumerate(csv.DictReader(f)):
+                yield index, row
+
+
+def normalize_row(row: Dict[str, Any], defaults: Dict[str, Optional[str]]) -> Dict[str, Any]:
+    """Convert a raw catalog row into AdGenerationRequest fields"""
+    data = {k: (None if v == "" else v) for k, v in row.items() if k}
+    category = data.get("category")
+    if isinstance(category, str):
+        separator = ";" if ";" in category else ","
+        data["category"] = [c.strip() for c in category.split(separator) if c.strip()]
+    for key, value in defaults.items():
+        if data.get(key) is None and value is not None:
+            data[key] = value
+    return data
+
+
+class Checkpoint:
+    """
+    Tracks finished rows with a contiguous watermark plus the few rows that
+    finished out of order above it, so memory stays bounded by the concurrency.
+    Rows that failed are finished too, but are also listed in `failed` so a
+    later run can retry them. The checkpoint is saved in batches and remembers
+    how far the output file had been written, so results appended after the
+    last save are replayed from the output (`replay`) instead of generated again.
+    """
+
+    def __init__(self, path: Path, save_every: int = 100, save_interval: float = 5.0) -> None:
+        self.path = path
+        self.save_every = save_every
+        self.save_interval = save_interval
+        self.next_row = 0
+        self.completed: Set[int] = set()
+        self.failed: Set[int] = set()
+        self.output_offset = 0
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+        if path.exists():
+            state = json.loads(path.read_text())
+            self.next_row = state.get("next_row", 0)
+            self.completed = set(state.get("completed", []))
+            self.failed = set(state.get("failed", []))
+            self.output_offset = state.get("output_offset", 0)
+
+    def is_done(self, index: int, retry_failed: bool = False) -> bool:
+        if retry_failed and index in self.failed:
+            return False
+        return index < self.next_row or index in self.completed
+
+    def mark_done(self, index: int, failed: bool = False) -> None:
+        self._unsaved += 1
+        if failed:
+            self.failed.add(index)
+        else:
+            self.failed.discard(index)
+        if index < self.next_row:
+            return  # a retried row below the watermark
+        self.completed.add(index)
+        while self.next_row in self.completed:
+            self.completed.remove(self.next_row)
+            self.next_row += 1
+
+    def replay(self, output: Path) -> int:
+        """
+        Mark the rows written to `output` after the last save as done and drop a
+        partially written last line; returns the number of rows replayed.
+        """
+        if not output.exists():
+            return 0
+        replayed = 0
+        with output.open("r+b") as f:
+            f.seek(min(self.output_offset, os.fstat(f.fileno()).st_size))
+            end = f.tell()
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # the write of this record was interrupted
+                end += len(line)
+                record = json.loads(line)
+                self.mark_done(record["row"], failed=record["status"] != "completed")
+                replayed += 1
+            f.truncate(end)
+        self.output_offset = end
+        return replayed
+
+    def save_due(self) -> bool:
+        """Whether enough rows or time have passed since the last save"""
+        if not self._unsaved:
+            return False
+        return self._unsaved >= self.save_every or time.monotonic() - self._saved_at >= self.save_interval
+
+    def save(self, output_offset: Optional[int] = None) -> None:
+        """Write the checkpoint atomically; `output_offset` is the output size that it covers"""
+        if output_offset is not None:
+            self.output_offset = output_offset
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp_path.write_text(json.dumps({
+            "next_row": self.next_row,
+            "completed": sorted(self.completed),
+            "failed": sorted(self.failed),
+            "output_offset": self.output_offset,
+        }))
+        os.replace(tmp_path, self.path)
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+
+
+async def ingest(
+    catalog: Path,
+    output: Path,
+    checkpoint_path: Path,
+    concurrency: int,
+    defaults: Dict[str, Optional[str]],
+    retry_failed: bool = False,
+) -> Dict[str, int]:
+    """Generate ads for every pending catalog row and append results to the output file"""
+    checkpoint = Checkpoint(checkpoint_path)
+    replayed = checkpoint.replay(output)
+    if replayed:
+        logger.info(f"Recovered {replayed} rows written after the last checkpoint save")
+    if checkpoint.next_row or checkpoint.completed:
+        logger.info(f"Resuming from checkpoint at row {checkpoint.next_row}")
+
+    generator = AIAdGenerator(use_admission=False)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    counts = {"completed": 0, "failed": 0, "skipped": 0}
+
+    with output.open("a", encoding="utf-8") as out:
+
+        def record(index: int, result: Dict[str, Any]) -> None:
+            out.write(json.dumps(result, default=str) + "\n")
+            out.flush()
+            checkpoint.mark_done(index, failed=result["status"] != "completed")
+            if checkpoint.save_due():
+                checkpoint.save(out.tell())
+
+        def record_error(index: int, error: Exception) -> None:
+            logger.error(f"Row {index} failed: {error}")
+            record(index, {"row": index, "status": "error", "message": str(error)})
+            counts["failed"] += 1
+
+        async def worker() -> None:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    queue.task_done()
+                    return
+                index, row = item
+                try:
+                    request = AdGenerationRequest(**normalize_row(row, defaults))
+                    response = await generator.generate(request)
+                    record(index, {"row": index, "status": "completed", "response": response.model_dump(mode="json")})
+                    counts["completed"] += 1
+                except Exception as e:
+                    record_error(index, e)
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            for index, row in read_catalog(catalog):
+                if checkpoint.is_done(index, retry_failed):
+                    counts["skipped"] += 1
+                    continue
+                if isinstance(row, ValueError):
+                    record_error(index, row)
+                    continue
+                await queue.put((index, row))
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+            checkpoint.save(out.tell())
+            await generator.llm.close()
+            await close_http_pool()
+
+    if checkpoint.failed:
+        logger.warning(f"{len(checkpoint.failed)} rows failed; re-run with --retry-failed to retry them")
+    return counts
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Generate ads for a CSV or JSONL product catalog")
+    parser.add_argument("catalog", type=Path, help="Path to a .csv or .jsonl catalog")
+    parser.add_argument("--output", "-o", type=Path, default=None, help="Output JSONL file (default: <catalog>.ads.jsonl)")
+    parser.add_argument("--checkpoint", type=Path, default=None, help="Checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument("--concurrency", "-c", type=int, default=8, help="Concurrent generations")
+    parser.add_argument("--ad-type", default="social_media", help="Ad type for rows without one")
+    parser.add_argument("--ad-tone", default="friendly", help="Ad tone for rows without one")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry rows that failed in an earlier run")
+    args = parser.parse_args(argv)
+
+    output = args.output or args.catalog.with_suffix(".ads.jsonl")
+    checkpoint = args.checkpoint or output.with_suffix(output.suffix + ".checkpoint")
+    counts = asyncio.run(ingest(
+        catalog=args.catalog,
+        output=output,
+        checkpoint_path=checkpoint,
+        concurrency=args.concurrency,
+        defaults={"ad_type": args.ad_type, "ad_tone": args.ad_tone},
+        retry_failed=args.retry_failed,
+    ))
+    logger.info(f"Catalog ingestion finished: {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,23 @@
-from typing import Optional
+from typing import List, Optional
 from pathlib import Path
 from functools import lru_cache
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv, find_dotenv
 
 _ = load_dotenv(find_dotenv())
 
 
+class LLMBackendConfig(BaseModel):
+    """One OpenAI-compatible endpoint in the LLM router pool"""
+    name: str
+    provider: str = "openai"  # "openai" (OpenAI-compatible endpoint) or "fake" (offline FakeLLMClient, for failover testing)
+    base_url: Optional[str] = None  # defaults to LUNOS_BASE_URL
+    api_key: Optional[str] = None  # defaults to LUNOS_API_KEY
+    model_name: Optional[str] = None  # defaults to DEFAULT_MODEL_NAME
+    weight: float = 1.0
+
+
 class Settings(BaseSettings):
     # App Configuration
     APP_NAME: str = "Ad Generator MVP"
@@ -16,6 +27,15 @@ class Settings(BaseSettings):
     HOST: str = "0.0.0.0"
     PORT: int = 8000
     
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    LOG_FILE: Optional[str] = "logger.log"
+    LOG_JSON: bool = True  # write the file sink as JSON records
+    LOG_ROTATION: str = "10 MB"
+    LOG_RETENTION: str = "10 days"
+    LOG_SAMPLE_RATE: float = 0.01  # fraction of requests whose hot-path debug events are logged
+    LOG_LEVEL_ADMIN_TOKEN: Optional[str] = None  # X-Admin-Token required by PUT /log-level; unset disables it
+
     # API Configuration
     API_V1_PREFIX: str = "/api/v1"
     CORS_ORIGINS: list[str] = ["*"]
@@ -28,13 +48,103 @@ class Settings(BaseSettings):
     
 
     # LLM settings 
-    LUNOS_API_KEY: str 
+    LLM_PROVIDER: str = "lunos"  # "lunos" (OpenAI-compatible API) or "fake" (offline, for load testing)
+    LUNOS_API_KEY: Optional[str] = None  # required unless LLM_PROVIDER is "fake"
     LUNOS_BASE_URL: str = "https://api.lunos.tech/v1"
     DEFAULT_MODEL_NAME: str = "google/gemma-3-12b-it"
+    SINGLE_FLIGHT_ENABLED: bool = True  # coalesce identical concurrent LLM requests
+
+    # LLM router; when LLM_BACKENDS is set (JSON list) requests are spread over these endpoints
+    # e.g. [{"name": "lunos", "base_url": "https://api.lunos.tech/v1", "weight": 2}, {"name": "backup", ...}]
+    LLM_BACKENDS: List[LLMBackendConfig] = []
+    LLM_ROUTER_EWMA_ALPHA: float = 0.3  # weight of the newest sample in the latency / error averages
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 5  # consecutive failures that open a backend's circuit
+    LLM_BREAKER_RECOVERY_TIME: float = 30.0  # seconds before an open circuit lets a probe request through
+
+    # Prompt registry
+    PROMPT_TEMPLATES_DIR: Optional[str] = None  # directory with base/<ad_type>.txt and tones/<ad_tone>.txt overrides
+    PROMPT_RELOAD_INTERVAL: float = 5.0  # seconds between checks for edited template files
+
+    # LLM response cache
+    # Off by default: ads are sampled at temperature 1.0, and a hit returns the earlier ad verbatim
+    # instead of a fresh variation (requests can still opt out with bypass_cache)
+    RESPONSE_CACHE_ENABLED: bool = False
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1024
+    RESPONSE_CACHE_TTL: int = 3600  # seconds
+    RESPONSE_CACHE_DISK_PATH: Optional[str] = None  # e.g. "response_cache.db" to persist across restarts
+    RESPONSE_CACHE_PRUNE_INTERVAL: float = 300.0  # seconds between deletions of expired rows from the disk tier
+
+    # Upstream HTTP connection pool (shared by all LLM clients)
+    HTTP_MAX_CONNECTIONS: int = 200
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 100
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0  # seconds
+    HTTP2_ENABLED: bool = False  # requires the 'h2' package
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_READ_TIMEOUT: float = 60.0
+    HTTP_WRITE_TIMEOUT: float = 10.0
+    HTTP_POOL_TIMEOUT: float = 10.0  # max wait for a free connection from the pool
+    HTTP_TOTAL_TIMEOUT: float = 120.0  # upper bound for a whole upstream call, including streaming
+
+    # Upstream retries and hedging
+    LLM_MAX_RETRIES: int = 2  # retries for retryable errors (connection errors, timeouts, 408/429/5xx)
+    LLM_RETRY_BASE_DELAY: float = 0.25  # seconds, doubled per retry with full jitter
+    LLM_RETRY_MAX_DELAY: float = 4.0  # cap for backoff and Retry-After
+    LLM_HEDGE_ENABLED: bool = False  # send a duplicate request when the first one is slower than usual
+    LLM_HEDGE_PERCENTILE: float = 0.95  # hedge after this percentile of recent latencies
+    LLM_HEDGE_MIN_DELAY: float = 0.1  # never hedge earlier than this (seconds)
+    LLM_ATTEMPT_BUDGET: int = 3  # max upstream attempts per request, retries and hedges combined
+
+    # Admission control: adaptive upstream concurrency limit with a bounded wait queue
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_INITIAL_LIMIT: int = 16
+    ADMISSION_MIN_LIMIT: int = 2
+    ADMISSION_MAX_LIMIT: int = 128  # for LLM calls; image calls are capped by IMAGE_MAX_CONCURRENCY
+    ADMISSION_QUEUE_SIZE: int = 64  # waiting requests beyond this are rejected with 503
+    ADMISSION_QUEUE_TIMEOUT: float = 5.0  # max seconds a request waits for admission
+    ADMISSION_LATENCY_TOLERANCE: float = 2.0  # shrink the limit when recent latency exceeds this multiple of the norm
+    ADMISSION_MAX_MEMORY_BYTES: int = 0  # shed new requests above this process RSS; 0 disables the check
+
+    # Startup and shutdown
+    WARMUP_ENABLED: bool = True  # pre-open upstream connections before the app reports ready
+    WARMUP_TIMEOUT: float = 10.0  # seconds
+    SHUTDOWN_DRAIN_TIMEOUT: float = 30.0  # seconds to wait on shutdown for pending image renders and requests still open
 
     # Gemini Image Generation settings
-    GEMINI_API_KEY: str 
+    ENABLE_IMAGE_ROUTER: bool = True  # set to false for text-only deployments (google-genai and Pillow are never loaded)
+    IMAGE_PROVIDER: str = "gemini"  # "gemini" or "fake" (offline, for load testing)
+    GEMINI_API_KEY: Optional[str] = None  # required unless IMAGE_PROVIDER is "fake"
     GEMINI_IMAGE_MODEL_NAME: str = "gemini-2.0-flash-preview-image-generation"
+    IMAGE_MAX_CONCURRENCY: int = 4  # max concurrent upstream image generations per worker
+    IMAGE_CACHE_MAX_BYTES: int = 1024 * 1024 * 1024  # 1GB of generated images kept on disk
+
+    # Image derivatives, rendered in a process pool after generation
+    IMAGE_VARIANTS_ENABLED: bool = True
+    IMAGE_VARIANT_WIDTHS: List[int] = [256, 512, 1024]  # never upscaled past the original width
+    IMAGE_VARIANT_FORMATS: List[str] = ["webp"]  # add "avif" for smaller files at a higher encoding cost
+    IMAGE_VARIANT_QUALITY: int = 80
+    IMAGE_PROCESS_WORKERS: int = 2  # processes encoding derivatives
+
+    # Image delivery (/images/{file_name})
+    IMAGE_CACHE_CONTROL: str = "public, max-age=31536000, immutable"  # file names are content-addressed
+    IMAGE_HOT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # in-memory copies of recently served images
+    IMAGE_HOT_CACHE_MAX_ITEM_BYTES: int = 2 * 1024 * 1024  # larger files are always streamed from disk
+
+    # Fake providers (LLM_PROVIDER / IMAGE_PROVIDER = "fake")
+    FAKE_LLM_TTFT: float = 0.3  # seconds before the first token
+    FAKE_LLM_TOKENS_PER_SECOND: float = 50.0
+    FAKE_LLM_OUTPUT_TOKENS: int = 120  # tokens per response, capped by max_tokens
+    FAKE_LLM_ERROR_RATE: float = 0.0  # fraction of calls failing with a retryable 503
+    FAKE_IMAGE_LATENCY: float = 2.0  # seconds per image
+    FAKE_IMAGE_BYTES: int = 256 * 1024  # approximate size of the generated PNG
+    FAKE_IMAGE_ERROR_RATE: float = 0.0
+    FAKE_LATENCY_JITTER: float = 0.2  # relative +/- jitter applied to every fake delay
+    FAKE_SEED: Optional[int] = None  # fix for reproducible latencies and errors
+
+    # Background image jobs
+    IMAGE_JOB_WORKERS: int = 2
+    IMAGE_JOB_DB_PATH: str = "image_jobs.db"
+    IMAGE_JOB_LEASE_SECONDS: float = 60.0  # jobs of a process that stops renewing for this long are taken over by another
+    IMAGE_JOB_RETENTION_SECONDS: float = 24 * 3600  # finished jobs are deleted this long after finishing (0 keeps them)
 
     #  add safety settings
     SAFETY_SETTINGS: list[dict] = [
@@ -55,13 +165,37 @@ class Settings(BaseSettings):
             "threshold": "BLOCK_MEDIUM_AND_ABOVE"
         }
     ]
-    # Rate Limiting
-    RATE_LIMIT_REQUESTS: int = 100
+    # Streaming
+    SSE_FLUSH_BYTES: int = 64  # flush coalesced SSE content once this many characters are buffered
+    SSE_FLUSH_INTERVAL: float = 0.05  # or once the oldest buffered content is this many seconds old
+
+    # Batch generation
+    BATCH_MAX_ITEMS: int = 1000
+    BATCH_MAX_CONCURRENCY: int = 8
+    VARIANTS_MAX_CONCURRENCY: int = 24  # AdType x AdTone combinations run in parallel
+
+    # Rate Limiting (token bucket per API key or client IP)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_REQUESTS: int = 100  # text generation requests per window (also the burst size)
     RATE_LIMIT_WINDOW: int = 3600  # 1 hour in seconds
+    RATE_LIMIT_STREAM_REQUESTS: Optional[int] = None  # streaming requests per window, defaults to RATE_LIMIT_REQUESTS
+    RATE_LIMIT_IMAGE_REQUESTS: Optional[int] = None  # image generation requests per window, defaults to RATE_LIMIT_REQUESTS
+    RATE_LIMIT_BACKEND: str = "memory"  # memory (per worker) or sqlite (shared by all workers on the host)
+    RATE_LIMIT_DB_PATH: str = "rate_limit.db"
+    # Reverse proxies (addresses or CIDR ranges, JSON list) whose X-Forwarded-For identifies the client;
+    # without them every request through a proxy shares the proxy's bucket
+    TRUSTED_PROXIES: List[str] = []
     
     # Storage Configuration
-    STORAGE_TYPE: str = "local"  # local, s3, cloudinary
-    
+    STORAGE_TYPE: str = "local"  # local (sharded under UPLOAD_DIR) or s3 (any S3-compatible bucket)
+    STORAGE_PUBLIC_URL: Optional[str] = None  # base URL of stored images (e.g. a CDN); local defaults to the API, s3 to presigned URLs
+    S3_ENDPOINT_URL: Optional[str] = None  # e.g. http://minio:9000, defaults to AWS for S3_REGION
+    S3_BUCKET: Optional[str] = None
+    S3_REGION: str = "us-east-1"
+    S3_ACCESS_KEY_ID: Optional[str] = None
+    S3_SECRET_ACCESS_KEY: Optional[str] = None
+    S3_PREFIX: str = "images/"  # key prefix inside the bucket
+    S3_PRESIGN_EXPIRES: int = 3600  # lifetime of presigned image URLs in seconds
 
     class Config:
         env_file = ".env"
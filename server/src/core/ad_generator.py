@@ -1,30 +1,49 @@
+import asyncio
 from time import time
-from typing import Any, Dict, AsyncIterator
+from typing import Any, Dict, AsyncIterator, Tuple, Union
 from src.core.base import BaseAdGenerator
 from src.models import (
     AdGenerationRequest,
     AdGenerationResponse,
     ProductInfo,
-    AdSettings
+    AdSettings,
+    AdVariantsRequest
 )
-from src.llm.openai_client import OpenAIClient 
-from src.prompts.templates import FlexibleAdPromptGenerator
+from src.models.requests import NON_PRODUCT_FIELDS
+from src.core.response_cache import build_response_cache, make_cache_key
+from src.core.admission import OverloadedError, admit, build_admission_controller
+from src.prompts.registry import get_prompt_registry
 from src.utils.helpers import generate_request_id
+from src.utils.metrics import CACHE_REQUESTS, set_request_model
+from src.config import settings
      
 
 class AIAdGenerator(BaseAdGenerator):
     """
     AIAdGenerator is responsible for generating advertisements using an LLM client.
-    It utilizes a flexible prompt generator to create prompts based on the ad type and tone specified in the request.
+    It uses the prompt registry to look up precompiled system prompts for the ad type and tone specified in the request.
     The generator can handle both standard and streaming responses, providing detailed ad content along with product information and settings.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, use_admission: bool = True) -> None:
         """ 
-        Initializes the AIAdGenerator with an OpenAI client and a flexible prompt generator.
+        Initializes the AIAdGenerator with an OpenAI client, the precompiled prompt registry,
+        the configured response cache and the admission controller for upstream calls
+        (either is None when disabled). Callers that bound their own concurrency, like the
+        catalog CLI, pass `use_admission=False`.
         """
-        self.llm = OpenAIClient()
-        self.prompt = FlexibleAdPromptGenerator()
+        # Imported here so the OpenAI SDK is only loaded once the generator is built
+        from src.llm.router import build_llm_client
+        self.llm = build_llm_client()
+        self.prompts = get_prompt_registry()
+        self.cache = build_response_cache()
+        self.admission = build_admission_controller("llm", settings.ADMISSION_MAX_LIMIT) if use_admission else None
+
+    @staticmethod
+    def _build_product_str(request: AdGenerationRequest) -> str:
+        """Serialize the product fields of the request into the user message"""
+        product_data = request.model_dump(exclude=NON_PRODUCT_FIELDS)
+        return "\n".join(f"{k}: {v}" for k, v in product_data.items() if v is not None)
 
     async def generate(self, request: AdGenerationRequest, **kwargs) -> AdGenerationResponse:
         """
@@ -34,49 +53,126 @@ class AIAdGenerator(BaseAdGenerator):
         Returns:
             - AdGenerationResponse with generated ad content and metadata.
         """
-        start = time()
-        identifier = generate_request_id()
-
         try:
-            system_prompt = self.prompt.generate_prompt(
+            return await self._generate_one(
+                request,
                 ad_type=request.ad_type,
                 ad_tone=request.ad_tone,
+                product_str=self._build_product_str(request),
+                **kwargs
             )
-            product_data = request.model_dump(exclude={"ad_type", "ad_tone"})
-            product_str = "\n".join(f"{k}: {v}" for k, v in product_data.items() if v is not None)
+        except OverloadedError:
+            raise
+        except Exception as e:
+            raise Exception(f"Ad generation failed: {str(e)}")
 
+    async def generate_variants(
+        self,
+        request: AdVariantsRequest,
+        **kwargs
+    ) -> AsyncIterator[Tuple[str, Union[AdGenerationResponse, Exception]]]:
+        """
+        Generates one advertisement per requested AdType/AdTone combination.
+        The product payload is serialized once and shared by every variant, and the
+        upstream calls run concurrently (bounded by VARIANTS_MAX_CONCURRENCY).
+        Parameters:
+            - request: AdVariantsRequest with product details and the combinations (or "all").
+        Returns:
+            - AsyncIterator yielding (variant key, response or exception) as each variant completes.
+        """
+        combinations = request.resolve_variants()
+        product_str = self._build_product_str(request)
+        semaphore = asyncio.Semaphore(settings.VARIANTS_MAX_CONCURRENCY)
 
-            ad_content = await self.llm.generate_text(
-                system=system_prompt,
-                data_product=product_str,
-                max_tokens=1000,
-                temperature=1.0,
-                **kwargs
-            )
+        async def run(ad_type: str, ad_tone: str) -> Tuple[str, Union[AdGenerationResponse, Exception]]:
+            key = f"{ad_type}:{ad_tone}"
+            async with semaphore:
+                try:
+                    return key, await self._generate_one(request, ad_type, ad_tone, product_str, **kwargs)
+                except Exception as e:
+                    return key, Exception(f"Ad generation failed: {str(e)}")
+
+        tasks = [asyncio.create_task(run(ad_type, ad_tone)) for ad_type, ad_tone in combinations]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _generate_one(
+        self,
+        request: AdGenerationRequest,
+        ad_type: str,
+        ad_tone: str,
+        product_str: str,
+        **kwargs
+    ) -> AdGenerationResponse:
+        """Generate a single ad for a pre-serialized product payload, using the response cache"""
+        start = time()
+        identifier = generate_request_id()
+
+        system_prompt = self.prompts.get(ad_type, ad_tone).text
+        max_tokens, temperature = 1000, 1.0
 
-            generation_time = time() - start
-
-            return AdGenerationResponse(
-                ad_content=ad_content,
-                product_info=ProductInfo(
-                    product_name=request.product_name,
-                    brand=request.brand_name,
-                    category=request.category,
-                    description=request.description,
-                    price=request.price,
-                    discounted_price=request.discounted_price,
-                    store_link=request.product_url,
-                ),
-                ad_settings=AdSettings(
-                    ad_type=request.ad_type,
-                    ad_tone=request.ad_tone,
-                ),
-                generation_time=generation_time,
-                model_used=self.llm.model_name,
-                request_id=identifier
+        def cache_key(model: str) -> str:
+            return make_cache_key(
+                model=model,
+                system_prompt=system_prompt,
+                product_payload=product_str,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                extra=repr(sorted(kwargs.items())) if kwargs else "",
             )
-        except Exception as e:
-            raise Exception(f"Ad generation failed: {str(e)}")
+
+        ad_content = None
+        model_used = self.llm.model_name
+        if self.cache is not None and not request.bypass_cache:
+            # Entries are keyed on the model that generated them; any model the client may route to is a hit
+            for model in self.llm.model_names:
+                ad_content = await self.cache.get(cache_key(model))
+                if ad_content is not None:
+                    model_used = model
+                    break
+            CACHE_REQUESTS.labels(cache="response", result="miss" if ad_content is None else "hit").inc()
+
+        cached = ad_content is not None
+        if not cached:
+            async with admit(self.admission):
+                ad_content = await self.llm.generate_text(
+                    system=system_prompt,
+                    data_product=product_str,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    **kwargs
+                )
+            model_used = self.llm.served_model()
+            if self.cache is not None:
+                await self.cache.set(cache_key(model_used), ad_content)
+        set_request_model(model_used)
+
+        generation_time = time() - start
+
+        return AdGenerationResponse(
+            ad_content=ad_content,
+            product_info=ProductInfo(
+                product_name=request.product_name,
+                brand=request.brand_name,
+                category=request.category,
+                description=request.description,
+                price=request.price,
+                discounted_price=request.discounted_price,
+                store_link=request.product_url,
+            ),
+            ad_settings=AdSettings(
+                ad_type=ad_type,
+                ad_tone=ad_tone,
+            ),
+            generation_time=generation_time,
+            model_used=model_used,
+            request_id=identifier,
+            cached=cached
+        )
     
     async def generate_streaming(self, request: AdGenerationRequest, **kwargs) -> AsyncIterator[Dict[str, Any]]:
         """
@@ -90,56 +186,62 @@ class AIAdGenerator(BaseAdGenerator):
         identifier = generate_request_id()
 
         try:
-            yield {
-                "status": "processing",
-                "message": "Generating your advertisement...",
-                "request_id": identifier
-            }
+            # The slot is taken before the first chunk, so a rejection surfaces before the response starts
+            async with admit(self.admission) as slot:
+                yield {
+                    "status": "processing",
+                    "message": "Generating your advertisement...",
+                    "request_id": identifier
+                }
 
-            accumulate_content = ""
-            product_data = request.model_dump(exclude={"ad_type", "ad_tone"})
-            product_str = "\n".join(f"{k}: {v}" for k, v in product_data.items() if v is not None)
+                content_parts = []  # joined once at the end instead of repeated string concatenation
+                content_length = 0
+                product_str = self._build_product_str(request)
 
-            system_prompt = self.prompt.generate_prompt(
-                ad_type=request.ad_type,
-                ad_tone=request.ad_tone,
-            )
+                system_prompt = self.prompts.get(request.ad_type, request.ad_tone).text
 
-            async for chunk in self.llm.generate_text_streaming(
-                system=system_prompt,
-                data_product=product_str,
-                max_tokens=1000,
-                temperature=1.0,
-                stream=True,
-                **kwargs
-            ):
-                accumulate_content += chunk
+                async for chunk in self.llm.generate_text_streaming(
+                    system=system_prompt,
+                    data_product=product_str,
+                    max_tokens=1000,
+                    temperature=1.0,
+                    stream=True,
+                    **kwargs
+                ):
+                    if slot is not None:
+                        slot.first_response()
+                    content_parts.append(chunk)
+                    content_length += len(chunk)
+                    yield {
+                        "status": "streaming",
+                        "content": chunk,
+                        "progress": min(content_length / 500 * 100, 95)  # Rough progress estimate
+                    } 
+                model_used = self.llm.served_model()
+                set_request_model(model_used)
+                # Final response after streaming is complete
                 yield {
-                    "status": "streaming",
-                    "content": chunk,
-                    "progress": min(len(accumulate_content) / 500 * 100, 95)  # Rough progress estimate
-                } 
-            # Final response after streaming is complete
-            yield {
-                "status": "completed",
-                "ad_content": accumulate_content,
-                "product_info": {
-                    "product_name": request.product_name,
-                    "brand": request.brand_name,
-                    "category": request.category,
-                    "description": request.description,
-                    "price": request.price,
-                    "discounted_price": request.discounted_price,
-                    "store_link": request.product_url,
-                },
-                "ad_settings": {
-                    "ad_type": request.ad_type,
-                    "ad_tone": request.ad_tone,
-                },
-                "generation_time": time() - start,
-                "model_used": self.llm.model_name,
-                "request_id": identifier
-            }
+                    "status": "completed",
+                    "ad_content": "".join(content_parts),
+                    "product_info": {
+                        "product_name": request.product_name,
+                        "brand": request.brand_name,
+                        "category": request.category,
+                        "description": request.description,
+                        "price": request.price,
+                        "discounted_price": request.discounted_price,
+                        "store_link": request.product_url,
+                    },
+                    "ad_settings": {
+                        "ad_type": request.ad_type,
+                        "ad_tone": request.ad_tone,
+                    },
+                    "generation_time": time() - start,
+                    "model_used": model_used,
+                    "request_id": identifier
+                }
+        except OverloadedError:
+            raise
         except Exception as e:
             yield {
                 "status": "error",
@@ -0,0 +1,238 @@
+import os
+import asyncio
+from time import monotonic, perf_counter
+from collections import deque
+from contextlib import asynccontextmanager, nullcontext
+from loguru import logger
+from typing import AsyncContextManager, Deque, Optional
+
+import psutil
+
+from src.utils.metrics import Counter, Gauge
+from src.config import settings
+
+
+ADMISSION_LIMIT = Gauge(
+    "adgen_admission_limit",
+    "Current adaptive concurrency limit for upstream calls.",
+    ("pool",),
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "adgen_admission_in_flight",
+    "Upstream calls currently admitted.",
+    ("pool",),
+)
+ADMISSION_QUEUED = Gauge(
+    "adgen_admission_queued",
+    "Requests waiting for admission.",
+    ("pool",),
+)
+ADMISSION_REJECTED = Counter(
+    "adgen_admission_rejected_total",
+    "Requests shed by admission control, by reason (queue_full, queue_timeout, memory).",
+    ("pool", "reason"),
+)
+
+
+class OverloadedError(Exception):
+    """Raised when a request is shed by admission control; surfaced as HTTP 503"""
+
+    def __init__(self, pool: str, reason: str, retry_after: float = 1.0) -> None:
+        super().__init__(f"Service overloaded ({pool}: {reason}), retry later")
+        self.pool = pool
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _MemoryGuard:
+    """Resident memory check, sampled at most once per `interval` seconds to keep it cheap"""
+
+    def __init__(self, max_bytes: int, interval: float = 1.0) -> None:
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self._process = psutil.Process(os.getpid())
+        self._checked_at = 0.0
+        self._over = False
+
+    def over_limit(self) -> bool:
+        if not self.max_bytes:
+            return False
+        now = monotonic()
+        if now - self._checked_at >= self.interval:
+            self._checked_at = now
+            self._over = self._process.memory_info().rss > self.max_bytes
+        return self._over
+
+
+class AdmissionSlot:
+    """Timing of one admitted call, from admission to release or to the first upstream response"""
+
+    def __init__(self) -> None:
+        self.start = perf_counter()
+        self.first_response_at: Optional[float] = None
+
+    def first_response(self) -> None:
+        """Mark the first upstream chunk of a stream; later time is spent on the client side"""
+        if self.first_response_at is None:
+            self.first_response_at = perf_counter()
+
+    def latency(self) -> float:
+        return (self.first_response_at or perf_counter()) - self.start
+
+
+class AdmissionController:
+    """
+    Adaptive concurrency limit with a bounded wait queue for upstream calls.
+    The limit follows AIMD on observed latency: it grows by ~1 per limit's worth of
+    successful calls while the limit is in use, and is cut by `backoff` when the
+    recent latency (short EWMA) exceeds `tolerance` times the long-run latency or
+    a call fails upstream. At most one cut is applied per window of `limit`
+    completions, so a burst of concurrent failures counts as one signal. Streams
+    report latency to their first upstream chunk (`AdmissionSlot.first_response`)
+    so slow-reading clients are not mistaken for upstream load. Requests beyond the limit wait in a FIFO queue for at
+    most `queue_timeout` seconds; when the queue is full, the wait times out or
+    process memory is above the threshold the request is rejected immediately.
+    """
+
+    def __init__(
+        self,
+        pool: str,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        queue_size: int,
+        queue_timeout: float,
+        tolerance: float = 2.0,
+        backoff: float = 0.9,
+        max_memory_bytes: int = 0,
+    ) -> None:
+        self.pool = pool
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.in_flight = 0
+        self.short_latency: Optional[float] = None
+        self.long_latency: Optional[float] = None
+        # Completions since the last decrease; starts full so the first bad signal applies
+        self._since_decrease = float("inf")
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._memory = _MemoryGuard(max_memory_bytes)
+        self._export()
+
+    @asynccontextmanager
+    async def admit(self):
+        """Hold an admission slot for the duration of an upstream call; yields its AdmissionSlot"""
+        await self._acquire()
+        slot = AdmissionSlot()
+        failed = False
+        try:
+            yield slot
+        except Exception as e:
+            # Requests rejected by the upstream (UpstreamError with retryable=False, e.g. 400) say nothing about its load
+            failed = getattr(e, "retryable", True)
+            raise
+        finally:
+            self._release(slot.latency(), failed)
+
+    def _reject(self, reason: str) -> OverloadedError:
+        ADMISSION_REJECTED.labels(pool=self.pool, reason=reason).inc()
+        logger.warning(f"Shedding {self.pool} request: {reason} (limit {int(self.limit)}, in flight {self.in_flight})")
+        return OverloadedError(self.pool, reason, retry_after=max(1.0, self.short_latency or 1.0))
+
+    async def _acquire(self) -> None:
+        if self._memory.over_limit():
+            raise self._reject("memory")
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            self._export()
+            return
+        if len(self._waiters) >= self.queue_size:
+            raise self._reject("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._export()
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                await waiter
+        except BaseException as e:
+            granted = waiter.done() and not waiter.cancelled()
+            if not granted:
+                self._waiters.remove(waiter)
+                waiter.cancel()
+            elif isinstance(e, TimeoutError):
+                # The slot was handed over just as the deadline hit; keep it
+                return
+            else:
+                # Cancelled after being granted a slot; give it to the next waiter
+                self.in_flight -= 1
+                self._wake()
+            if isinstance(e, TimeoutError):
+                raise self._reject("queue_timeout") from None
+            raise
+        finally:
+            self._export()
+
+    def _release(self, latency: float, failed: bool) -> None:
+        self.in_flight -= 1
+        self._adjust(latency, failed)
+        self._wake()
+        self._export()
+
+    def _adjust(self, latency: float, failed: bool) -> None:
+        if self.long_latency is None:
+            self.short_latency = self.long_latency = latency
+        else:
+            self.short_latency += 0.2 * (latency - self.short_latency)
+            self.long_latency += 0.02 * (latency - self.long_latency)
+
+        self._since_decrease += 1
+        if failed or self.short_latency > self.long_latency * self.tolerance:
+            if self._since_decrease >= self.limit:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._since_decrease = 0
+        elif self.in_flight + 1 >= int(self.limit):
+            # Only grow while the limit is actually the bottleneck
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def _wake(self) -> None:
+        """Hand free slots to the oldest waiters"""
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            self.in_flight += 1
+            waiter.set_result(None)
+
+    def _export(self) -> None:
+        ADMISSION_LIMIT.labels(pool=self.pool).set(int(self.limit))
+        ADMISSION_IN_FLIGHT.labels(pool=self.pool).set(self.in_flight)
+        ADMISSION_QUEUED.labels(pool=self.pool).set(len(self._waiters))
+
+
+def build_admission_controller(pool: str, max_limit: int) -> Optional[AdmissionController]:
+    """Admission controller for an upstream pool, or None when admission control is disabled"""
+    if not settings.ADMISSION_ENABLED:
+        return None
+    return AdmissionController(
+        pool=pool,
+        initial_limit=min(settings.ADMISSION_INITIAL_LIMIT, max_limit),
+        min_limit=min(settings.ADMISSION_MIN_LIMIT, max_limit),
+        max_limit=max_limit,
+        queue_size=settings.ADMISSION_QUEUE_SIZE,
+        queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+        tolerance=settings.ADMISSION_LATENCY_TOLERANCE,
+        max_memory_bytes=settings.ADMISSION_MAX_MEMORY_BYTES,
+    )
+
+
+def admit(controller: Optional[AdmissionController], fallback: Optional[asyncio.Semaphore] = None) -> AsyncContextManager:
+    """
+    Admission slot from `controller`. When admission control is disabled this holds
+    `fallback` instead (a plain concurrency cap), or is a no-op; either yields None.
+    """
+    if controller is not None:
+        return controller.admit()
+    return fallback if fallback is not None else nullcontext()
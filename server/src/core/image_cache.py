@@ -0,0 +1,215 @@
+import re
+import asyncio
+import hashlib
+from loguru import logger
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.core.storage import BaseStorage
+from src.core.image_variants import VARIANT_MEDIA_TYPES
+from src.utils.metrics import CACHE_REQUESTS
+
+
+class ImageCache:
+    """
+    Content-addressed cache for generated images, kept in a storage backend.
+    Images are stored as `<sha256>.png` where the hash covers the rendered prompt
+    and the model name, so identical requests are served from storage without an
+    upstream call and different prompts never overwrite each other.
+    Derivatives (resized WebP/AVIF variants) are stored as `<sha256>_<name>`,
+    count towards the entry's size and are evicted together with the original.
+    On local storage the total size is bounded and least recently used images are
+    evicted first. Shared storage (S3) is filled by every replica, so entries are
+    discovered by listing and objects are never deleted here; expire them with a
+    bucket lifecycle rule instead.
+    """
+
+    _FILE_PATTERN = re.compile(r"^[0-9a-f]{64}\.png$")
+    _VARIANT_PATTERN = re.compile(r"^([0-9a-f]{64})_(\d+w\.[a-z]+)$")
+
+    def __init__(self, storage: BaseStorage, max_bytes: int) -> None:
+        self.storage = storage
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # The index is only changed between awaits, so the event loop serializes updates
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._variants: Dict[str, List[str]] = {}
+        # Called with the key whenever an image is replaced or removed (e.g. to drop in-memory copies)
+        self.on_remove: Optional[Callable[[str], None]] = None
+        self._total_bytes = 0
+        self._loaded = storage.shared
+        self._load_lock = asyncio.Lock()
+
+    @staticmethod
+    def make_key(prompt: str, model_name: str) -> str:
+        """Hash the rendered prompt together with the model name"""
+        return hashlib.sha256(f"{model_name}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    @classmethod
+    def is_valid_name(cls, name: str) -> bool:
+        """Whether `name` is the object name of a cached original image"""
+        return bool(cls._FILE_PATTERN.match(name))
+
+    @staticmethod
+    def name_for(key: str) -> str:
+        return f"{key}.png"
+
+    @staticmethod
+    def variant_name_for(key: str, name: str) -> str:
+        return f"{key}_{name}"
+
+    async def variants(self, key: str) -> List[str]:
+        """Names of the derivatives stored for the key"""
+        await self._ensure_loaded()
+        if key not in self._entries and self.storage.shared:
+            await self._discover(key)
+        return list(self._variants.get(key, ()))
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return the object name of the cached image for the key, or None on a miss"""
+        await self._ensure_loaded()
+        name = self.name_for(key)
+        if key in self._entries:
+            if await self.storage.stat(name) is not None:
+                self._hit(key)
+                await self.storage.touch(name)  # keep LRU order across restarts (without changing the ETag)
+                return name
+            # Object removed behind our back, drop the stale entry
+            await self._remove([self._forget(key)])
+        elif self.storage.shared and await self._discover(key):
+            self._hit(key)
+            return name
+        self.misses += 1
+        CACHE_REQUESTS.labels(cache="image", result="miss").inc()
+        return None
+
+    def _hit(self, key: str) -> None:
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        self.hits += 1
+        CACHE_REQUESTS.labels(cache="image", result="hit").inc()
+
+    async def put(self, key: str, image_data: bytes) -> str:
+        """Write image bytes for the key and evict old entries if needed; returns the object name"""
+        await self._ensure_loaded()
+        name = self.name_for(key)
+        await self.storage.write(name, image_data, "image/png")
+        if key in self._entries:
+            self._total_bytes -= self._entries.pop(key)
+            self._variants.pop(key, None)
+            self._notify(key)
+        self._entries[key] = len(image_data)
+        self._total_bytes += len(image_data)
+        await self._remove(self._evict())
+        return name
+
+    async def put_variants(self, key: str, variants: Dict[str, bytes]) -> List[str]:
+        """Write derivatives of a cached image; returns the stored variant names"""
+        await asyncio.gather(*(
+            self.storage.write(self.variant_name_for(key, name), data, VARIANT_MEDIA_TYPES[name.rsplit(".", 1)[1]])
+            for name, data in variants.items()
+        ))
+        if key not in self._entries and not self.storage.shared:
+            # The original was evicted meanwhile; don't keep orphaned derivatives
+            await self._remove([(key, list(variants))])
+            return []
+        size = sum(len(data) for data in variants.values())
+        self._entries[key] = self._entries.get(key, 0) + size
+        self._total_bytes += size
+        self._variants[key] = sorted(set(self._variants.get(key, [])) | set(variants))
+        stored = list(self._variants[key])
+        await self._remove(self._evict())
+        return stored
+
+    def _forget(self, key: str) -> Tuple[str, List[str]]:
+        self._total_bytes -= self._entries.pop(key, 0)
+        return key, self._variants.pop(key, [])
+
+    async def _remove(self, removed: List[Tuple[str, List[str]]]) -> None:
+        """Delete the objects of forgotten entries (nothing is deleted from shared storage)"""
+        for key, variant_names in removed:
+            if not self.storage.shared:
+                names = [self.name_for(key)] + [self.variant_name_for(key, name) for name in variant_names]
+                await asyncio.gather(*(self.storage.delete(name) for name in names))
+            self._notify(key)
+
+    def _notify(self, key: str) -> None:
+        if self.on_remove is not None:
+            self.on_remove(key)
+
+    def _evict(self) -> List[Tuple[str, List[str]]]:
+        """Drop least recently used entries from the index until it fits; returns what to delete"""
+        evicted = []
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            old_key = next(iter(self._entries))
+            old_size = self._entries[old_key]
+            evicted.append(self._forget(old_key))
+            if not self.storage.shared:
+                self.evictions += 1
+                logger.info(f"Evicted cached image {old_key} ({old_size} bytes)")
+        return evicted
+
+    async def _discover(self, key: str) -> bool:
+        """Look up an image another replica may have stored; True if the original exists"""
+        objects = await self.storage.list(key)
+        if not any(obj.name == self.name_for(key) for obj in objects):
+            return False
+        variant_names = []
+        for obj in objects:
+            match = self._VARIANT_PATTERN.match(obj.name)
+            if match and match.group(1) == key:
+                variant_names.append(match.group(2))
+        self._forget(key)
+        self._entries[key] = sum(obj.size for obj in objects)
+        self._total_bytes += self._entries[key]
+        self._variants[key] = sorted(variant_names)
+        # Shared entries only bound the in-memory index, dropping them deletes nothing
+        self._evict()
+        return True
+
+    async def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if not self._loaded:
+                await self._load_index()
+                self._loaded = True
+
+    async def _load_index(self) -> None:
+        """Rebuild the LRU index from images already in storage, oldest first"""
+        objects = await self.storage.list()
+        originals = sorted(
+            (max(obj.last_used, obj.last_modified), obj.name[:-4], obj.size)
+            for obj in objects if self._FILE_PATTERN.match(obj.name)
+        )
+        for _, key, size in originals:
+            self._entries[key] = size
+            self._total_bytes += size
+        orphans = []
+        for obj in objects:
+            match = self._VARIANT_PATTERN.match(obj.name)
+            if not match:
+                continue
+            key, name = match.groups()
+            if key not in self._entries:
+                orphans.append(obj.name)
+                continue
+            self._entries[key] += obj.size
+            self._total_bytes += obj.size
+            self._variants.setdefault(key, []).append(name)
+        await asyncio.gather(*(self.storage.delete(name) for name in orphans))
+        if originals:
+            logger.info(f"Loaded {len(originals)} cached images ({self._total_bytes} bytes)")
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and current cache size"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+        }
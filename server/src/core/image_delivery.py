@@ -0,0 +1,186 @@
+import threading
+from email.utils import formatdate
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from fastapi import Response
+from fastapi.responses import FileResponse, StreamingResponse
+
+from src.core.storage import BaseStorage
+from src.utils.metrics import CACHE_REQUESTS
+from src.config import settings
+
+
+class CachedImage(NamedTuple):
+    data: bytes
+    etag: str
+    last_modified: str
+
+
+class HotImageCache:
+    """
+    Small in-memory LRU of recently served image files, bounded by total bytes.
+    Entries are keyed by object name; `invalidate` drops an image and its variants
+    when the ImageCache replaces or evicts them.
+    """
+
+    def __init__(self, max_bytes: int, max_item_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CachedImage]" = OrderedDict()
+        self._total_bytes = 0
+
+    def get(self, name: str) -> Optional[CachedImage]:
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                self.misses += 1
+                CACHE_REQUESTS.labels(cache="image_hot", result="miss").inc()
+                return None
+            self._entries.move_to_end(name)
+            self.hits += 1
+            CACHE_REQUESTS.labels(cache="image_hot", result="hit").inc()
+            return entry
+
+    def put(self, name: str, image: CachedImage) -> None:
+        if len(image.data) > self.max_item_bytes:
+            return
+        with self._lock:
+            self._drop(name)
+            self._entries[name] = image
+            self._total_bytes += len(image.data)
+            while self._total_bytes > self.max_bytes and self._entries:
+                _, old = self._entries.popitem(last=False)
+                self._total_bytes -= len(old.data)
+
+    def invalidate(self, key: str) -> None:
+        """Forget every file of the image `key` (the original and its variants)"""
+        with self._lock:
+            for name in [name for name in self._entries if name.startswith(key)]:
+                self._drop(name)
+
+    def _drop(self, name: str) -> None:
+        old = self._entries.pop(name, None)
+        if old is not None:
+            self._total_bytes -= len(old.data)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single `bytes=` range into inclusive (start, end) offsets.
+    Returns None when the header should be ignored (not bytes, several ranges, malformed).
+    Raises:
+        ValueError: the range cannot be satisfied for a body of `size` bytes.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_text, dash, end_text = (part.strip() for part in spec.partition("-"))
+    if not dash or not (start_text or end_text) or not all(t.isdigit() for t in (start_text, end_text) if t):
+        return None
+    if not start_text:
+        # Suffix range: the last N bytes
+        if int(end_text) == 0:
+            raise ValueError("Empty suffix range")
+        return max(0, size - int(end_text)), size - 1
+    start = int(start_text)
+    if end_text and int(end_text) < start:
+        return None
+    if start >= size:
+        raise ValueError("Range not satisfiable")
+    return start, min(int(end_text), size - 1) if end_text else size - 1
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison as required for If-None-Match"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag.removeprefix("W/") in tags
+
+
+class ImageDelivery:
+    """
+    Serves stored images with validators and long-lived cache headers, answering
+    `If-None-Match` with 304 and `Range` with 206. Small images are kept in a
+    HotImageCache, so repeated previews are answered without touching storage;
+    large ones are streamed.
+    """
+
+    def __init__(self, storage: BaseStorage, hot_cache: HotImageCache, cache_control: Optional[str] = None) -> None:
+        self.storage = storage
+        self.hot_cache = hot_cache
+        self.cache_control = cache_control or settings.IMAGE_CACHE_CONTROL
+
+    def _headers(self, name: str, etag: str, last_modified: str) -> Dict[str, str]:
+        return {
+            "ETag": etag,
+            "Last-Modified": last_modified,
+            "Cache-Control": self.cache_control,
+            "Vary": "Accept",
+            "Accept-Ranges": "bytes",
+            "Content-Disposition": f'inline; filename="{name}"',
+        }
+
+    async def respond(
+        self,
+        name: str,
+        media_type: str,
+        if_none_match: Optional[str] = None,
+        range_header: Optional[str] = None,
+    ) -> Optional[Response]:
+        """Response for the stored image `name`, or None if there is no such object"""
+        image = self.hot_cache.get(name)
+        stored = None
+        if image is None:
+            stored = await self.storage.stat(name)
+            if stored is None:
+                return None
+            etag, last_modified = stored.etag, formatdate(stored.last_modified, usegmt=True)
+        else:
+            etag, last_modified = image.etag, image.last_modified
+
+        headers = self._headers(name, etag, last_modified)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+
+        if image is None:
+            if stored.size > self.hot_cache.max_item_bytes:
+                local_path = self.storage.local_path(name)
+                if local_path is not None:
+                    # FileResponse streams from disk and handles Range itself
+                    return FileResponse(local_path, media_type=media_type, headers=headers)
+                del headers["Accept-Ranges"]
+                headers["Content-Length"] = str(stored.size)
+                return StreamingResponse(self.storage.stream(name), media_type=media_type, headers=headers)
+            data = await self.storage.read(name)
+            if data is None:
+                return None
+            image = CachedImage(data, etag, last_modified)
+            self.hot_cache.put(name, image)
+
+        if range_header:
+            try:
+                byte_range = parse_range(range_header, len(image.data))
+            except ValueError:
+                return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{len(image.data)}"})
+            if byte_range is not None:
+                start, end = byte_range
+                headers["Content-Range"] = f"bytes {start}-{end}/{len(image.data)}"
+                return Response(image.data[start:end + 1], status_code=206, media_type=media_type, headers=headers)
+        return Response(image.data, media_type=media_type, headers=headers)
@@ -1,27 +1,48 @@
-from PIL import Image
+import asyncio
 from io import BytesIO
-from pathlib import Path
-from typing import Optional
+from typing import Optional, Set
 from loguru import logger
 
-from src.llm.gemini_client import GeminiImageGeneration
+from src.core.image_cache import ImageCache
+from src.core.storage import build_storage
+from src.core.image_variants import build_variants
+from src.core.admission import OverloadedError, admit, build_admission_controller
 from src.prompts.imagen_prompt import IMAGEN_PROMPT_TEMPLATE
 from src.config import settings
 
 
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
 class ImageGenerator:
     """
     Class to handle image generation using Gemini Image Generation API.
     This class provides methods to generate image prompts based on product details
     and save the generated images to a specified directory.
+    Upstream calls are bounded by IMAGE_MAX_CONCURRENCY. Images are written to the
+    storage backend selected by STORAGE_TYPE and resized WebP/AVIF derivatives are
+    encoded in a process pool in the background, so image requests never block the
+    event loop or wait for encoding.
+    Generated images are content-addressed by prompt and model, so repeated
+    requests are served from the ImageCache without an upstream call.
     """
     def __init__(self) -> None:
-        self.imagen = GeminiImageGeneration()
+        if settings.IMAGE_PROVIDER == "fake":
+            from src.llm.fake import FakeImageClient
+            self.imagen = FakeImageClient()
+        else:
+            # Imported here so google-genai is only loaded once the generator is built
+            from src.llm.gemini_client import GeminiImageGeneration
+            self.imagen = GeminiImageGeneration()
         self.prompt_template = IMAGEN_PROMPT_TEMPLATE
-        self.save_dir = Path(settings.UPLOAD_DIR)
-        self.save_dir.mkdir(parents=True, exist_ok=True)
+        self.storage = build_storage()
+        self.admission = build_admission_controller("image", settings.IMAGE_MAX_CONCURRENCY)
+        # Upstream image calls stay capped at IMAGE_MAX_CONCURRENCY when admission control is disabled
+        self._concurrency = asyncio.Semaphore(settings.IMAGE_MAX_CONCURRENCY) if self.admission is None else None
+        self.cache = ImageCache(self.storage, max_bytes=settings.IMAGE_CACHE_MAX_BYTES)
+        self._renders: Set[asyncio.Task] = set()
 
-    def generate_image_prompt(
+    async def generate_image_prompt(
         self,
         product_name: str,
         brand_name: str,
@@ -29,36 +50,77 @@ class ImageGenerator:
     ) -> Optional[str]:
         """
         Generate image prompt for the given product details.
-        
+
         Args:
             product_name: Name of the product
             brand_name: Brand name of the product
             product_description: Description of the product
-            
+
         Returns:
-            Generated image prompt string
+            Storage object name of the generated (or cached) image
         """
         try:
-            file_name = f"{product_name.replace(' ', '_')}_{brand_name.replace(' ', '_')}.png"
-            file_path = self.save_dir / file_name
             prompt = self.prompt_template.format(
                 product_name=product_name,
                 brand_name=brand_name,
                 product_description=product_description
             )
+            cache_key = self.cache.make_key(prompt, self.imagen.model_name)
+            cached_name = await self.cache.get(cache_key)
+            if cached_name is not None:
+                logger.info(f"Image cache hit: {cached_name}")
+                return cached_name
 
-            response = self.imagen.generate_image(prompt=prompt)
+            async with admit(self.admission, self._concurrency):
+                response = await self.imagen.generate_image(prompt=prompt)
 
+            if not response.candidates or response.candidates[0].content is None:
+                raise RuntimeError("Image model returned no content")
             for part in response.candidates[0].content.parts:
                 if part.text is not None:
                     logger.info(f"Generated text: {part.text}")
                 elif part.inline_data is not None:
-                    image_data = part.inline_data.data
-                    image = Image.open(BytesIO(image_data))
-                    image.save(file_path)
-                    logger.info(f"Image saved to: {file_path}")
-                    return str(file_path)         
+                    name = await self._store(cache_key, part.inline_data.data)
+                    logger.info(f"Image saved as: {name}")
+                    return name
+        except OverloadedError:
+            raise
         except Exception as e:
             logger.error(f"Error generating image prompt: {e}")
             raise RuntimeError(f"Failed to generate image prompt: {e}")
-            
\ No newline at end of file
+
+    async def _store(self, cache_key: str, image_data: bytes) -> str:
+        """Store the original image and start rendering its derivatives in the background"""
+        if not image_data.startswith(PNG_SIGNATURE):
+            image_data = await asyncio.to_thread(self._to_png, image_data)
+        name = await self.cache.put(cache_key, image_data)
+        task = asyncio.create_task(self._store_variants(cache_key, image_data))
+        self._renders.add(task)
+        task.add_done_callback(self._renders.discard)
+        return name
+
+    async def _store_variants(self, cache_key: str, image_data: bytes) -> None:
+        variants = await build_variants(image_data)
+        if variants:
+            try:
+                await self.cache.put_variants(cache_key, variants)
+            except Exception as e:
+                logger.error(f"Storing image variants failed, serving the original only: {e}")
+
+    async def drain(self, timeout: float) -> None:
+        """Wait up to `timeout` seconds for derivatives still being rendered, then cancel them"""
+        if not self._renders:
+            return
+        _, pending = await asyncio.wait(set(self._renders), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    @staticmethod
+    def _to_png(image_data: bytes) -> bytes:
+        """Re-encode image bytes as PNG (runs in a worker thread)"""
+        from PIL import Image
+
+        buffer = BytesIO()
+        Image.open(BytesIO(image_data)).save(buffer, format="PNG")
+        return buffer.getvalue()
@@ -0,0 +1,142 @@
+import asyncio
+import multiprocessing
+from io import BytesIO
+from functools import partial
+from loguru import logger
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Sequence
+
+from src.config import settings
+
+
+# MIME type of each derivative format
+VARIANT_MEDIA_TYPES = {"webp": "image/webp", "avif": "image/avif"}
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def variant_name(width: int, fmt: str) -> str:
+    """File suffix of a derivative, e.g. `512w.webp`"""
+    return f"{width}w.{fmt}"
+
+
+def render_variants(image_data: bytes, widths: Sequence[int], formats: Sequence[str], quality: int) -> Dict[str, bytes]:
+    """
+    Encode resized derivatives of an image (runs in a worker process).
+    Images are never upscaled; widths above the original collapse into one
+    derivative at the original width.
+    Returns:
+        Encoded bytes by variant name.
+    """
+    from PIL import Image
+
+    with Image.open(BytesIO(image_data)) as original:
+        original.load()
+        image = original if original.mode in ("RGB", "RGBA") else original.convert("RGBA")
+        variants = {}
+        for width in sorted(set(min(width, image.width) for width in widths)):
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize((width, height), Image.Resampling.LANCZOS)
+            for fmt in formats:
+                buffer = BytesIO()
+                resized.save(buffer, format=fmt.upper(), quality=quality)
+                variants[variant_name(width, fmt)] = buffer.getvalue()
+        return variants
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Process pool for CPU-bound image encoding, created on first use"""
+    global _pool
+    if _pool is None:
+        # spawn, so workers do not inherit the event loop and upstream connections of the server
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def _ready() -> bool:
+    return True
+
+
+async def warmup_process_pool() -> None:
+    """Start the encoding workers ahead of the first image, spawning them takes about a second"""
+    if settings.IMAGE_VARIANTS_ENABLED:
+        pool, loop = get_process_pool(), asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(pool, _ready) for _ in range(settings.IMAGE_PROCESS_WORKERS)))
+
+
+def shutdown_process_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+
+async def build_variants(image_data: bytes) -> Dict[str, bytes]:
+    """Render the configured derivatives in the process pool; an empty dict if disabled or on failure"""
+    if not settings.IMAGE_VARIANTS_ENABLED or not settings.IMAGE_VARIANT_WIDTHS:
+        return {}
+    task = partial(
+        render_variants,
+        image_data,
+        settings.IMAGE_VARIANT_WIDTHS,
+        settings.IMAGE_VARIANT_FORMATS,
+        settings.IMAGE_VARIANT_QUALITY,
+    )
+    try:
+        return await asyncio.get_running_loop().run_in_executor(get_process_pool(), task)
+    except Exception as e:
+        logger.error(f"Rendering image variants failed, serving the original only: {e}")
+        return {}
+
+
+def accepted_quality(accept: str, media_type: str) -> float:
+    """
+    q-value `accept` gives to `media_type` when listed explicitly (0 if absent).
+    Wildcards such as `image/*` are not enough, since they don't say the format is decoded.
+    """
+    quality = 0.0
+    for media_range in accept.split(","):
+        kind, _, params = media_range.partition(";")
+        if kind.strip().lower() != media_type:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    quality = 0.0
+    return quality
+
+
+def select_variant(
+    available: Sequence[str],
+    width: Optional[int] = None,
+    fmt: Optional[str] = None,
+    accept: Optional[str] = None,
+) -> Optional[str]:
+    """
+    Pick the derivative to serve, or None for the original.
+    Without an explicit format the stored one with the highest q-value in `accept`
+    is used, the most compact on ties; `q=0` excludes a format.
+    The smallest derivative at least `width` wide wins, else the largest one.
+    """
+    if fmt is None and accept:
+        ranked = sorted(
+            ((accepted_quality(accept, VARIANT_MEDIA_TYPES[f]), -rank, f) for rank, f in enumerate(("avif", "webp"))
+             if any(n.endswith(f".{f}") for n in available)),
+            reverse=True
+        )
+        fmt = ranked[0][2] if ranked and ranked[0][0] > 0 else None
+    if fmt is None or fmt not in VARIANT_MEDIA_TYPES:
+        return None
+    candidates = sorted((int(name.split("w.")[0]), name) for name in available if name.endswith(f".{fmt}"))
+    if not candidates:
+        return None
+    if width is None:
+        return candidates[-1][1]
+    return next((name for size, name in candidates if size >= width), candidates[-1][1])
@@ -0,0 +1,189 @@
+import time
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from loguru import logger
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from src.config import settings
+
+
+def make_cache_key(
+    model: str,
+    system_prompt: str,
+    product_payload: str,
+    temperature: float,
+    max_tokens: int,
+    extra: str = "",
+) -> str:
+    """Build a response cache key from the model, hashed prompts and sampling parameters"""
+    system_hash = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+    product_hash = hashlib.sha256(product_payload.encode("utf-8")).hexdigest()
+    return f"{model}|{system_hash}|{product_hash}|{temperature}|{max_tokens}|{extra}"
+
+
+class BaseResponseCache(ABC):
+    """Abstract base class for LLM response caches"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        """Return the cached response for the key, or None"""
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: str) -> None:
+        """Store a response under the key"""
+        pass
+
+    def stats(self) -> Dict[str, int]:
+        """Return cache counters"""
+        return {}
+
+
+class MemoryResponseCache(BaseResponseCache):
+    """In-memory LRU cache with a per-entry time to live"""
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+class DiskResponseCache(BaseResponseCache):
+    """
+    SQLite-backed cache tier that survives process restarts.
+    Expired rows are deleted on startup and then on write, at most once per `prune_interval` seconds.
+    """
+
+    def __init__(self, db_path: str, ttl: float, prune_interval: float = 300.0) -> None:
+        self.ttl = ttl
+        self.prune_interval = prune_interval
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._prune(time.time())
+        self._conn.commit()
+
+    def _prune(self, now: float) -> None:
+        self._conn.execute("DELETE FROM responses WHERE expires_at < ?", (now,))
+        self._pruned_at = now
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM responses WHERE key = ? AND expires_at >= ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            if now - self._pruned_at >= self.prune_interval:
+                self._prune(now)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + self.ttl),
+            )
+            self._conn.commit()
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await asyncio.to_thread(self._get, key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        await asyncio.to_thread(self._set, key, value)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class TieredResponseCache(BaseResponseCache):
+    """
+    Two-tier cache: a fast in-memory LRU in front of an optional disk tier.
+    Disk hits are promoted into memory so subsequent lookups stay in-process.
+    Disk tier errors are logged and treated as misses (or skipped writes).
+    """
+
+    def __init__(self, memory: MemoryResponseCache, disk: Optional[DiskResponseCache] = None) -> None:
+        self.memory = memory
+        self.disk = disk
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self.memory.get(key)
+        if value is None and self.disk is not None:
+            try:
+                value = await self.disk.get(key)
+            except Exception as e:
+                logger.warning(f"Failed to read response cache from disk: {e}")
+            if value is not None:
+                await self.memory.set(key, value)
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        await self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                await self.disk.set(key, value)
+            except Exception as e:
+                logger.warning(f"Failed to write response cache to disk: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        stats = {f"memory_{k}": v for k, v in self.memory.stats().items()}
+        if self.disk is not None:
+            stats.update({f"disk_{k}": v for k, v in self.disk.stats().items()})
+        return stats
+
+
+def build_response_cache() -> Optional[BaseResponseCache]:
+    """Build the response cache configured in settings, or None if disabled"""
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return None
+    memory = MemoryResponseCache(
+        max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+        ttl=settings.RESPONSE_CACHE_TTL,
+    )
+    disk = None
+    if settings.RESPONSE_CACHE_DISK_PATH:
+        disk = DiskResponseCache(
+            settings.RESPONSE_CACHE_DISK_PATH,
+            ttl=settings.RESPONSE_CACHE_TTL,
+            prune_interval=settings.RESPONSE_CACHE_PRUNE_INTERVAL,
+        )
+    return TieredResponseCache(memory, disk)
@@ -0,0 +1,323 @@
+import os
+import time
+import asyncio
+import tempfile
+import hashlib
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from abc import ABC, abstractmethod
+from email.utils import parsedate_to_datetime
+from datetime import datetime
+from typing import AsyncIterator, List, NamedTuple, Optional
+from urllib.parse import quote
+
+from src.llm.http import get_http_pool
+from src.utils.sigv4 import EMPTY_PAYLOAD_HASH, presign_url, sign_request
+from src.config import settings
+
+
+class StorageError(Exception):
+    """Raised when the storage backend fails an operation"""
+    pass
+
+
+class StoredObject(NamedTuple):
+    name: str
+    size: int
+    etag: str  # quoted, usable as an HTTP ETag
+    last_modified: float  # unix timestamp
+    last_used: float = 0.0  # unix timestamp of the last `touch`, 0 if the backend does not track it
+
+
+def shard(name: str) -> str:
+    """Two-level fan-out on the leading (hex) characters, e.g. `ab/cd/abcd...png`"""
+    return f"{name[:2]}/{name[2:4]}/{name}"
+
+
+class BaseStorage(ABC):
+    """
+    Abstract base class for image storage backends.
+    Objects are addressed by flat names (`<sha256>.png`, `<sha256>_512w.webp`);
+    backends decide the physical layout. `shared` backends are visible to every
+    replica, so other processes may add objects at any time.
+    """
+
+    shared: bool = False
+
+    @abstractmethod
+    async def write(self, name: str, data: bytes, content_type: str) -> None:
+        """Store an object, replacing any previous one atomically"""
+        pass
+
+    @abstractmethod
+    async def stat(self, name: str) -> Optional[StoredObject]:
+        """Object metadata, or None if it does not exist"""
+        pass
+
+    @abstractmethod
+    async def read(self, name: str) -> Optional[bytes]:
+        """Whole object, or None if it does not exist"""
+        pass
+
+    @abstractmethod
+    def stream(self, name: str, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+        """Object contents in chunks"""
+        pass
+
+    @abstractmethod
+    async def delete(self, name: str) -> None:
+        """Remove an object; missing objects are ignored"""
+        pass
+
+    @abstractmethod
+    async def list(self, prefix: str = "") -> List[StoredObject]:
+        """Objects whose names start with `prefix`"""
+        pass
+
+    @abstractmethod
+    def url(self, name: str) -> str:
+        """URL clients can fetch the object from"""
+        pass
+
+    def local_path(self, name: str) -> Optional[Path]:
+        """Path on the local filesystem, if the backend has one"""
+        return None
+
+    async def touch(self, name: str) -> None:
+        """Mark an object as recently used"""
+        pass
+
+
+class LocalStorage(BaseStorage):
+    """
+    Objects in a local directory, sharded two levels deep by name so no directory
+    grows past a few hundred entries. Writes go through a temporary file and an
+    atomic rename; blocking file operations run in worker threads.
+    """
+
+    def __init__(self, root: Path, base_url: Optional[str] = None) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.base_url = (base_url or f"{settings.API_V1_PREFIX}/images").rstrip("/")
+
+    def local_path(self, name: str) -> Path:
+        return self.root / shard(name)
+
+    @staticmethod
+    def _object(name: str, stat: os.stat_result) -> StoredObject:
+        # Files are replaced atomically and `touch` leaves mtime alone, so size and mtime identify the content
+        return StoredObject(
+            name, stat.st_size, f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"', stat.st_mtime, stat.st_atime
+        )
+
+    def _write(self, name: str, data: bytes) -> None:
+        path = self.local_path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Unique temporary name: concurrent writes of the same object must not share it
+        with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f"{name}.", suffix=".tmp", delete=False) as tmp:
+            tmp.write(data)
+        try:
+            os.replace(tmp.name, path)
+        except BaseException:
+            os.unlink(tmp.name)
+            raise
+
+    async def write(self, name: str, data: bytes, content_type: str) -> None:
+        await asyncio.to_thread(self._write, name, data)
+
+    async def stat(self, name: str) -> Optional[StoredObject]:
+        try:
+            return self._object(name, await asyncio.to_thread(os.stat, self.local_path(name)))
+        except FileNotFoundError:
+            return None
+
+    async def read(self, name: str) -> Optional[bytes]:
+        try:
+            return await asyncio.to_thread(self.local_path(name).read_bytes)
+        except FileNotFoundError:
+            return None
+
+    async def stream(self, name: str, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+        file = await asyncio.to_thread(open, self.local_path(name), "rb")
+        try:
+            while chunk := await asyncio.to_thread(file.read, chunk_size):
+                yield chunk
+        finally:
+            await asyncio.to_thread(file.close)
+
+    async def delete(self, name: str) -> None:
+        await asyncio.to_thread(self.local_path(name).unlink, missing_ok=True)
+
+    def _list(self, prefix: str) -> List[StoredObject]:
+        if len(prefix) >= 4:
+            directories = [self.local_path(prefix).parent]
+        else:
+            directories = [path for path in self.root.glob("*/*") if path.is_dir()]
+        objects = []
+        for directory in directories:
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory):
+                if entry.is_file() and entry.name.startswith(prefix) and not entry.name.endswith(".tmp"):
+                    objects.append(self._object(entry.name, entry.stat()))
+        return objects
+
+    async def list(self, prefix: str = "") -> List[StoredObject]:
+        return await asyncio.to_thread(self._list, prefix)
+
+    def url(self, name: str) -> str:
+        return f"{self.base_url}/{name}"
+
+    def _touch(self, name: str) -> None:
+        """Record the use in atime; mtime is part of the ETag and must not change"""
+        path = self.local_path(name)
+        os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+
+    async def touch(self, name: str) -> None:
+        try:
+            await asyncio.to_thread(self._touch, name)
+        except OSError:
+            pass
+
+
+class S3Storage(BaseStorage):
+    """
+    Objects in an S3-compatible bucket (AWS S3, MinIO, R2, ...), shared by all replicas.
+    Requests are signed with SigV4 and sent over the shared HTTP pool using
+    path-style addressing. URLs point to STORAGE_PUBLIC_URL when set (e.g. a CDN),
+    otherwise they are presigned.
+    """
+
+    shared = True
+
+    def __init__(
+        self,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        region: str = "us-east-1",
+        endpoint_url: Optional[str] = None,
+        prefix: str = "",
+        public_url: Optional[str] = None,
+        presign_expires: int = 3600,
+    ) -> None:
+        if not bucket or not access_key or not secret_key:
+            raise ValueError("S3 storage requires S3_BUCKET, S3_ACCESS_KEY_ID and S3_SECRET_ACCESS_KEY")
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.endpoint_url = (endpoint_url or f"https://s3.{region}.amazonaws.com").rstrip("/")
+        self.prefix = prefix
+        self.public_url = public_url.rstrip("/") if public_url else None
+        self.presign_expires = presign_expires
+        self.client = get_http_pool().client()
+
+    def _key(self, name: str) -> str:
+        return f"{self.prefix}{shard(name)}"
+
+    def _object_url(self, name: str) -> str:
+        return f"{self.endpoint_url}/{self.bucket}/{quote(self._key(name), safe='/-_.~')}"
+
+    def _headers(self, method: str, url: str, payload_hash: str = EMPTY_PAYLOAD_HASH, **headers: str):
+        return sign_request(method, url, headers, payload_hash, self.access_key, self.secret_key, self.region)
+
+    @staticmethod
+    def _check(response, operation: str) -> None:
+        if response.status_code >= 300:
+            raise StorageError(f"S3 {operation} failed with HTTP {response.status_code}: {response.text[:200]}")
+
+    async def write(self, name: str, data: bytes, content_type: str) -> None:
+        url = self._object_url(name)
+        headers = self._headers("PUT", url, hashlib.sha256(data).hexdigest(), **{"content-type": content_type})
+        response = await self.client.put(url, content=data, headers=headers)
+        self._check(response, "PUT")
+
+    async def stat(self, name: str) -> Optional[StoredObject]:
+        url = self._object_url(name)
+        response = await self.client.head(url, headers=self._headers("HEAD", url))
+        if response.status_code == 404:
+            return None
+        self._check(response, "HEAD")
+        modified = response.headers.get("last-modified")
+        return StoredObject(
+            name,
+            int(response.headers.get("content-length", 0)),
+            response.headers.get("etag", ""),
+            parsedate_to_datetime(modified).timestamp() if modified else 0.0,
+        )
+
+    async def read(self, name: str) -> Optional[bytes]:
+        url = self._object_url(name)
+        response = await self.client.get(url, headers=self._headers("GET", url))
+        if response.status_code == 404:
+            return None
+        self._check(response, "GET")
+        return response.content
+
+    async def stream(self, name: str, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+        url = self._object_url(name)
+        async with self.client.stream("GET", url, headers=self._headers("GET", url)) as response:
+            if response.status_code >= 300:
+                await response.aread()
+            self._check(response, "GET")
+            async for chunk in response.aiter_bytes(chunk_size):
+                yield chunk
+
+    async def delete(self, name: str) -> None:
+        url = self._object_url(name)
+        response = await self.client.delete(url, headers=self._headers("DELETE", url))
+        if response.status_code != 404:
+            self._check(response, "DELETE")
+
+    async def list(self, prefix: str = "") -> List[StoredObject]:
+        key_prefix = self._key(prefix) if len(prefix) >= 4 else self.prefix
+        objects, token = [], None
+        while True:
+            query = f"list-type=2&prefix={quote(key_prefix, safe='-_.~')}"
+            if token:
+                query += f"&continuation-token={quote(token, safe='-_.~')}"
+            url = f"{self.endpoint_url}/{self.bucket}?{query}"
+            response = await self.client.get(url, headers=self._headers("GET", url))
+            self._check(response, "LIST")
+            root = ET.fromstring(response.content)
+            ns = root.tag[:root.tag.index("}") + 1] if root.tag.startswith("{") else ""
+            for item in root.iter(f"{ns}Contents"):
+                name = item.findtext(f"{ns}Key", "").rsplit("/", 1)[-1]
+                if not name.startswith(prefix):
+                    continue
+                modified = item.findtext(f"{ns}LastModified")
+                objects.append(StoredObject(
+                    name,
+                    int(item.findtext(f"{ns}Size", "0")),
+                    item.findtext(f"{ns}ETag", ""),
+                    datetime.fromisoformat(modified.replace("Z", "+00:00")).timestamp() if modified else 0.0,
+                ))
+            token = root.findtext(f"{ns}NextContinuationToken")
+            if root.findtext(f"{ns}IsTruncated") != "true" or not token:
+                return objects
+
+    def url(self, name: str) -> str:
+        if self.public_url:
+            return f"{self.public_url}/{quote(self._key(name), safe='/-_.~')}"
+        return presign_url(
+            "GET", self._object_url(name), self.access_key, self.secret_key, self.region, self.presign_expires
+        )
+
+
+def build_storage() -> BaseStorage:
+    """Build the storage backend selected by STORAGE_TYPE"""
+    if settings.STORAGE_TYPE == "local":
+        return LocalStorage(Path(settings.UPLOAD_DIR), base_url=settings.STORAGE_PUBLIC_URL)
+    if settings.STORAGE_TYPE == "s3":
+        return S3Storage(
+            bucket=settings.S3_BUCKET,
+            access_key=settings.S3_ACCESS_KEY_ID,
+            secret_key=settings.S3_SECRET_ACCESS_KEY,
+            region=settings.S3_REGION,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            prefix=settings.S3_PREFIX,
+            public_url=settings.STORAGE_PUBLIC_URL,
+            presign_expires=settings.S3_PRESIGN_EXPIRES,
+        )
+    raise ValueError(f"Unsupported STORAGE_TYPE: {settings.STORAGE_TYPE}")
@@ -1,8 +1,19 @@
 from abc import ABC, abstractmethod
-from typing import AsyncIterator
+from typing import AsyncIterator, List
 
 class BaseLLMClient(ABC):
     """Abstract base class for LLM clients"""
+
+    model_name: str
+
+    @property
+    def model_names(self) -> List[str]:
+        """Models that may serve a call, in order of preference"""
+        return [self.model_name]
+
+    def served_model(self) -> str:
+        """Model that served the last call made from the current context"""
+        return self.model_name
     
     @abstractmethod
     async def generate_text(
@@ -0,0 +1,201 @@
+import zlib
+import random
+import struct
+import asyncio
+from time import perf_counter
+from types import SimpleNamespace
+from loguru import logger
+from typing import AsyncIterator, Dict, List, Optional
+
+from src.config import settings
+from src.llm.base import BaseLLMClient
+from src.llm.resilience import ResilientCaller, UpstreamError
+from src.utils.metrics import INTER_TOKEN_GAP, TIME_TO_FIRST_TOKEN, current_request_labels, track_upstream
+
+
+_WORDS = (
+    "Discover the new {product} - crafted for people who expect more. "
+    "Lightweight, durable and designed with care, it fits right into your everyday routine. "
+    "Whether you are at home, at work or on the go, enjoy premium quality at a price that makes sense. "
+    "Limited stock available, so grab yours today and feel the difference from the very first use! "
+    "Free shipping on every order and a thirty day money back guarantee. "
+).split(" ")
+
+
+class FakeUpstream:
+    """Shared latency and error model for the fake providers"""
+
+    def __init__(self, error_rate: float, jitter: float, seed: Optional[int] = None) -> None:
+        self.error_rate = error_rate
+        self.jitter = jitter
+        self.random = random.Random(seed)
+
+    def delay(self, seconds: float) -> float:
+        """`seconds` with uniform relative jitter applied"""
+        if not self.jitter:
+            return seconds
+        return max(0.0, seconds * self.random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def maybe_fail(self, provider: str) -> None:
+        if self.error_rate and self.random.random() < self.error_rate:
+            raise UpstreamError(f"{provider} injected failure (503)", status_code=503, retryable=True)
+
+
+class FakeLLMClient(BaseLLMClient):
+    """
+    Offline stand-in for the OpenAI-compatible client, selected with LLM_PROVIDER=fake.
+    Emulates time to first token, a steady token rate and a retryable error rate,
+    and streams word-sized deltas, so the server can be load tested without keys.
+    Calls go through a ResilientCaller like OpenAIClient's, so injected errors are
+    retried and slow calls hedged.
+    """
+
+    def __init__(
+        self,
+        ttft: Optional[float] = None,
+        tokens_per_second: Optional[float] = None,
+        output_tokens: Optional[int] = None,
+        error_rate: Optional[float] = None,
+        model_name: Optional[str] = None,
+        provider: str = "fake",
+    ) -> None:
+        self.model_name = model_name or "fake-llm"
+        self.provider = provider
+        self.ttft = settings.FAKE_LLM_TTFT if ttft is None else ttft
+        self.tokens_per_second = settings.FAKE_LLM_TOKENS_PER_SECOND if tokens_per_second is None else tokens_per_second
+        self.output_tokens = settings.FAKE_LLM_OUTPUT_TOKENS if output_tokens is None else output_tokens
+        self.upstream = FakeUpstream(
+            settings.FAKE_LLM_ERROR_RATE if error_rate is None else error_rate,
+            settings.FAKE_LATENCY_JITTER,
+            settings.FAKE_SEED,
+        )
+        self.resilience = ResilientCaller(self.provider)
+
+    def _tokens(self, data_product: str, max_tokens: int) -> List[str]:
+        """Deterministic ad-like text for the product, one list item per token"""
+        # The product payload starts with "product_name: ..."
+        product = data_product.splitlines()[0].split(": ", 1)[-1][:40] if data_product else "product"
+        words = [word.format(product=product) for word in _WORDS if word]
+        count = min(self.output_tokens, max_tokens)
+        return [words[i % len(words)] + " " for i in range(count)]
+
+    async def generate_text(
+        self,
+        system: str,
+        data_product: str,
+        max_tokens: int = 1000,
+        temperature: float = 1.0,
+        **kwargs
+    ) -> str:
+        tokens = self._tokens(data_product, max_tokens)
+
+        async def attempt() -> str:
+            async with track_upstream(self.provider, self.model_name, "chat"):
+                await asyncio.sleep(self.upstream.delay(self.ttft + len(tokens) / self.tokens_per_second))
+                self.upstream.maybe_fail(self.provider)
+            return "".join(tokens).strip()
+
+        return await self.resilience.call(attempt)
+
+    async def generate_text_streaming(
+        self,
+        system: str,
+        data_product: str,
+        max_tokens: int = 1000,
+        temperature: float = 1.0,
+        stream: bool = True,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        labels = current_request_labels(self.model_name)
+        tokens = self._tokens(data_product, max_tokens)
+        async with track_upstream(self.provider, self.model_name, "chat_stream"):
+            start = perf_counter()
+
+            async def connect() -> None:
+                await asyncio.sleep(self.upstream.delay(self.ttft))
+                self.upstream.maybe_fail(self.provider)
+
+            # As with OpenAIClient only opening the stream is retried, and it is not hedged
+            await self.resilience.call(connect, hedge=False)
+            last_token_at = None
+            for token in tokens:
+                if last_token_at is not None:
+                    await asyncio.sleep(self.upstream.delay(1 / self.tokens_per_second))
+                now = perf_counter()
+                if last_token_at is None:
+                    TIME_TO_FIRST_TOKEN.labels(**labels).observe(now - start)
+                else:
+                    INTER_TOKEN_GAP.labels(**labels).observe(now - last_token_at)
+                last_token_at = now
+                yield token
+
+    async def health_check(self) -> bool:
+        return True
+
+    def generate_image(self):
+        pass
+
+    async def warmup(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+def _png(size: int, seed: int) -> bytes:
+    """Valid RGB PNG of roughly `size` bytes; noise pixels keep it from compressing"""
+    side = max(1, int((size / 3) ** 0.5))
+    noise = random.Random(seed).randbytes(side * side * 3)
+    raw = b"".join(b"\x00" + noise[row * side * 3:(row + 1) * side * 3] for row in range(side))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", side, side, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 1)) + chunk(b"IEND", b"")
+
+
+class FakeImageClient:
+    """
+    Offline stand-in for the Gemini image client, selected with IMAGE_PROVIDER=fake.
+    Sleeps for the configured latency and returns a response shaped like Gemini's
+    with a PNG payload of about FAKE_IMAGE_BYTES.
+    """
+
+    def __init__(
+        self,
+        latency: Optional[float] = None,
+        image_bytes: Optional[int] = None,
+        error_rate: Optional[float] = None,
+    ) -> None:
+        self.model_name = "fake-image"
+        self.provider = "fake"
+        self.latency = settings.FAKE_IMAGE_LATENCY if latency is None else latency
+        self.image_bytes = settings.FAKE_IMAGE_BYTES if image_bytes is None else image_bytes
+        self.upstream = FakeUpstream(
+            settings.FAKE_IMAGE_ERROR_RATE if error_rate is None else error_rate,
+            settings.FAKE_LATENCY_JITTER,
+            settings.FAKE_SEED,
+        )
+        self._payloads: Dict[int, bytes] = {}
+
+    def _payload(self, prompt: str) -> bytes:
+        # A few distinct payloads are enough; encoding one per request would dominate CPU
+        seed = zlib.crc32(prompt.encode()) % 8
+        if seed not in self._payloads:
+            self._payloads[seed] = _png(self.image_bytes, seed)
+        return self._payloads[seed]
+
+    async def generate_image(self, prompt: str) -> SimpleNamespace:
+        logger.info(f"Generating image with model: {self.model_name}")
+        async with track_upstream(self.provider, self.model_name, "generate_image"):
+            await asyncio.sleep(self.upstream.delay(self.latency))
+            self.upstream.maybe_fail(self.provider)
+        parts = [
+            SimpleNamespace(text="Here is your product image.", inline_data=None),
+            SimpleNamespace(text=None, inline_data=SimpleNamespace(mime_type="image/png", data=self._payload(prompt))),
+        ]
+        return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=parts))])
+
+    async def warmup(self) -> None:
+        pass
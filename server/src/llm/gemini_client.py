@@ -1,13 +1,28 @@
-from PIL import Image
+import asyncio
+import httpx
 from loguru import logger
-from typing import Optional, Tuple, Union
+from typing import Optional
 from google import genai
+from google.genai import errors as genai_errors
 from google.genai import types as genai_types
 
 from src.llm.base import BaseLLMClient
+from src.llm.http import get_http_pool
+from src.llm.resilience import RETRYABLE_STATUS_CODES, UpstreamError
+from src.utils.metrics import track_upstream
+from src.utils.logger import sampled_logger
 from src.config import settings
 
 
+def _upstream_error(error: Exception) -> UpstreamError:
+    """Classify a Gemini SDK or transport error, so admission control and metrics see upstream failures"""
+    if isinstance(error, genai_errors.APIError):
+        retryable = error.code in RETRYABLE_STATUS_CODES or error.code >= 500
+        return UpstreamError(f"Gemini API error: {error}", status_code=error.code, retryable=retryable)
+    retryable = isinstance(error, (httpx.TransportError, TimeoutError))
+    return UpstreamError(f"Gemini request failed: {error!r}", retryable=retryable)
+
+
 class GeminiImageGeneration(BaseLLMClient):
     """
     GeminiImageGeneration is a client for interacting with the Gemini 2.0 Flash Preview Image Generation
@@ -23,42 +38,60 @@ class GeminiImageGeneration(BaseLLMClient):
         if not self.api_key:
             raise ValueError("Gemini API key is required")
         
-        self.client = genai.Client(api_key=self.api_key)
+        pool = get_http_pool()
+        self.total_timeout = settings.HTTP_TOTAL_TIMEOUT
+        self.client = genai.Client(
+            api_key=self.api_key,
+            http_options=genai_types.HttpOptions(
+                timeout=int(self.total_timeout * 1000),  # milliseconds
+                # Passing the shared transport makes the async client use the shared pool
+                async_client_args={"transport": pool.transport},
+            )
+        )
 
-    def generate_image(
+    async def generate_image(
         self, 
         prompt: str,
-    ) -> Optional[Union[Image.Image, Tuple[Image.Image, str]]]:
+    ) -> genai_types.GenerateContentResponse:
         """
-        Generate image using Gemini 2.0 Flash Preview Image Generation
+        Generate image using Gemini 2.0 Flash Preview Image Generation.
+        Uses the async Gemini client so the event loop is never blocked
+        while waiting for the upstream response.
         
         Args:
             prompt: Text prompt for image generation
-            save_path: Optional path to save the image
             
         Returns:
-            PIL Image object or tuple of (Image, saved_path) if save_path provided
+            GenerateContentResponse containing the image parts
+        Raises:
+            UpstreamError: the request failed, with its status and whether it is retryable
         """
         try:
-            logger.info(f"Generating image with prompt: {prompt[:100]}...")
+            logger.info(f"Generating image with model: {self.model_name}")
+            sampled_logger.debug(f"Image prompt: {prompt[:100]}...")
             
             # Generate content with Gemini
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt,
-                config=genai_types.GenerateContentConfig(
-                    response_modalities=['TEXT', 'IMAGE'],
-                    temperature=1.0,
-                    top_p=1,
-                    top_k=32,
-                    max_output_tokens=1024,
+            async with track_upstream("gemini", self.model_name, "generate_image"), asyncio.timeout(self.total_timeout):
+                response = await self.client.aio.models.generate_content(
+                    model=self.model_name,
+                    contents=prompt,
+                    config=genai_types.GenerateContentConfig(
+                        response_modalities=['TEXT', 'IMAGE'],
+                        temperature=1.0,
+                        top_p=1,
+                        top_k=32,
+                        max_output_tokens=1024,
+                    )
                 )
-            )
             return response
         except Exception as e:
             logger.error(f"Error generating image with Gemini: {e}")
-            return None
+            raise _upstream_error(e) from e
     
+    async def warmup(self) -> None:
+        """Open a connection to the Gemini API by fetching the model metadata"""
+        await self.client.aio.models.get(model=self.model_name)
+
     def generate_text(self):
         pass
 
@@ -0,0 +1,128 @@
+import httpx
+from loguru import logger
+from typing import Dict, Optional
+
+from src.config import settings
+from src.utils.metrics import REGISTRY
+
+
+class _SharedTransport(httpx.AsyncBaseTransport):
+    """
+    View of the pool's transport handed to clients. Closing a client closes its
+    transport, so closing is a no-op here; only SharedHTTPPool.aclose closes the pool.
+    """
+
+    def __init__(self, transport: httpx.AsyncHTTPTransport) -> None:
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        pass
+
+
+class SharedHTTPPool:
+    """
+    Connection pool shared by all upstream LLM clients.
+    Holds a single httpx transport (one keep-alive pool) configured from Settings;
+    each client wraps it in its own httpx.AsyncClient. Clients only get a view of
+    the transport that ignores close, so one client closing (e.g. a router backend)
+    never cuts off the others; closing the pool on shutdown closes every upstream
+    connection at once.
+    """
+
+    def __init__(self) -> None:
+        http2 = settings.HTTP2_ENABLED
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("HTTP2_ENABLED is set but the 'h2' package is not installed, falling back to HTTP/1.1")
+                http2 = False
+
+        self.http2 = http2
+        self.limits = httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        )
+        self.timeout = httpx.Timeout(
+            connect=settings.HTTP_CONNECT_TIMEOUT,
+            read=settings.HTTP_READ_TIMEOUT,
+            write=settings.HTTP_WRITE_TIMEOUT,
+            pool=settings.HTTP_POOL_TIMEOUT,
+        )
+        self._transport = httpx.AsyncHTTPTransport(limits=self.limits, http2=http2)
+        self.transport = _SharedTransport(self._transport)
+        self.closed = False
+
+    def client(self, **kwargs) -> httpx.AsyncClient:
+        """Create an httpx client that sends requests through the shared pool"""
+        return httpx.AsyncClient(transport=self.transport, timeout=self.timeout, **kwargs)
+
+    def utilization(self) -> Optional[Dict[str, int]]:
+        """
+        Report the number of open, busy and idle connections and queued requests.
+        httpx has no public API for this, so it reads httpcore internals and
+        returns None if they are not what this code expects.
+        """
+        try:
+            pool = self._transport._pool
+            connections = list(pool.connections)
+            idle = sum(1 for connection in connections if connection.is_idle())
+            queued = sum(1 for request in pool._requests if request.is_queued())
+        except (AttributeError, TypeError):
+            return None
+        return {
+            "max_connections": self.limits.max_connections or 0,
+            "connections": len(connections),
+            "active": len(connections) - idle,
+            "idle": idle,
+            "queued_requests": queued,
+        }
+
+    async def aclose(self) -> None:
+        if not self.closed:
+            self.closed = True
+            await self._transport.aclose()
+
+
+# Singleton pool instance
+_http_pool_instance: Optional[SharedHTTPPool] = None
+
+def get_http_pool() -> SharedHTTPPool:
+    """Get singleton shared HTTP pool instance"""
+    global _http_pool_instance
+    if _http_pool_instance is None or _http_pool_instance.closed:
+        _http_pool_instance = SharedHTTPPool()
+    return _http_pool_instance
+
+def _render_pool_metrics() -> str:
+    """Shared pool utilization, read at scrape time"""
+    if _http_pool_instance is None or _http_pool_instance.closed:
+        return ""
+    stats = _http_pool_instance.utilization()
+    if stats is None:
+        return ""
+    lines = [
+        "# HELP adgen_http_pool_connections Upstream HTTP pool connections by state.",
+        "# TYPE adgen_http_pool_connections gauge",
+        f'adgen_http_pool_connections{{state="active"}} {stats["active"]}',
+        f'adgen_http_pool_connections{{state="idle"}} {stats["idle"]}',
+        "# HELP adgen_http_pool_max_connections Configured upper bound of the upstream HTTP pool.",
+        "# TYPE adgen_http_pool_max_connections gauge",
+        f"adgen_http_pool_max_connections {stats['max_connections']}",
+        "# HELP adgen_http_pool_queued_requests Requests waiting for a free upstream connection.",
+        "# TYPE adgen_http_pool_queued_requests gauge",
+        f"adgen_http_pool_queued_requests {stats['queued_requests']}",
+    ]
+    return "\n".join(lines)
+
+REGISTRY.add_collector(_render_pool_metrics)
+
+async def close_http_pool() -> None:
+    """Close the shared pool and every upstream connection in it"""
+    if _http_pool_instance is not None:
+        await _http_pool_instance.aclose()
+        logger.info("Closed shared upstream HTTP pool")
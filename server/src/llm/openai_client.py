@@ -1,8 +1,19 @@
 import openai
+import asyncio
+from time import perf_counter
 from openai import AsyncOpenAI
 from typing import Optional, AsyncIterator
 from src.config import settings
 from src.llm.base import BaseLLMClient
+from src.llm.http import get_http_pool
+from src.llm.resilience import ResilientCaller, UpstreamError, classify_error
+from src.llm.single_flight import SingleFlight, StreamFanout, make_flight_key
+from src.utils.metrics import (
+    INTER_TOKEN_GAP,
+    TIME_TO_FIRST_TOKEN,
+    current_request_labels,
+    track_upstream
+)
 
 
 class OpenAIClient(BaseLLMClient):
@@ -10,24 +21,55 @@ class OpenAIClient(BaseLLMClient):
     OpenAIClient is a client for interacting with the OpenAI API.
     It supports both synchronous and asynchronous operations for generating text and streaming responses.
     It requires an API key and a model name to be initialized.
+    Identical concurrent requests are coalesced into a single upstream call
+    (or a single shared upstream stream) when SINGLE_FLIGHT_ENABLED is set.
+    Upstream calls go through a ResilientCaller for retries and optional hedging.
     """
     
-    def __init__(self, api_key: Optional[str] = None, model_name: Optional[str] = None) -> None:
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model_name: Optional[str] = None,
+        base_url: Optional[str] = None,
+        provider: str = "lunos"
+    ) -> None:
         """
         Initialize the OpenAIClient with an API key and model name.
         If no API key is provided, it will use the one from settings.
         If no model name is provided, it defaults to "google/gemma-3-12b-it".
+        If no base URL is provided, it uses LUNOS_BASE_URL; `provider` labels its metrics.
         """
         self.api_key = api_key or settings.LUNOS_API_KEY
         self.model_name = model_name or settings.DEFAULT_MODEL_NAME
+        self.base_url = base_url or settings.LUNOS_BASE_URL
+        self.provider = provider
 
         if not self.api_key:
             raise ValueError("Lunos API key is required")
         
         self.client = AsyncOpenAI(
             api_key=self.api_key,
-            base_url=settings.LUNOS_BASE_URL
+            base_url=self.base_url,
+            http_client=get_http_pool().client(),
+            timeout=get_http_pool().timeout,
+            max_retries=0  # retries are handled by ResilientCaller
         )
+        self.resilience = ResilientCaller(provider)
+        self.total_timeout = settings.HTTP_TOTAL_TIMEOUT
+        self.single_flight_enabled = settings.SINGLE_FLIGHT_ENABLED
+        self._single_flight = SingleFlight()
+        self._stream_fanout = StreamFanout()
+
+    def _flight_key(self, system: str, data_product: str, max_tokens: int, temperature: float, **kwargs) -> str:
+        return make_flight_key(
+            model=self.model_name,
+            system=system,
+            data_product=data_product,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **kwargs
+        )
+
     async def generate_text(
         self, 
         system: str,
@@ -35,26 +77,55 @@ class OpenAIClient(BaseLLMClient):
         max_tokens: int = 1000, 
         temperature: float = 1.0,
         **kwargs
+    ) -> str:
+        """Generate text using the OpenAI API, coalescing identical in-flight requests"""
+        if not self.single_flight_enabled:
+            return await self._generate_text(system, data_product, max_tokens, temperature, **kwargs)
+        key = self._flight_key(system, data_product, max_tokens, temperature, **kwargs)
+        return await self._single_flight.do(
+            key,
+            lambda: self._generate_text(system, data_product, max_tokens, temperature, **kwargs)
+        )
+
+    async def _generate_text(
+        self, 
+        system: str,
+        data_product: str, 
+        max_tokens: int = 1000, 
+        temperature: float = 1.0,
+        **kwargs
     ) -> str:
         """Generate text using the OpenAI API"""
-        try:
-            response = await self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {"role": "system", "content": system},
-                    {"role": "user", "content": data_product}
-                ],
-                max_tokens=max_tokens,
-                temperature=temperature,
-                **kwargs
-            )
-            
+        async def attempt() -> str:
+            async with track_upstream(self.provider, self.model_name, "chat"), asyncio.timeout(self.total_timeout):
+                response = await self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=[
+                        {"role": "system", "content": system},
+                        {"role": "user", "content": data_product}
+                    ],
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    **kwargs
+                )
             return response.choices[0].message.content.strip()
-            
+
+        try:
+            return await self.resilience.call(attempt)
         except openai.APIError as e:
-            raise Exception(f"Lunor API error: {str(e)}")
+            raise UpstreamError(
+                f"Lunor API error: {str(e)}",
+                status_code=getattr(e, "status_code", None),
+                retryable=classify_error(e)[0]
+            ) from e
+        except UpstreamError:
+            raise
         except Exception as e:
-            raise Exception(f"Text generation failed: {str(e)}")
+            raise UpstreamError(
+                f"Text generation failed: {str(e)}",
+                status_code=getattr(e, "status_code", None),
+                retryable=classify_error(e)[0]
+            ) from e
     
 
     async def generate_text_streaming(
@@ -66,33 +137,84 @@ class OpenAIClient(BaseLLMClient):
             stream: bool = True,
             **kwargs
         ) -> AsyncIterator[str]:
+        """Generate text with streaming response, sharing one upstream stream between identical requests"""
+        if not self.single_flight_enabled:
+            async for chunk in self._generate_text_streaming(system, data_product, max_tokens, temperature, stream, **kwargs):
+                yield chunk
+            return
+        key = self._flight_key(system, data_product, max_tokens, temperature, **kwargs)
+        async for chunk in self._stream_fanout.subscribe(
+            key,
+            lambda: self._generate_text_streaming(system, data_product, max_tokens, temperature, stream, **kwargs)
+        ):
+            yield chunk
+
+    async def _generate_text_streaming(
+            self, 
+            system: str, 
+            data_product: str,
+            max_tokens: int = 1000, 
+            temperature: float = 1.0,
+            stream: bool = True,
+            **kwargs
+        ) -> AsyncIterator[str]:
         """Generate text with streaming response"""
+        labels = current_request_labels(self.model_name)
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {"role": "system", "content": system},
-                    {"role": "user", "content": data_product}
-                ],
-                max_tokens=max_tokens,
-                temperature=temperature,
-                stream=stream,
-                **kwargs
-            )
-            async for chunk in response:
-                if chunk.choices[0].delta.content:
-                    yield chunk.choices[0].delta.content
+            async with track_upstream(self.provider, self.model_name, "chat_stream"):
+                start = perf_counter()
+                last_token_at = None
+
+                async def connect():
+                    async with asyncio.timeout(self.total_timeout):
+                        return await self.client.chat.completions.create(
+                            model=self.model_name,
+                            messages=[
+                                {"role": "system", "content": system},
+                                {"role": "user", "content": data_product}
+                            ],
+                            max_tokens=max_tokens,
+                            temperature=temperature,
+                            stream=stream,
+                            **kwargs
+                        )
+
+                # Only opening the stream is retried; once tokens flow a failure cannot be replayed.
+                # Not hedged, since a losing stream could not be closed cleanly.
+                response = await self.resilience.call(connect, hedge=False)
+                async for chunk in response:
+                    if perf_counter() - start > self.total_timeout:
+                        await response.close()
+                        raise TimeoutError(f"Streaming exceeded total timeout of {self.total_timeout}s")
+                    if chunk.choices[0].delta.content:
+                        now = perf_counter()
+                        if last_token_at is None:
+                            TIME_TO_FIRST_TOKEN.labels(**labels).observe(now - start)
+                        else:
+                            INTER_TOKEN_GAP.labels(**labels).observe(now - last_token_at)
+                        last_token_at = now
+                        yield chunk.choices[0].delta.content
         except openai.APIError as e:
-            raise Exception(f"Lunor API error: {str(e)}")
+            raise UpstreamError(
+                f"Lunor API error: {str(e)}",
+                status_code=getattr(e, "status_code", None),
+                retryable=classify_error(e)[0]
+            ) from e
+        except UpstreamError:
+            raise
         except Exception as e:
-            raise Exception(f"Text generation streaming failed: {str(e)}")
+            raise UpstreamError(
+                f"Text generation streaming failed: {str(e)}",
+                status_code=getattr(e, "status_code", None),
+                retryable=classify_error(e)[0]
+            ) from e
         
     async def health_check(self) -> bool:
         """Check if OpenAI API is accessible"""
         try:
             # Simple test request
             await self.client.chat.completions.create(
-                model=self.model,
+                model=self.model_name,
                 messages=[{"role": "user", "content": "test"}],
                 max_tokens=1
             )
@@ -101,4 +223,16 @@ class OpenAIClient(BaseLLMClient):
             return False
         
     def generate_image(self):
-        pass
\ No newline at end of file
+        pass
+
+    async def warmup(self) -> None:
+        """Open a connection to the upstream API without spending tokens"""
+        try:
+            await self.client.models.list()
+        except openai.APIStatusError:
+            # Any HTTP response means the connection (and TLS session) is established
+            pass
+
+    async def close(self) -> None:
+        """Close the underlying HTTP client"""
+        await self.client.close()
@@ -0,0 +1,189 @@
+import random
+import asyncio
+import threading
+from time import perf_counter
+from collections import deque
+from loguru import logger
+from typing import Awaitable, Callable, Optional, Tuple, TypeVar
+
+import openai
+
+from src.config import settings
+from src.utils.metrics import UPSTREAM_HEDGES, UPSTREAM_RETRIES
+
+
+T = TypeVar("T")
+
+# HTTP statuses worth another attempt: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class UpstreamError(Exception):
+    """Upstream provider error that keeps its HTTP status and whether it was retryable"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retryable: bool = False) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+
+
+def _retry_after(response) -> Optional[float]:
+    """Seconds to wait according to the Retry-After header, if present and numeric"""
+    if response is None:
+        return None
+    try:
+        return max(float(response.headers.get("retry-after")), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(error: BaseException) -> Tuple[bool, Optional[float]]:
+    """
+    Decide whether an upstream error is worth retrying.
+    Returns:
+        (retryable, retry_after) where retry_after is the delay requested by the server, if any.
+    """
+    if isinstance(error, UpstreamError):
+        return error.retryable, None
+    if isinstance(error, (openai.APIConnectionError, TimeoutError)):
+        return True, None
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500:
+            return True, _retry_after(error.response)
+        return False, None
+    return False, None
+
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies"""
+
+    def __init__(self, window: int = 200) -> None:
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float, min_samples: int = 20) -> Optional[float]:
+        """Latency at quantile `q` (0-1), or None until enough samples were observed"""
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class AttemptBudget:
+    """Upper bound on upstream attempts (first try, retries and hedges) for a single request"""
+
+    def __init__(self, max_attempts: int) -> None:
+        self.remaining = max_attempts
+
+    def take(self) -> bool:
+        if self.remaining <= 0:
+            return False
+        self.remaining -= 1
+        return True
+
+
+class ResilientCaller:
+    """
+    Runs upstream calls with classified retries and optional hedging.
+    Retryable errors (connection errors, timeouts, 408/429/5xx) are retried with
+    full-jitter exponential backoff, honouring Retry-After. When hedging is enabled
+    and a call has not finished by the observed latency percentile, an identical
+    second call is started; the first to succeed wins and the other is cancelled.
+    Retries and hedges share a per-request attempt budget.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        max_retries: Optional[int] = None,
+        base_delay: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        hedge_enabled: Optional[bool] = None,
+        hedge_percentile: Optional[float] = None,
+        hedge_min_delay: Optional[float] = None,
+        attempt_budget: Optional[int] = None,
+    ) -> None:
+        self.provider = provider
+        self.max_retries = settings.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.base_delay = settings.LLM_RETRY_BASE_DELAY if base_delay is None else base_delay
+        self.max_delay = settings.LLM_RETRY_MAX_DELAY if max_delay is None else max_delay
+        self.hedge_enabled = settings.LLM_HEDGE_ENABLED if hedge_enabled is None else hedge_enabled
+        self.hedge_percentile = settings.LLM_HEDGE_PERCENTILE if hedge_percentile is None else hedge_percentile
+        self.hedge_min_delay = settings.LLM_HEDGE_MIN_DELAY if hedge_min_delay is None else hedge_min_delay
+        self.attempt_budget = settings.LLM_ATTEMPT_BUDGET if attempt_budget is None else attempt_budget
+        self.latency = LatencyTracker()
+
+    def backoff(self, retry: int) -> float:
+        """Full-jitter exponential backoff for the given retry number (0-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** retry)))
+
+    def hedge_delay(self) -> Optional[float]:
+        """How long to wait before hedging, or None when hedging is off or not enough latency data yet"""
+        if not self.hedge_enabled:
+            return None
+        observed = self.latency.percentile(self.hedge_percentile)
+        if observed is None:
+            return None
+        return max(observed, self.hedge_min_delay)
+
+    async def call(self, fn: Callable[[], Awaitable[T]], hedge: bool = True) -> T:
+        """
+        Call `fn` with retries (and hedging unless `hedge` is False).
+        `fn` must start a fresh, independent upstream request on every call.
+        """
+        budget = AttemptBudget(self.attempt_budget)
+        retry = 0
+        while True:
+            budget.take()
+            try:
+                return await self._attempt(fn, budget, hedge)
+            except Exception as e:
+                retryable, retry_after = classify_error(e)
+                if not retryable or retry >= self.max_retries or budget.remaining <= 0:
+                    raise
+                delay = min(retry_after, self.max_delay) if retry_after is not None else self.backoff(retry)
+                UPSTREAM_RETRIES.labels(provider=self.provider, error_type=type(e).__name__).inc()
+                logger.warning(f"Retrying {self.provider} call in {delay:.2f}s after {type(e).__name__}: {e}")
+                retry += 1
+                await asyncio.sleep(delay)
+
+    async def _timed(self, fn: Callable[[], Awaitable[T]]) -> T:
+        start = perf_counter()
+        result = await fn()
+        self.latency.observe(perf_counter() - start)
+        return result
+
+    async def _attempt(self, fn: Callable[[], Awaitable[T]], budget: AttemptBudget, hedge: bool) -> T:
+        delay = self.hedge_delay() if hedge else None
+        if delay is None:
+            return await self._timed(fn)
+
+        primary = asyncio.create_task(self._timed(fn))
+        tasks = {primary}
+        hedged = False
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and budget.take():
+                hedged = True
+                tasks.add(asyncio.create_task(self._timed(fn)))
+                logger.debug(f"Hedging {self.provider} call after {delay:.3f}s")
+
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if hedged:
+                            winner = "primary" if task is primary else "hedge"
+                            UPSTREAM_HEDGES.labels(provider=self.provider, winner=winner).inc()
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
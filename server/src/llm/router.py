@@ -0,0 +1,292 @@
+import random
+from contextvars import ContextVar
+from time import monotonic, perf_counter
+from loguru import logger
+from typing import AsyncIterator, List, Optional
+
+from src.config import settings
+from src.config.settings import LLMBackendConfig
+from src.llm.base import BaseLLMClient
+from src.llm.openai_client import OpenAIClient
+from src.llm.resilience import UpstreamError
+from src.utils.metrics import Gauge
+
+
+BACKEND_STATE = Gauge(
+    "adgen_llm_backend_state",
+    "Circuit breaker state per LLM backend (0 closed, 1 half-open, 2 open).",
+    ("backend",),
+)
+BACKEND_LATENCY = Gauge(
+    "adgen_llm_backend_latency_ewma_seconds",
+    "Exponentially weighted moving average of successful call latency per LLM backend.",
+    ("backend",),
+)
+BACKEND_ERROR_RATE = Gauge(
+    "adgen_llm_backend_error_rate_ewma",
+    "Exponentially weighted moving average of the error rate per LLM backend.",
+    ("backend",),
+)
+
+
+# Model of the backend that served the last call in the current task
+_served_model: ContextVar[Optional[str]] = ContextVar("served_model", default=None)
+
+
+class CircuitBreaker:
+    """
+    Per-backend circuit breaker.
+    Opens after `failure_threshold` consecutive failures. Once `recovery_time` has
+    passed it turns half-open and lets a single probe request through: success
+    closes the circuit, failure opens it again. A probe that never reports back
+    (e.g. a cancelled stream) is replaced after another `recovery_time`.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+    def __init__(self, failure_threshold: int, recovery_time: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at: Optional[float] = None
+
+    def available(self) -> bool:
+        """Whether the backend can be considered at all (closed, or due for a probe)"""
+        return self.state != self.OPEN or monotonic() - self.opened_at >= self.recovery_time
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now (claims the probe slot when half-open)"""
+        now = monotonic()
+        if self.state == self.OPEN and now - self.opened_at >= self.recovery_time:
+            self.state = self.HALF_OPEN
+            self.probe_started_at = None
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and (
+            self.probe_started_at is None or now - self.probe_started_at >= self.recovery_time
+        ):
+            self.probe_started_at = now
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self.probe_started_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.probe_started_at = None
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = monotonic()
+
+
+class Backend:
+    """An LLM endpoint in the router pool with its live latency and error statistics"""
+
+    _STATE_VALUES = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+
+    def __init__(self, name: str, client: BaseLLMClient, weight: float = 1.0, alpha: float = 0.3) -> None:
+        self.name = name
+        self.client = client
+        self.weight = weight
+        self.alpha = alpha
+        self.latency_ewma: Optional[float] = None
+        self.error_ewma = 0.0
+        self.breaker = CircuitBreaker(settings.LLM_BREAKER_FAILURE_THRESHOLD, settings.LLM_BREAKER_RECOVERY_TIME)
+
+    def score(self) -> float:
+        """Lower is better: expected latency inflated by the error rate, divided by the weight"""
+        latency = self.latency_ewma if self.latency_ewma is not None else 0.0
+        return latency * (1 + 10 * self.error_ewma) / self.weight
+
+    def record_success(self, latency: float) -> None:
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma += self.alpha * (latency - self.latency_ewma)
+        self.error_ewma -= self.alpha * self.error_ewma
+        self.breaker.record_success()
+        self._export()
+
+    def record_failure(self) -> None:
+        self.error_ewma += self.alpha * (1 - self.error_ewma)
+        previous = self.breaker.state
+        self.breaker.record_failure()
+        if self.breaker.state == CircuitBreaker.OPEN and previous != CircuitBreaker.OPEN:
+            logger.warning(f"Circuit opened for LLM backend {self.name}")
+        self._export()
+
+    def _export(self) -> None:
+        BACKEND_STATE.labels(backend=self.name).set(self._STATE_VALUES[self.breaker.state])
+        BACKEND_ERROR_RATE.labels(backend=self.name).set(self.error_ewma)
+        if self.latency_ewma is not None:
+            BACKEND_LATENCY.labels(backend=self.name).set(self.latency_ewma)
+
+
+# Non-retryable statuses that still point at the backend (bad key, unknown model) rather than the request
+BACKEND_FAILURE_STATUS_CODES = {401, 403, 404}
+
+
+def _is_backend_failure(error: Exception) -> bool:
+    """Client errors (non-retryable upstream errors such as 400) say nothing about backend health"""
+    if isinstance(error, UpstreamError) and not error.retryable:
+        return error.status_code in BACKEND_FAILURE_STATUS_CODES
+    return True
+
+
+class LLMRouter(BaseLLMClient):
+    """
+    Routes LLM requests over a pool of OpenAI-compatible backends.
+    Each request picks the better of two weighted-random candidates by latency/error
+    EWMA ("power of two choices"), skipping backends whose circuit is open. When a
+    backend fails (retryable errors, and 401/403/404 which point at its key or model),
+    the request fails over to the next candidate; streams only fail over before the
+    first token. Other client errors such as 400 are raised without failover. `model_name` is the first backend's model; the
+    model that actually answered a call is reported by `served_model()`.
+    """
+
+    def __init__(self, backends: List[Backend]) -> None:
+        if not backends:
+            raise ValueError("LLM router needs at least one backend")
+        self.backends = backends
+        self.model_name = backends[0].client.model_name
+
+    @property
+    def model_names(self) -> List[str]:
+        return list(dict.fromkeys(backend.client.model_name for backend in self.backends))
+
+    def served_model(self) -> str:
+        return _served_model.get() or self.model_name
+
+    def _candidates(self) -> List[Backend]:
+        """Backends to try in order; the first is the better of two distinct weighted-random picks"""
+        available = [backend for backend in self.backends if backend.breaker.available()]
+        if not available:
+            return []
+        first = random.choices(available, weights=[backend.weight for backend in available])[0]
+        others = [backend for backend in available if backend is not first]
+        second = random.choices(others, weights=[backend.weight for backend in others])[0] if others else first
+        best = min((first, second), key=Backend.score)
+        rest = sorted((backend for backend in available if backend is not best), key=Backend.score)
+        return [best] + rest
+
+    async def generate_text(
+        self,
+        system: str,
+        data_product: str,
+        max_tokens: int = 1000,
+        temperature: float = 1.0,
+        **kwargs
+    ) -> str:
+        error: Optional[Exception] = None
+        for backend in self._candidates():
+            if not backend.breaker.allow():
+                continue
+            start = perf_counter()
+            try:
+                result = await backend.client.generate_text(system, data_product, max_tokens, temperature, **kwargs)
+            except Exception as e:
+                if not _is_backend_failure(e):
+                    # The backend answered, the request itself was rejected
+                    backend.breaker.record_success()
+                    raise
+                backend.record_failure()
+                logger.warning(f"LLM backend {backend.name} failed, trying next backend: {e}")
+                error = e
+                continue
+            backend.record_success(perf_counter() - start)
+            _served_model.set(backend.client.model_name)
+            return result
+        raise error or UpstreamError("No LLM backend available", status_code=503, retryable=True)
+
+    async def generate_text_streaming(
+        self,
+        system: str,
+        data_product: str,
+        max_tokens: int = 1000,
+        temperature: float = 1.0,
+        stream: bool = True,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        error: Optional[Exception] = None
+        for backend in self._candidates():
+            if not backend.breaker.allow():
+                continue
+            start = perf_counter()
+            started = False
+            try:
+                async for chunk in backend.client.generate_text_streaming(
+                    system, data_product, max_tokens, temperature, stream, **kwargs
+                ):
+                    if not started:
+                        # Time to first token is the latency signal for streams
+                        backend.record_success(perf_counter() - start)
+                        _served_model.set(backend.client.model_name)
+                        started = True
+                    yield chunk
+                if not started:
+                    backend.record_success(perf_counter() - start)
+                    _served_model.set(backend.client.model_name)
+                return
+            except Exception as e:
+                if not _is_backend_failure(e):
+                    backend.breaker.record_success()
+                    raise
+                backend.record_failure()
+                if started:
+                    # Tokens were already sent to the caller, a retry would duplicate them
+                    raise
+                logger.warning(f"LLM backend {backend.name} failed before streaming, trying next backend: {e}")
+                error = e
+        raise error or UpstreamError("No LLM backend available", status_code=503, retryable=True)
+
+    async def health_check(self) -> bool:
+        for backend in self.backends:
+            if await backend.client.health_check():
+                return True
+        return False
+
+    def generate_image(self):
+        pass
+
+    async def warmup(self) -> None:
+        for backend in self.backends:
+            try:
+                await backend.client.warmup()
+            except Exception as e:
+                logger.warning(f"Warmup of LLM backend {backend.name} failed: {e}")
+
+    async def close(self) -> None:
+        for backend in self.backends:
+            await backend.client.close()
+
+
+def build_backend(config: LLMBackendConfig) -> Backend:
+    if config.provider == "fake":
+        from src.llm.fake import FakeLLMClient
+        client: BaseLLMClient = FakeLLMClient(model_name=config.model_name, provider=config.name)
+    else:
+        client = OpenAIClient(
+            api_key=config.api_key,
+            model_name=config.model_name,
+            base_url=config.base_url,
+            provider=config.name,
+        )
+    return Backend(config.name, client, weight=config.weight, alpha=settings.LLM_ROUTER_EWMA_ALPHA)
+
+
+def build_llm_client() -> BaseLLMClient:
+    """The fake client for LLM_PROVIDER=fake, the router when LLM_BACKENDS is configured, otherwise a single OpenAIClient"""
+    if settings.LLM_PROVIDER == "fake":
+        from src.llm.fake import FakeLLMClient
+        logger.warning("Using the fake LLM provider")
+        return FakeLLMClient()
+    if not settings.LLM_BACKENDS:
+        return OpenAIClient()
+    backends = [build_backend(config) for config in settings.LLM_BACKENDS]
+    logger.info(f"LLM router with backends: {', '.join(backend.name for backend in backends)}")
+    return LLMRouter(backends)
@@ -0,0 +1,119 @@
+import asyncio
+import hashlib
+from loguru import logger
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+
+def make_flight_key(**params: Any) -> str:
+    """Build a normalized key from request parameters (order independent)"""
+    normalized = "\x00".join(f"{k}={params[k]!r}" for k in sorted(params))
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls into one upstream call.
+    The first caller for a key starts the call; callers arriving while it is
+    in flight await the same result (or exception) instead of issuing their own.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda finished: self._finished(key, finished))
+        else:
+            logger.debug(f"Joining in-flight request {key[:12]}")
+        # Shield so one caller disconnecting does not cancel the shared call
+        return await asyncio.shield(task)
+
+    def _finished(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Retrieve the error so a call every waiter gave up on is not logged as never retrieved
+            task.exception()
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+
+class _SharedStream:
+    """Buffer of one upstream stream that several subscribers read from"""
+
+    def __init__(self) -> None:
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.changed = asyncio.Condition()
+        self.task: Optional[asyncio.Task] = None
+
+
+class StreamFanout:
+    """
+    Share one upstream stream between concurrent identical streaming requests.
+    Late joiners first receive a replay of the chunks they missed, then follow
+    the live stream. The upstream is cancelled once every subscriber has left.
+    """
+
+    def __init__(self) -> None:
+        self._streams: Dict[str, _SharedStream] = {}
+
+    async def subscribe(self, key: str, fn: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        stream = self._streams.get(key)
+        if stream is None:
+            stream = _SharedStream()
+            self._streams[key] = stream
+            stream.task = asyncio.ensure_future(self._pump(key, stream, fn))
+        else:
+            logger.debug(f"Joining in-flight stream {key[:12]} at chunk {len(stream.chunks)}")
+
+        stream.subscribers += 1
+        position = 0
+        try:
+            while True:
+                async with stream.changed:
+                    await stream.changed.wait_for(
+                        lambda: position < len(stream.chunks) or stream.done
+                    )
+                    pending = stream.chunks[position:]
+                    finished = stream.done
+                for chunk in pending:
+                    yield chunk
+                position += len(pending)
+                if finished and position >= len(stream.chunks):
+                    break
+            if stream.error is not None:
+                raise stream.error
+        finally:
+            stream.subscribers -= 1
+            if stream.subscribers == 0 and not stream.done:
+                # Detach before cancelling, so a request arriving meanwhile starts a fresh upstream
+                # instead of joining one that is about to fail with CancelledError
+                if self._streams.get(key) is stream:
+                    del self._streams[key]
+                if stream.task is not None:
+                    stream.task.cancel()
+
+    async def _pump(self, key: str, stream: _SharedStream, fn: Callable[[], AsyncIterator[str]]) -> None:
+        try:
+            async for chunk in fn():
+                async with stream.changed:
+                    stream.chunks.append(chunk)
+                    stream.changed.notify_all()
+        except asyncio.CancelledError:
+            stream.error = asyncio.CancelledError()
+        except Exception as e:
+            stream.error = e
+        finally:
+            # New requests for this key start a fresh upstream from here on
+            if self._streams.get(key) is stream:
+                del self._streams[key]
+            async with stream.changed:
+                stream.done = True
+                stream.changed.notify_all()
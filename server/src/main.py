@@ -1,20 +1,49 @@
+import hmac
+import math
 from loguru import logger
 from datetime import datetime
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from typing import Annotated, Optional
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from src.api.v1.ad_routers import router as ad_router
-from src.api.v1.imagen_router import router as imagen_router
+from src.api.dependency import get_service_container, InFlightMiddleware
+from src.core.admission import OverloadedError
+from src.models.requests import LogLevel
+from src.utils.metrics import REGISTRY
+from src.utils.rate_limit import RateLimitMiddleware
+from src.utils.logger import (
+    RequestContextMiddleware,
+    level_filter,
+    set_log_level,
+    setup_logging
+)
 from src.config import settings
 
 
-logger.add("logger.log", rotation="10 MB", retention="10 days", level="DEBUG")
+setup_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build and warm up services on startup, drain and close them on shutdown"""
+    container = get_service_container()
+    await container.startup()
+    yield
+    await container.shutdown()
+    await logger.complete()
+
 
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
     debug=settings.DEBUG,
     description=settings.APP_DESCRIPTION,
+    lifespan=lifespan,
 )
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  
@@ -22,6 +51,18 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestContextMiddleware, sample_rate=settings.LOG_SAMPLE_RATE)
+app.add_middleware(InFlightMiddleware, container=get_service_container())
+
+@app.exception_handler(OverloadedError)
+async def overloaded_handler(request: Request, exc: OverloadedError):
+    """Requests shed by admission control get 503 with a Retry-After hint"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": {"error": "overloaded", "reason": exc.reason, "message": str(exc)}},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
+
 
 # add router healthcheck
 @app.get("/healthcheck")
@@ -35,6 +76,45 @@ async def health_check():
     }
 
 
+@app.get("/readiness")
+async def readiness_check():
+    """Readiness endpoint; returns 503 until startup warmup is done and while draining"""
+    container = get_service_container()
+    if not container.ready:
+        raise HTTPException(
+            status_code=503,
+            detail={"status": "draining" if container.draining else "starting"}
+        )
+    return {"status": "ready", "timestamp": datetime.now().isoformat()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics endpoint"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/log-level", response_model=LogLevel)
+async def get_log_level():
+    """Current log level"""
+    return LogLevel(level=level_filter.level)
+
+
+@app.put("/log-level", response_model=LogLevel)
+async def update_log_level(request: LogLevel, x_admin_token: Annotated[Optional[str], Header()] = None):
+    """Change the log level at runtime (e.g. DEBUG, INFO, WARNING); needs LOG_LEVEL_ADMIN_TOKEN"""
+    expected = settings.LOG_LEVEL_ADMIN_TOKEN
+    if not expected or x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail="Changing the log level requires a valid X-Admin-Token")
+    try:
+        return LogLevel(level=set_log_level(request.level))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Unknown log level: {request.level}")
+
+
 # Register API router
 app.include_router(ad_router)
-app.include_router(imagen_router)
\ No newline at end of file
+if settings.ENABLE_IMAGE_ROUTER:
+    # Only imported when enabled, so text-only deployments never load the imaging stack
+    from src.api.v1.imagen_router import router as imagen_router
+    app.include_router(imagen_router)
\ No newline at end of file
@@ -1,9 +1,11 @@
-from .requests import AdGenerationRequest
-from .response import AdGenerationResponse, ProductInfo, AdSettings
+from .requests import AdGenerationRequest, AdVariantsRequest
+from .response import AdGenerationResponse, AdVariantsResponse, ProductInfo, AdSettings
 
 __all__ = [
     "AdGenerationRequest",
+    "AdVariantsRequest",
     "AdGenerationResponse",
+    "AdVariantsResponse",
     "ProductInfo",
     "AdSettings"
 ]
\ No newline at end of file
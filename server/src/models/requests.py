@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Optional, List, Literal, Tuple, Union
 from pydantic import BaseModel, Field
 from enum import Enum
 
@@ -20,6 +20,9 @@ class AdGenerationRequest(BaseModel):
     ad_type: Optional[str] = Field(None, max_length=50)
     ad_tone: Optional[str] = Field(None, max_length=50)
 
+    # caching
+    bypass_cache: bool = Field(False, description="Skip the response cache and always call the LLM")
+
 
 class ImageGenerationRequest(BaseModel):
     """Request model for standalone image generation"""
@@ -28,6 +31,11 @@ class ImageGenerationRequest(BaseModel):
     description: str = Field(None)
     
 
+class LogLevel(BaseModel):
+    """Runtime log level setting"""
+    level: str = Field(..., description="Log level name, e.g. DEBUG, INFO, WARNING")
+
+
 class AdType(str, Enum):
     SOCIAL_MEDIA = "social_media"
     EMAIL = "email"
@@ -42,3 +50,29 @@ class AdTone(str, Enum):
     MINIMALIST = "minimalist"
     BOLD = "bold"
     CONVERSATIONAL = "conversational"
+
+
+# Request fields that control generation and are not part of the product payload
+NON_PRODUCT_FIELDS = {"ad_type", "ad_tone", "bypass_cache", "variants"}
+
+
+class AdVariant(BaseModel):
+    """A single ad type and tone combination"""
+    ad_type: AdType
+    ad_tone: AdTone
+
+
+class AdVariantsRequest(AdGenerationRequest):
+    """Product input with several ad type/tone combinations to generate at once"""
+    variants: Union[Literal["all"], List[AdVariant]] = Field(
+        ...,
+        description='List of ad type/tone combinations, or "all" for every combination'
+    )
+
+    def resolve_variants(self) -> List[Tuple[str, str]]:
+        """Expand the requested variants into unique (ad_type, ad_tone) pairs"""
+        if self.variants == "all":
+            pairs = [(t.value, n.value) for t in AdType for n in AdTone]
+        else:
+            pairs = [(v.ad_type.value, v.ad_tone.value) for v in self.variants]
+        return list(dict.fromkeys(pairs))
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional, Literal, List
+from typing import Optional, Literal, List, Dict
 from decimal import Decimal
 
 class ProductInfo(BaseModel):
@@ -8,10 +8,10 @@ class ProductInfo(BaseModel):
     product_name: str
     brand: Optional[str]
     category: List[str]
-    description: str
+    description: Optional[str]
     price: Optional[Decimal]
     discounted_price: Optional[Decimal]
-    store_link: str
+    store_link: Optional[str]
 
 class AdSettings(BaseModel):
     """Settings for ad generation"""
@@ -24,6 +24,16 @@ class ImageResult(BaseModel):
     image_url: Optional[str] = None  # URL for accessing the image
     source: str  # "uploaded", "url", "generated"
     generated: bool = False  # True if AI generated
+    variants: List[str] = []  # derivatives served by /images/{file_name}, e.g. "512w.webp"
+
+class ImageJobStatus(BaseModel):
+    """Status of a background image generation job"""
+    job_id: str = Field(description="Unique job identifier")
+    status: Literal["queued", "running", "completed", "failed"]
+    result: Optional[ImageResult] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
 
 class AdGenerationResponse(BaseModel):
     """Complete response for ad generation"""
@@ -34,10 +44,19 @@ class AdGenerationResponse(BaseModel):
     # Metadata
     product_info: ProductInfo
     ad_settings: AdSettings
-    # image_info: ImageInfo
+    image_info: Optional[ImageResult] = Field(None, description="Generated product image, when requested and successful")
     
     # Generation metadata
     generation_time: float = Field(description="Total generation time in seconds")
     model_used: str = Field(description="AI model used for generation")
     request_id: str = Field(description="Unique request identifier")
+    cached: bool = Field(False, description="True if served from the response cache")
+    timestamp: datetime = Field(default_factory=datetime.now)
+
+class AdVariantsResponse(BaseModel):
+    """Response for multi-variant ad generation, keyed by `ad_type:ad_tone`"""
+    variants: Dict[str, AdGenerationResponse] = Field(default_factory=dict)
+    errors: Dict[str, str] = Field(default_factory=dict, description="Error message per failed variant")
+    generation_time: float = Field(description="Total generation time in seconds")
+    request_id: str = Field(description="Unique request identifier")
     timestamp: datetime = Field(default_factory=datetime.now)
@@ -0,0 +1,155 @@
+import os
+import math
+import asyncio
+import hashlib
+from pathlib import Path
+from loguru import logger
+from pydantic import BaseModel
+from typing import Dict, List, Optional, Tuple
+
+from src.prompts.templates import FlexibleAdPromptGenerator
+from src.config import settings
+
+
+class CompiledPrompt(BaseModel):
+    """A fully rendered system prompt for one ad type and tone"""
+    ad_type: str
+    ad_tone: str
+    text: str
+    version: str  # content hash, changes whenever the rendered prompt changes
+    char_length: int
+    token_estimate: int
+
+
+class PromptRegistry:
+    """
+    Precompiled, versioned system prompts for every ad type x tone combination.
+    Built-in templates from FlexibleAdPromptGenerator can be overridden (or extended)
+    by files in PROMPT_TEMPLATES_DIR:
+
+        <dir>/base/<ad_type>.txt   base template containing `{tone_instructions}`
+        <dir>/tones/<ad_tone>.txt  tone modifier
+
+    Edited files are picked up without a restart by a background task (`start`)
+    that checks the directory every `reload_interval` seconds in a worker thread,
+    so file I/O never runs on the event loop. A reload compiles a complete new
+    table and swaps it in with a single assignment, so in-flight requests keep
+    the prompt they already fetched; a broken template keeps the previous table.
+    """
+
+    def __init__(self, templates_dir: Optional[str] = None, reload_interval: float = 5.0) -> None:
+        self.templates_dir = Path(templates_dir) if templates_dir else None
+        self.reload_interval = reload_interval
+        self._prompts: Dict[Tuple[str, str], CompiledPrompt] = {}
+        self._snapshot: Dict[str, float] = {}
+        self._watcher: Optional[asyncio.Task] = None
+        self.reload(strict=True)
+
+    def start(self) -> None:
+        """Start watching the templates directory for edits (no-op without one)"""
+        if self.templates_dir is not None and self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                await asyncio.to_thread(self.reload_if_changed)
+            except Exception as e:
+                logger.error(f"Checking prompt templates failed: {e}")
+
+    def get(self, ad_type: str, ad_tone: str) -> CompiledPrompt:
+        """Return the compiled prompt for the combination"""
+        key = (getattr(ad_type, "value", ad_type), getattr(ad_tone, "value", ad_tone))
+        prompt = self._prompts.get(key)
+        if prompt is None:
+            types = {t for t, _ in self._prompts}
+            if key[0] not in types:
+                raise ValueError(f"No base template found for ad type: {ad_type}")
+            raise ValueError(f"No tone modifier found for tone: {ad_tone}")
+        return prompt
+
+    def list(self) -> List[CompiledPrompt]:
+        """Return all compiled prompts"""
+        return list(self._prompts.values())
+
+    def reload_if_changed(self) -> bool:
+        """Reload templates if any file in the templates directory was added, removed or edited"""
+        snapshot = self._scan()
+        if snapshot == self._snapshot:
+            return False
+        return self.reload()
+
+    def reload(self, strict: bool = False) -> bool:
+        """Compile all templates and atomically swap them in"""
+        snapshot = self._scan()
+        try:
+            prompts = self._compile()
+        except Exception as e:
+            if strict:
+                raise
+            logger.error(f"Prompt reload failed, keeping previous templates: {e}")
+            self._snapshot = snapshot
+            return False
+        self._prompts = prompts
+        self._snapshot = snapshot
+        logger.info(f"Compiled {len(prompts)} prompts")
+        return True
+
+    def _scan(self) -> Dict[str, float]:
+        if self.templates_dir is None:
+            return {}
+        snapshot = {}
+        for sub in ("base", "tones"):
+            directory = self.templates_dir / sub
+            if directory.is_dir():
+                for entry in os.scandir(directory):
+                    if entry.is_file() and entry.name.endswith(".txt"):
+                        snapshot[entry.path] = entry.stat().st_mtime
+        return snapshot
+
+    def _load_overrides(self, sub: str) -> Dict[str, str]:
+        directory = self.templates_dir / sub if self.templates_dir else None
+        if directory is None or not directory.is_dir():
+            return {}
+        return {path.stem: path.read_text(encoding="utf-8") for path in directory.glob("*.txt")}
+
+    def _compile(self) -> Dict[Tuple[str, str], CompiledPrompt]:
+        base_templates = {t.value: text for t, text in FlexibleAdPromptGenerator.BASE_TEMPLATES.items()}
+        tone_modifiers = {t.value: text for t, text in FlexibleAdPromptGenerator.TONE_MODIFIERS.items()}
+        base_templates.update(self._load_overrides("base"))
+        tone_modifiers.update(self._load_overrides("tones"))
+
+        prompts = {}
+        for ad_type, base_template in base_templates.items():
+            for ad_tone, tone_modifier in tone_modifiers.items():
+                text = base_template.format(tone_instructions=tone_modifier)
+                prompts[(ad_type, ad_tone)] = CompiledPrompt(
+                    ad_type=ad_type,
+                    ad_tone=ad_tone,
+                    text=text,
+                    version=hashlib.sha256(text.encode("utf-8")).hexdigest()[:12],
+                    char_length=len(text),
+                    token_estimate=math.ceil(len(text) / 4),  # ~4 characters per token
+                )
+        return prompts
+
+
+# Singleton registry instance
+_prompt_registry_instance: Optional[PromptRegistry] = None
+
+def get_prompt_registry() -> PromptRegistry:
+    """Get singleton prompt registry instance"""
+    global _prompt_registry_instance
+    if _prompt_registry_instance is None:
+        _prompt_registry_instance = PromptRegistry(
+            templates_dir=settings.PROMPT_TEMPLATES_DIR,
+            reload_interval=settings.PROMPT_RELOAD_INTERVAL,
+        )
+    return _prompt_registry_instance
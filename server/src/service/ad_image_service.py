@@ -0,0 +1,116 @@
+import asyncio
+from time import time
+from loguru import logger
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from src.models import AdGenerationRequest, AdGenerationResponse
+from src.models.requests import ImageGenerationRequest
+from src.models.response import ImageResult
+from src.service.ad_service import get_ad_service, AdService
+from src.service.imagen_service import get_imagen_service, ImageService
+from src.core.admission import OverloadedError
+from src.utils.streaming import prime_stream
+
+
+class AdImageService:
+    """
+    Service to generate the ad text and the product image of one product together.
+    Both upstream calls start at once, so a complete ad takes as long as the slower
+    of the two instead of their sum. The image is optional: if it fails the ad text
+    is still returned, while a failed ad cancels the image.
+    """
+
+    def __init__(self, ad_service: AdService, imagen_service: ImageService) -> None:
+        self.ad_service = ad_service
+        self.imagen_service = imagen_service
+
+    @property
+    def model_name(self) -> str:
+        """Name of the LLM model used for the ad text"""
+        return self.ad_service.model_name
+
+    def _start_image(self, request: AdGenerationRequest) -> "asyncio.Task[Optional[ImageResult]]":
+        image_request = ImageGenerationRequest(
+            product_name=request.product_name,
+            brand_name=request.brand_name,
+            description=request.description
+        )
+        task = asyncio.create_task(self.imagen_service.generate_image(image_request))
+        # The task is not awaited when the ad fails, so its exception must be retrieved here
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+    @staticmethod
+    async def _image_outcome(task: "asyncio.Task[Optional[ImageResult]]") -> Tuple[Optional[ImageResult], Optional[str]]:
+        """Wait for the image; returns the result or the reason it is missing"""
+        try:
+            result = await task
+        except OverloadedError as e:
+            logger.warning(f"Image skipped, upstream overloaded: {e}")
+            return None, str(e)
+        except Exception as e:
+            logger.error(f"Image generation failed: {e}")
+            return None, str(e)
+        if result is None:
+            return None, "Image generation failed"
+        return result, None
+
+    async def generate(self, request: AdGenerationRequest, **kwargs) -> AdGenerationResponse:
+        """
+        Generate the ad and its image concurrently.
+        Args:
+            request: AdGenerationRequest containing product details and ad settings.
+        Returns:
+            AdGenerationResponse with `image_info` set, or None if the image failed.
+        """
+        start = time()
+        image_task = self._start_image(request)
+        try:
+            response = await self.ad_service.generate_ad(request, **kwargs)
+        except BaseException:
+            image_task.cancel()
+            raise
+        response.image_info, _ = await self._image_outcome(image_task)
+        response.generation_time = time() - start
+        return response
+
+    async def generate_streaming(self, request: AdGenerationRequest, **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream the ad text while the image is generated, then emit the image as the final chunk.
+        Raises OverloadedError before the first chunk when the ad text is rejected by
+        admission control, so callers can still answer with 503.
+        Args:
+            request: AdGenerationRequest containing product details and ad settings.
+        Returns:
+            AsyncIterator yielding the ad chunks followed by an `image` or `image_failed` chunk.
+        """
+        chunks = await prime_stream(self.ad_service.generate_ad_streaming(request, **kwargs))
+
+        async def stream() -> AsyncIterator[Dict[str, Any]]:
+            # Started on first iteration, so nothing is left running if the response is never sent
+            image_task = self._start_image(request)
+            try:
+                async for chunk in chunks:
+                    yield chunk
+                    if chunk.get("status") == "error":
+                        return
+                image_info, error = await self._image_outcome(image_task)
+                if image_info is not None:
+                    yield {"status": "image", "image_info": image_info.model_dump(mode="json")}
+                else:
+                    yield {"status": "image_failed", "error_code": "image_generation_failed", "message": error}
+            finally:
+                # Ad failed or client disconnected: don't keep generating the image
+                image_task.cancel()
+
+        return stream()
+
+
+# Singleton service instance
+_ad_image_service_instance: Optional[AdImageService] = None
+
+def get_ad_image_service() -> AdImageService:
+    """Get singleton ad+image service instance"""
+    global _ad_image_service_instance
+    if _ad_image_service_instance is None:
+        _ad_image_service_instance = AdImageService(get_ad_service(), get_imagen_service())
+    return _ad_image_service_instance
@@ -1,10 +1,18 @@
+import asyncio
+from time import time
 from loguru import logger
-from typing import AsyncIterator, Dict, Any, Optional
+from typing import AsyncIterator, Dict, Any, List, Optional
 from src.models import (
     AdGenerationRequest,
-    AdGenerationResponse
+    AdGenerationResponse,
+    AdVariantsRequest,
+    AdVariantsResponse
 )
 from src.core.ad_generator import AIAdGenerator
+from src.core.admission import OverloadedError
+from src.utils.helpers import generate_request_id
+from src.utils.logger import sampled_logger, sampled_var
+from src.config import settings
 
 
 class AdService:
@@ -15,6 +23,19 @@ class AdService:
     def __init__(self) -> None:
         self.ad_generator = AIAdGenerator()
 
+    @property
+    def model_name(self) -> str:
+        """Name of the LLM model used for generation"""
+        return self.ad_generator.llm.model_name
+
+    async def warmup(self) -> None:
+        """Pre-open the upstream LLM connection"""
+        await self.ad_generator.llm.warmup()
+
+    async def close(self) -> None:
+        """Close the upstream LLM client"""
+        await self.ad_generator.llm.close()
+
     async def generate_ad(self, request: AdGenerationRequest, **kwargs) -> AdGenerationResponse:
         """
         Generate an ad based on the provided request details.
@@ -28,6 +49,8 @@ class AdService:
             response = await self.ad_generator.generate(request, **kwargs)
             logger.info(f"Ad generated successfully for request ID: {response.request_id}")
             return response
+        except OverloadedError:
+            raise
         except Exception as e:
             logger.critical(f"Critical error during ad generation: {e}")
             raise
@@ -45,10 +68,17 @@ class AdService:
             AsyncIterator yielding chunks of AdGenerationResponse.
         """
         logger.info(f"Starting streaming ad generation for product: {request.product_name}, brand: {request.brand_name}")
+        chunks = 0
         try:
             async for chunk in self.ad_generator.generate_streaming(request, **kwargs):
-                logger.debug(f"Streaming chunk: {chunk}")
+                chunks += 1
+                if sampled_var.get():
+                    # Checked here so unsampled requests don't format every chunk
+                    sampled_logger.debug("Streaming chunk: {}", chunk)
                 yield chunk
+            logger.info(f"Streaming ad generation finished after {chunks} chunks")
+        except OverloadedError:
+            raise
         except Exception as e:
             logger.critical(f"Critical error during streaming ad generation: {e}")
             yield {
@@ -57,6 +87,102 @@ class AdService:
                 "error_code": "service_error"
             }
 
+    async def generate_ads_batch(
+        self,
+        requests: List[AdGenerationRequest],
+        max_concurrency: Optional[int] = None,
+        **kwargs
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Generate ads for a batch of requests with bounded concurrency.
+        Results are yielded as soon as each item completes (not in input order).
+        A failed item yields an error result instead of failing the batch.
+        Args:
+            requests: List of AdGenerationRequest to process.
+            max_concurrency: Maximum concurrent generations (defaults to BATCH_MAX_CONCURRENCY).
+        Returns:
+            AsyncIterator yielding one result dict per input item, tagged with its index.
+        """
+        limit = max_concurrency or settings.BATCH_MAX_CONCURRENCY
+        logger.info(f"Starting batch ad generation: {len(requests)} items, concurrency {limit}")
+        semaphore = asyncio.Semaphore(limit)
+
+        async def run(index: int, request: AdGenerationRequest) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    response = await self.ad_generator.generate(request, **kwargs)
+                    return {"index": index, "status": "completed", "response": response.model_dump(mode="json")}
+                except Exception as e:
+                    logger.error(f"Batch item {index} failed: {e}")
+                    return {
+                        "index": index,
+                        "status": "error",
+                        "error_code": "generation_failed",
+                        "message": str(e),
+                    }
+
+        tasks = [asyncio.create_task(run(i, request)) for i, request in enumerate(requests)]
+        completed = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                completed += 1
+                yield result
+        finally:
+            # Client disconnected or consumer stopped early: don't leak work
+            for task in tasks:
+                task.cancel()
+            logger.info(f"Batch ad generation finished: {completed}/{len(requests)} items")
+
+    async def generate_ad_variants(self, request: AdVariantsRequest, **kwargs) -> AdVariantsResponse:
+        """
+        Generate every requested ad type/tone combination for one product.
+        Args:
+            request: AdVariantsRequest containing product details and variants.
+        Returns:
+            AdVariantsResponse with generated variants and per-variant errors.
+        """
+        start = time()
+        logger.info(f"Starting variant ad generation for product: {request.product_name}, brand: {request.brand_name}")
+        result = AdVariantsResponse(generation_time=0.0, request_id=generate_request_id())
+        async for key, response in self.ad_generator.generate_variants(request, **kwargs):
+            if isinstance(response, Exception):
+                logger.error(f"Variant {key} failed: {response}")
+                result.errors[key] = str(response)
+            else:
+                result.variants[key] = response
+        result.generation_time = time() - start
+        logger.info(
+            f"Variant ad generation finished for request ID {result.request_id}: "
+            f"{len(result.variants)} succeeded, {len(result.errors)} failed"
+        )
+        return result
+
+    async def generate_ad_variants_streaming(
+        self,
+        request: AdVariantsRequest,
+        **kwargs
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Generate ad variants and yield each one as soon as it completes.
+        Args:
+            request: AdVariantsRequest containing product details and variants.
+        Returns:
+            AsyncIterator yielding one result dict per variant.
+        """
+        logger.info(f"Starting streaming variant ad generation for product: {request.product_name}, brand: {request.brand_name}")
+        async for key, response in self.ad_generator.generate_variants(request, **kwargs):
+            if isinstance(response, Exception):
+                logger.error(f"Variant {key} failed: {response}")
+                yield {
+                    "variant": key,
+                    "status": "error",
+                    "error_code": "generation_failed",
+                    "message": str(response),
+                }
+            else:
+                yield {"variant": key, "status": "completed", "response": response.model_dump(mode="json")}
+
 # Singleton service instance
 _ad_service_instance: Optional[AdService] = None
 
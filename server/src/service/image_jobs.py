@@ -0,0 +1,325 @@
+import os
+import time
+import uuid
+import socket
+import asyncio
+import sqlite3
+import threading
+from loguru import logger
+from typing import List, Optional, Set
+
+from src.models.requests import ImageGenerationRequest
+from src.models.response import ImageJobStatus, ImageResult
+from src.service.imagen_service import get_imagen_service, ImageService
+from src.core.admission import OverloadedError
+from src.utils.helpers import generate_request_id
+from src.config import settings
+
+
+class ImageJobStore:
+    """
+    SQLite-backed persistence for image generation jobs.
+    Every state transition is written through, so queued and running jobs
+    survive a worker restart and can be picked up again on startup.
+    Unfinished jobs are leased to the process that queued them; the lease is
+    renewed while the process lives, and jobs whose lease expired (the owner
+    crashed or stopped) are taken over by another process sharing the database.
+    Finished jobs are kept for polling until `delete_finished` removes them.
+    """
+
+    _UNFINISHED = "status IN ('queued', 'running')"
+
+    def __init__(self, db_path: str) -> None:
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS image_jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                request TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                owner TEXT,
+                lease_until REAL
+            )
+            """
+        )
+        # Databases created before leases were added
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(image_jobs)")}
+        for column, kind in (("owner", "TEXT"), ("lease_until", "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE image_jobs ADD COLUMN {column} {kind}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS image_jobs_status_updated ON image_jobs (status, updated_at)")
+        self._conn.commit()
+
+    def create(self, job_id: str, request: ImageGenerationRequest, owner: str, lease: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO image_jobs (job_id, status, request, created_at, updated_at, owner, lease_until) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, "queued", request.model_dump_json(), now, now, owner, now + lease),
+            )
+            self._conn.commit()
+
+    def claim(self, job_id: str, owner: str) -> bool:
+        """Atomically move a queued job owned by `owner` to running; False if it is not ours to run"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE image_jobs SET status = 'running', updated_at = ? "
+                "WHERE job_id = ? AND owner = ? AND status = 'queued'",
+                (time.time(), job_id, owner),
+            )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def update(
+        self,
+        job_id: str,
+        owner: str,
+        status: str,
+        result: Optional[ImageResult] = None,
+        error: Optional[str] = None,
+    ) -> bool:
+        """Record a state transition; False if `owner` lost the lease meanwhile"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE image_jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE job_id = ? AND owner = ?",
+                (status, result.model_dump_json() if result else None, error, time.time(), job_id, owner),
+            )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def get(self, job_id: str) -> Optional[ImageJobStatus]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT job_id, status, result, error, created_at, updated_at FROM image_jobs WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return ImageJobStatus(
+            job_id=row[0],
+            status=row[1],
+            result=ImageResult.model_validate_json(row[2]) if row[2] else None,
+            error=row[3],
+            created_at=row[4],
+            updated_at=row[5],
+        )
+
+    def get_request(self, job_id: str) -> Optional[ImageGenerationRequest]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT request FROM image_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return ImageGenerationRequest.model_validate_json(row[0]) if row else None
+
+    def renew_leases(self, owner: str, lease: float) -> None:
+        """Extend the lease of every unfinished job owned by `owner`"""
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE image_jobs SET lease_until = ? WHERE owner = ? AND {self._UNFINISHED}",
+                (time.time() + lease, owner),
+            )
+            self._conn.commit()
+
+    def take_over_expired(self, owner: str, lease: float) -> List[str]:
+        """
+        Take over unfinished jobs whose lease expired (or that never had one),
+        reset them to queued and return their ids, oldest first.
+        """
+        now = time.time()
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so two processes cannot take over the same job
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    f"SELECT job_id FROM image_jobs WHERE {self._UNFINISHED} "
+                    "AND (lease_until IS NULL OR lease_until < ?) ORDER BY created_at",
+                    (now,),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE image_jobs SET status = 'queued', owner = ?, lease_until = ?, updated_at = ? WHERE job_id = ?",
+                    [(owner, now + lease, now, row[0]) for row in rows],
+                )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return [row[0] for row in rows]
+
+    def release(self, owner: str) -> None:
+        """Give up the jobs of `owner` (on shutdown) so another process can take them over right away"""
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE image_jobs SET status = 'queued', lease_until = NULL WHERE owner = ? AND {self._UNFINISHED}",
+                (owner,),
+            )
+            self._conn.commit()
+
+    def delete_finished(self, older_than: float) -> int:
+        """Delete completed and failed jobs last updated more than `older_than` seconds ago; returns the count"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM image_jobs WHERE status IN ('completed', 'failed') AND updated_at < ?",
+                (time.time() - older_than,),
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ImageJobQueue:
+    """
+    In-process worker pool for background image generation.
+    Jobs are persisted in an ImageJobStore and executed by IMAGE_JOB_WORKERS
+    asyncio workers that call ImageService, so `/generate-image` can return
+    a job id immediately instead of holding the connection open.
+    Several server processes may share the store: each job is leased to one
+    process, which renews its leases every third of IMAGE_JOB_LEASE_SECONDS and
+    takes over jobs whose lease expired. Finished jobs are deleted `retention`
+    seconds after they finished (0 keeps them forever).
+    """
+
+    def __init__(
+        self,
+        image_service: ImageService,
+        store: ImageJobStore,
+        workers: int,
+        lease: float,
+        retention: float = 0.0,
+    ) -> None:
+        self.image_service = image_service
+        self.store = store
+        self.num_workers = workers
+        self.lease = lease
+        self.retention = retention
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+        self._retries: Set[asyncio.TimerHandle] = set()
+
+    async def start(self) -> None:
+        """Recover unfinished jobs from the store and start the workers"""
+        if self._workers:
+            return
+        await self._recover()
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"image-job-worker-{i}")
+            for i in range(self.num_workers)
+        ]
+        self._workers.append(asyncio.create_task(self._maintain_leases(), name="image-job-leases"))
+
+    async def stop(self) -> None:
+        """Stop the workers and release their jobs, so they are picked up by another process or the next start"""
+        for task in self._workers:
+            task.cancel()
+        for handle in self._retries:
+            handle.cancel()
+        self._retries.clear()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        await asyncio.to_thread(self.store.release, self.owner)
+
+    def _requeue(self, job_id: str) -> None:
+        """Put a job shed by admission control back on the queue once its retry delay is over"""
+        now = asyncio.get_running_loop().time()
+        self._retries = {handle for handle in self._retries if handle.when() > now}
+        self._queue.put_nowait(job_id)
+
+    async def _recover(self) -> None:
+        """Enqueue jobs whose owner is gone"""
+        recovered = await asyncio.to_thread(self.store.take_over_expired, self.owner, self.lease)
+        for job_id in recovered:
+            self._queue.put_nowait(job_id)
+        if recovered:
+            logger.info(f"Recovered {len(recovered)} unfinished image jobs")
+
+    async def _maintain_leases(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await asyncio.to_thread(self.store.renew_leases, self.owner, self.lease)
+                await self._recover()
+            except Exception as e:
+                logger.error(f"Renewing image job leases failed: {e}")
+            if self.retention:
+                try:
+                    deleted = await asyncio.to_thread(self.store.delete_finished, self.retention)
+                    if deleted:
+                        logger.debug(f"Deleted {deleted} finished image jobs")
+                except Exception as e:
+                    logger.error(f"Deleting finished image jobs failed: {e}")
+
+    async def submit(self, request: ImageGenerationRequest) -> ImageJobStatus:
+        """Persist a new job, enqueue it and return its initial status"""
+        await self.start()
+        job_id = generate_request_id()
+        await asyncio.to_thread(self.store.create, job_id, request, self.owner, self.lease)
+        self._queue.put_nowait(job_id)
+        logger.info(f"Queued image job {job_id} for product: {request.product_name}")
+        return await self.get(job_id)
+
+    async def get(self, job_id: str) -> Optional[ImageJobStatus]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.error(f"Image job worker {worker_id} failed on job {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        request = await asyncio.to_thread(self.store.get_request, job_id)
+        if request is None:
+            logger.warning(f"Image job {job_id} not found in store")
+            return
+        if not await asyncio.to_thread(self.store.claim, job_id, self.owner):
+            # Finished, or taken over by another process after our lease expired
+            logger.debug(f"Image job {job_id} is no longer ours to run")
+            return
+        try:
+            result = await self.image_service.generate_image(request)
+        except OverloadedError as e:
+            # Background jobs wait for capacity instead of being shed; the worker moves on meanwhile
+            await asyncio.to_thread(self.store.update, job_id, self.owner, "queued")
+            self._retries.add(asyncio.get_running_loop().call_later(e.retry_after, self._requeue, job_id))
+            return
+        if result is None:
+            updated = await asyncio.to_thread(
+                self.store.update, job_id, self.owner, "failed", None, "Image generation failed"
+            )
+            logger.error(f"Image job {job_id} failed")
+        else:
+            updated = await asyncio.to_thread(self.store.update, job_id, self.owner, "completed", result)
+            logger.info(f"Image job {job_id} completed: {result.image_path}")
+        if not updated:
+            logger.warning(f"Image job {job_id} lost its lease before finishing; its result was not recorded")
+
+
+# Singleton queue instance
+_image_job_queue_instance: Optional[ImageJobQueue] = None
+
+def get_image_job_queue() -> ImageJobQueue:
+    """Get singleton image job queue instance"""
+    global _image_job_queue_instance
+    if _image_job_queue_instance is None:
+        _image_job_queue_instance = ImageJobQueue(
+            image_service=get_imagen_service(),
+            store=ImageJobStore(settings.IMAGE_JOB_DB_PATH),
+            workers=settings.IMAGE_JOB_WORKERS,
+            lease=settings.IMAGE_JOB_LEASE_SECONDS,
+            retention=settings.IMAGE_JOB_RETENTION_SECONDS,
+        )
+    return _image_job_queue_instance
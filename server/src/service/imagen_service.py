@@ -1,8 +1,13 @@
+import asyncio
 from loguru import logger
 from typing import Optional
 from src.core.image_generator import ImageGenerator
+from src.core.image_variants import warmup_process_pool
+from src.core.image_delivery import HotImageCache, ImageDelivery
+from src.core.admission import OverloadedError
 from src.models.requests import ImageGenerationRequest
 from src.models.response import ImageResult
+from src.config import settings
 
 class ImageService:
     """
@@ -12,33 +17,50 @@ class ImageService:
 
     def __init__(self):
         self.image_generator = ImageGenerator()
+        self.hot_images = HotImageCache(settings.IMAGE_HOT_CACHE_MAX_BYTES, settings.IMAGE_HOT_CACHE_MAX_ITEM_BYTES)
+        self.image_generator.cache.on_remove = self.hot_images.invalidate
+        self.delivery = ImageDelivery(self.image_generator.storage, self.hot_images)
+
+    @property
+    def model_name(self) -> str:
+        """Name of the image model used for generation"""
+        return self.image_generator.imagen.model_name
+
+    async def warmup(self) -> None:
+        """Pre-open the upstream image model connection and start the encoding workers"""
+        await asyncio.gather(self.image_generator.imagen.warmup(), warmup_process_pool())
     
-    def generate_image(self, request: ImageGenerationRequest) -> Optional[ImageResult]:
+    async def generate_image(self, request: ImageGenerationRequest) -> Optional[ImageResult]:
         """
         Generate an image based on the provided request details.
         Args:
             request: ImageGenerationRequest containing product details. 
         Returns:
-            ImageResult containing the path to the generated image or None if generation failed.
+            ImageResult containing the URL of the generated image or None if generation failed.
         """
         try:
             logger.info(f"Starting image generation for product: {request.product_name}, brand: {request.brand_name}")
-            path_file = self.image_generator.generate_image_prompt(
+            name = await self.image_generator.generate_image_prompt(
                 product_name=request.product_name,
                 brand_name=request.brand_name,
                 product_description=request.description
             )
-            if path_file:
-                logger.info(f"Image generated successfully: {path_file}")
+            if name:
+                logger.info(f"Image generated successfully: {name}")
+                storage = self.image_generator.storage
+                local_path = storage.local_path(name)
                 return ImageResult(
-                    image_path=path_file,  # No local path for generated images
-                    image_url=None,
+                    image_path=str(local_path) if local_path else None,  # None on remote storage
+                    image_url=storage.url(name),
                     source="generated",
-                    generated=True
+                    generated=True,
+                    variants=await self.image_generator.cache.variants(name.removesuffix(".png"))
                 )
             else:
                 logger.error("Failed to generate image")
                 return None
+        except OverloadedError:
+            raise
         except Exception as e:
             logger.critical(f"Critical error during image generation: {e}")
             return None
@@ -0,0 +1,118 @@
+import sys
+import random
+import contextvars
+from loguru import logger
+from typing import Optional
+
+from src.utils.helpers import generate_request_id
+from src.config import settings
+
+
+# Request scoped logging context, set by RequestContextMiddleware
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+sampled_var: contextvars.ContextVar[bool] = contextvars.ContextVar("log_sampled", default=False)
+
+# Logger for hot-path debug events (per-chunk logs etc.); only emitted for sampled requests
+sampled_logger = logger.bind(sampled=True)
+
+
+class LevelFilter:
+    """
+    Sink filter with a level that can be changed at runtime.
+    Hot-path records (bound with sampled=True) are dropped unless the
+    current request was selected for sampling.
+    """
+
+    def __init__(self, level: str) -> None:
+        self.set_level(level)
+
+    def set_level(self, level: str) -> None:
+        self.levelno = logger.level(level.upper()).no
+        self.level = level.upper()
+
+    def __call__(self, record) -> bool:
+        if record["level"].no < self.levelno:
+            return False
+        if record["extra"].get("sampled") and not sampled_var.get():
+            return False
+        return True
+
+
+level_filter = LevelFilter(settings.LOG_LEVEL)
+
+
+def _add_request_context(record) -> None:
+    record["extra"].setdefault("request_id", request_id_var.get())
+
+
+def setup_logging() -> None:
+    """
+    Configure loguru sinks: console plus a rotating JSON file sink.
+    Both sinks are enqueued: filtering, formatting and JSON serialization still
+    run in the calling thread, but the write itself (and file rotation) happens
+    in loguru's background thread, so the event loop never blocks on disk or stderr.
+    The level filter and debug sampling keep dropped records cheap.
+    """
+    logger.remove()
+    logger.configure(patcher=_add_request_context)
+    logger.add(
+        sys.stderr,
+        level=0,
+        filter=level_filter,
+        enqueue=True,
+        format="<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | "
+               "{extra[request_id]} | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
+    )
+    if settings.LOG_FILE:
+        logger.add(
+            settings.LOG_FILE,
+            level=0,
+            filter=level_filter,
+            enqueue=True,
+            serialize=settings.LOG_JSON,
+            rotation=settings.LOG_ROTATION,
+            retention=settings.LOG_RETENTION,
+        )
+
+
+def set_log_level(level: str) -> str:
+    """Change the level of all sinks at runtime and return the new level"""
+    level_filter.set_level(level)
+    logger.info(f"Log level changed to {level_filter.level}")
+    return level_filter.level
+
+
+class RequestContextMiddleware:
+    """
+    ASGI middleware that assigns each request an id (from `X-Request-ID` or a new one),
+    decides whether its hot-path debug events are sampled, and echoes the id back.
+    """
+
+    def __init__(self, app, sample_rate: float = 0.0) -> None:
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        request_id = request_id or generate_request_id()
+        id_token = request_id_var.set(request_id)
+        sampled_token = sampled_var.set(random.random() < self.sample_rate)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(id_token)
+            sampled_var.reset(sampled_token)
@@ -0,0 +1,307 @@
+import os
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import psutil
+
+from src.models.requests import AdTone, AdType
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+TOKEN_GAP_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Labels of the request currently being served, read by upstream clients
+request_labels: contextvars.ContextVar[Dict[str, str]] = contextvars.ContextVar("request_labels", default={})
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    """Base class for a labelled metric family"""
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+        REGISTRY.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def labels(self, **labels: str):
+        key = self._key(labels)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _Value:
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+    type_name = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def _samples(self) -> Iterable[str]:
+        for key, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {child.value}"
+
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+    type_name = "gauge"
+
+
+class _HistogramValue:
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed buckets"""
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def _samples(self) -> Iterable[str]:
+        for key, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, (('le', le),))} {cumulative}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {child.sum}"
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], str]] = []
+
+    def register(self, metric: _Metric) -> None:
+        self._metrics.append(metric)
+
+    def add_collector(self, collector: Callable[[], str]) -> None:
+        """Register a callable that renders extra metrics at scrape time"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        parts = [metric.render() for metric in self._metrics]
+        parts.extend(text for text in (collector() for collector in self._collectors) if text)
+        parts.append(_render_process_metrics())
+        return "\n".join(parts) + "\n"
+
+
+def _render_process_metrics() -> str:
+    """Process CPU, memory and file descriptor usage collected with psutil at scrape time"""
+    process = psutil.Process(os.getpid())
+    with process.oneshot():
+        cpu = process.cpu_times()
+        memory = process.memory_info()
+        threads = process.num_threads()
+        try:
+            fds = process.num_fds()
+        except AttributeError:  # not available on Windows
+            fds = len(process.open_files())
+        start_time = process.create_time()
+    samples = [
+        ("process_cpu_seconds_total", "counter", "Total user and system CPU time in seconds.", cpu.user + cpu.system),
+        ("process_resident_memory_bytes", "gauge", "Resident memory size in bytes.", memory.rss),
+        ("process_virtual_memory_bytes", "gauge", "Virtual memory size in bytes.", memory.vms),
+        ("process_open_fds", "gauge", "Number of open file descriptors.", fds),
+        ("process_threads", "gauge", "Number of OS threads.", threads),
+        ("process_start_time_seconds", "gauge", "Start time of the process since unix epoch in seconds.", start_time),
+    ]
+    lines = []
+    for name, type_name, documentation, value in samples:
+        lines.extend([f"# HELP {name} {documentation}", f"# TYPE {name} {type_name}", f"{name} {value}"])
+    return "\n".join(lines)
+
+
+REGISTRY = MetricsRegistry()
+
+_REQUEST_LABELS = ("model", "ad_type", "ad_tone", "endpoint")
+
+REQUEST_LATENCY = Histogram(
+    "adgen_request_duration_seconds",
+    "Total request latency, including the full stream for streaming endpoints.",
+    _REQUEST_LABELS,
+)
+TIME_TO_FIRST_TOKEN = Histogram(
+    "adgen_time_to_first_token_seconds",
+    "Time from upstream request start to the first streamed token.",
+    _REQUEST_LABELS,
+)
+INTER_TOKEN_GAP = Histogram(
+    "adgen_inter_token_gap_seconds",
+    "Time between consecutive streamed tokens.",
+    _REQUEST_LABELS,
+    buckets=TOKEN_GAP_BUCKETS,
+)
+UPSTREAM_LATENCY = Histogram(
+    "adgen_upstream_duration_seconds",
+    "Latency of upstream provider calls.",
+    ("provider", "model", "operation"),
+)
+UPSTREAM_ERRORS = Counter(
+    "adgen_upstream_errors_total",
+    "Upstream provider errors by error type.",
+    ("provider", "model", "error_type"),
+)
+CACHE_REQUESTS = Counter(
+    "adgen_cache_requests_total",
+    "Cache lookups by cache and result (hit or miss).",
+    ("cache", "result"),
+)
+UPSTREAM_RETRIES = Counter(
+    "adgen_upstream_retries_total",
+    "Upstream calls retried after a retryable error.",
+    ("provider", "error_type"),
+)
+UPSTREAM_HEDGES = Counter(
+    "adgen_upstream_hedges_total",
+    "Hedged upstream calls by which request answered first (primary or hedge).",
+    ("provider", "winner"),
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "adgen_requests_in_flight",
+    "Requests currently being served.",
+    ("endpoint",),
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    "adgen_upstream_requests_in_flight",
+    "Upstream provider calls currently in flight.",
+    ("provider",),
+)
+
+
+_AD_TYPES = frozenset(t.value for t in AdType)
+_AD_TONES = frozenset(t.value for t in AdTone)
+
+
+def _bounded_label(value: Optional[str], known: frozenset) -> str:
+    """Client-supplied label value, or "other" when it is not a known one (keeps series bounded)"""
+    if not value:
+        return ""
+    return value if value in known else "other"
+
+
+@asynccontextmanager
+async def track_request(endpoint: str, model: str, ad_type: Optional[str] = None, ad_tone: Optional[str] = None):
+    """Record in-flight count and latency for a request and expose its labels to upstream clients"""
+    labels = {
+        "model": model,
+        "ad_type": _bounded_label(ad_type, _AD_TYPES),
+        "ad_tone": _bounded_label(ad_tone, _AD_TONES),
+        "endpoint": endpoint,
+    }
+    token = request_labels.set(labels)
+    in_flight = REQUESTS_IN_FLIGHT.labels(endpoint=endpoint)
+    in_flight.inc()
+    start = time.perf_counter()
+    try:
+        yield labels
+    finally:
+        REQUEST_LATENCY.labels(**labels).observe(time.perf_counter() - start)
+        in_flight.dec()
+        try:
+            request_labels.reset(token)
+        except ValueError:
+            # Streaming generators may be finalized from a different context
+            pass
+
+
+@asynccontextmanager
+async def track_upstream(provider: str, model: str, operation: str):
+    """Record in-flight count, latency and errors of an upstream call"""
+    in_flight = UPSTREAM_IN_FLIGHT.labels(provider=provider)
+    in_flight.inc()
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        UPSTREAM_ERRORS.labels(provider=provider, model=model, error_type=type(e).__name__).inc()
+        raise
+    finally:
+        UPSTREAM_LATENCY.labels(provider=provider, model=model, operation=operation).observe(time.perf_counter() - start)
+        in_flight.dec()
+
+
+def set_request_model(model: str) -> None:
+    """Label the current request with the model that served it (e.g. the backend picked by the router)"""
+    labels = request_labels.get()
+    if labels:
+        labels["model"] = model
+
+
+def current_request_labels(model: str) -> Dict[str, str]:
+    """Labels of the current request, with the model overridden by the upstream client"""
+    labels = dict(request_labels.get()) or {"ad_type": "", "ad_tone": "", "endpoint": ""}
+    labels["model"] = model
+    return labels
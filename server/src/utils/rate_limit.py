@@ -0,0 +1,298 @@
+import math
+import time
+import json
+import asyncio
+import sqlite3
+import ipaddress
+import threading
+from loguru import logger
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from src.models.requests import AdTone, AdType
+from src.utils.streaming import dumps_json
+from src.config import settings
+
+
+class RateLimit(NamedTuple):
+    """Token bucket parameters: `capacity` requests per `window` seconds (and burst size)"""
+    capacity: int
+    window: float
+
+    @property
+    def refill_rate(self) -> float:
+        return self.capacity / self.window
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    remaining: int
+    retry_after: float  # seconds until a token is available, 0 when allowed
+
+
+def _take(tokens: float, updated_at: float, now: float, limit: RateLimit, cost: int = 1) -> Tuple[Decision, float]:
+    """Refill the bucket up to `now` and try to take `cost` tokens; returns the decision and the new level"""
+    tokens = min(limit.capacity, tokens + (now - updated_at) * limit.refill_rate)
+    if tokens >= cost:
+        tokens -= cost
+        return Decision(True, int(tokens), 0.0), tokens
+    return Decision(False, int(tokens), (cost - tokens) / limit.refill_rate), tokens
+
+
+class BaseRateLimiter(ABC):
+    """Abstract base class for token bucket stores"""
+
+    @abstractmethod
+    async def acquire(self, key: str, limit: RateLimit, cost: int = 1) -> Decision:
+        """Take `cost` tokens from the bucket identified by `key`"""
+        pass
+
+
+class MemoryRateLimiter(BaseRateLimiter):
+    """
+    Buckets kept in process memory; limits apply per worker.
+    At most `max_keys` buckets are kept: beyond that the least recently used one is
+    dropped, which usually belongs to a client idle long enough to have refilled.
+    """
+
+    def __init__(self, max_keys: int = 100_000) -> None:
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def acquire(self, key: str, limit: RateLimit, cost: int = 1) -> Decision:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (limit.capacity, now))
+        decision, tokens = _take(tokens, updated_at, now, limit, cost)
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return decision
+
+
+class SQLiteRateLimiter(BaseRateLimiter):
+    """
+    Buckets stored in a local SQLite database, so all uvicorn workers on the host
+    share the same limits. Each acquire is a single short write transaction.
+    """
+
+    def __init__(self, db_path: str) -> None:
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def _acquire(self, key: str, limit: RateLimit, cost: int) -> Decision:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()  # wall clock, shared across processes
+                row = self._conn.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens, updated_at = row if row else (limit.capacity, now)
+                decision, tokens = _take(tokens, updated_at, now, limit, cost)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)", (key, tokens, now)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return decision
+
+    async def acquire(self, key: str, limit: RateLimit, cost: int = 1) -> Decision:
+        return await asyncio.to_thread(self._acquire, key, limit, cost)
+
+
+def build_rate_limiter() -> BaseRateLimiter:
+    """Build the rate limiter backend selected in settings"""
+    if settings.RATE_LIMIT_BACKEND == "sqlite":
+        return SQLiteRateLimiter(settings.RATE_LIMIT_DB_PATH)
+    return MemoryRateLimiter()
+
+
+def default_limits() -> Dict[str, RateLimit]:
+    """Limits per route class, from settings"""
+    window = settings.RATE_LIMIT_WINDOW
+    return {
+        "text": RateLimit(settings.RATE_LIMIT_REQUESTS, window),
+        "stream": RateLimit(settings.RATE_LIMIT_STREAM_REQUESTS or settings.RATE_LIMIT_REQUESTS, window),
+        "image": RateLimit(settings.RATE_LIMIT_IMAGE_REQUESTS or settings.RATE_LIMIT_REQUESTS, window),
+    }
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """Map a request to its rate limit class; only generation endpoints (POST) are limited"""
+    if method != "POST" or not path.startswith(settings.API_V1_PREFIX):
+        return None
+    # Image first: combined ad+image routes (streaming or not) are charged to the image bucket
+    if "image" in path:
+        return "image"
+    if path.endswith("-stream"):
+        return "stream"
+    return "text"
+
+
+# Routes that generate one ad per item of the request body
+MULTI_ITEM_ROUTES = ("/generate-batch", "/generate-variants")
+
+
+def request_cost(path: str, body: bytes) -> int:
+    """
+    Tokens charged for a request: one per ad for batch and variant routes, else one.
+    Bodies that cannot be parsed cost one token; the route rejects them anyway.
+    """
+    if not path.endswith(MULTI_ITEM_ROUTES):
+        return 1
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return 1
+    if isinstance(payload, list):
+        return max(1, len(payload))
+    variants = payload.get("variants") if isinstance(payload, dict) else None
+    if variants == "all":
+        return len(AdType) * len(AdTone)
+    return max(1, len(variants)) if isinstance(variants, list) else 1
+
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def parse_networks(values: Iterable[str]) -> List[Network]:
+    """Parse addresses and CIDR ranges such as "10.0.0.0/8" or "::1" """
+    return [ipaddress.ip_network(value.strip(), strict=False) for value in values if value.strip()]
+
+
+def _is_trusted(address: str, trusted_proxies: List[Network]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted_proxies)
+
+
+def client_key(scope, trusted_proxies: Optional[List[Network]] = None) -> str:
+    """
+    Identify the caller by client IP.
+    When the peer is a trusted proxy, the client is the right-most address in
+    X-Forwarded-For that is not itself a trusted proxy; entries left of it can be
+    forged by the client, so they are ignored. X-Forwarded-For from any other peer
+    is ignored too. API keys are not authenticated, so they are not used: a client
+    could send a new key with every request to get a fresh bucket.
+    """
+    client = scope.get("client")
+    address = client[0] if client else "unknown"
+    if trusted_proxies and _is_trusted(address, trusted_proxies):
+        forwarded = b",".join(value for name, value in scope.get("headers", []) if name == b"x-forwarded-for")
+        for hop in reversed([hop.strip() for hop in forwarded.decode("latin-1").split(",") if hop.strip()]):
+            address = hop
+            if not _is_trusted(hop, trusted_proxies):
+                break
+    return "ip:" + address
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware enforcing per-client token buckets with separate limits for
+    text, streaming and image routes. Clients are told apart by IP, read from
+    X-Forwarded-For when the request comes through one of TRUSTED_PROXIES. Rejected requests get `429` with `Retry-After`;
+    every limited response carries `X-RateLimit-Limit` and `X-RateLimit-Remaining`.
+    """
+
+    def __init__(
+        self,
+        app,
+        limiter: Optional[BaseRateLimiter] = None,
+        limits: Optional[Dict[str, RateLimit]] = None
+    ) -> None:
+        self.app = app
+        self.limiter = limiter or build_rate_limiter()
+        self.limits = limits or default_limits()
+        self.trusted_proxies = parse_networks(settings.TRUSTED_PROXIES)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        klass = route_class(scope["method"], scope["path"])
+        if klass is None:
+            return await self.app(scope, receive, send)
+
+        limit = self.limits[klass]
+        cost = 1
+        if scope["path"].endswith(MULTI_ITEM_ROUTES):
+            body = await _read_body(receive)
+            receive = _replay(body, receive)
+            cost = request_cost(scope["path"], body)
+        try:
+            decision = await self.limiter.acquire(f"{klass}:{client_key(scope, self.trusted_proxies)}", limit, cost)
+        except Exception as e:
+            # Never fail requests because the limiter store is unavailable
+            logger.error(f"Rate limiter error, allowing request: {e}")
+            return await self.app(scope, receive, send)
+
+        rate_headers = [
+            (b"x-ratelimit-limit", str(limit.capacity).encode()),
+            (b"x-ratelimit-remaining", str(decision.remaining).encode()),
+        ]
+        if not decision.allowed:
+            retry_after = max(1, math.ceil(decision.retry_after))
+            if cost > limit.capacity:
+                message = f"Request needs {cost} {klass} tokens but the limit is {limit.capacity}, split it up"
+            else:
+                message = f"Too many {klass} requests, retry in {retry_after}s"
+            body = dumps_json({
+                "detail": {
+                    "error": "rate_limited",
+                    "message": message,
+                    "retry_after": retry_after
+                }
+            })
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(retry_after).encode()),
+                    *rate_headers,
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + rate_headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+def _replay(body: bytes, receive):
+    """ASGI receive callable that hands an already read body to the app, then defers to `receive`"""
+    sent = False
+
+    async def replay():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return replay
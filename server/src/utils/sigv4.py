@@ -0,0 +1,121 @@
+import hmac
+import hashlib
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from urllib.parse import quote, urlsplit, parse_qsl, urlencode
+
+
+EMPTY_PAYLOAD_HASH = hashlib.sha256(b"").hexdigest()
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode("utf-8"), hashlib.sha256).digest()
+
+
+def _signing_key(secret_key: str, date: str, region: str, service: str) -> bytes:
+    key = _hmac(("AWS4" + secret_key).encode("utf-8"), date)
+    key = _hmac(key, region)
+    key = _hmac(key, service)
+    return _hmac(key, "aws4_request")
+
+
+def _canonical_query(query: Dict[str, str]) -> str:
+    return "&".join(
+        f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}" for k, v in sorted(query.items())
+    )
+
+
+def _sign(
+    method: str,
+    path: str,
+    query: Dict[str, str],
+    headers: Dict[str, str],
+    payload_hash: str,
+    secret_key: str,
+    amz_date: str,
+    scope: str,
+) -> str:
+    """Signature over the canonical request (AWS Signature Version 4)"""
+    names = sorted(headers)
+    canonical_request = "\n".join([
+        method,
+        quote(path, safe="/-_.~"),
+        _canonical_query(query),
+        "".join(f"{name}:{' '.join(headers[name].split())}\n" for name in names),
+        ";".join(names),
+        payload_hash,
+    ])
+    string_to_sign = "\n".join([
+        "AWS4-HMAC-SHA256",
+        amz_date,
+        scope,
+        hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+    ])
+    date, region, service, _ = scope.split("/")
+    return hmac.new(
+        _signing_key(secret_key, date, region, service), string_to_sign.encode("utf-8"), hashlib.sha256
+    ).hexdigest()
+
+
+def sign_request(
+    method: str,
+    url: str,
+    headers: Dict[str, str],
+    payload_hash: str,
+    access_key: str,
+    secret_key: str,
+    region: str,
+    service: str = "s3",
+    now: Optional[datetime] = None,
+) -> Dict[str, str]:
+    """
+    Sign a request with the Authorization header.
+    Returns:
+        The headers to send: `headers` plus host, x-amz-date, x-amz-content-sha256 and Authorization.
+    """
+    now = now or datetime.now(timezone.utc)
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    scope = f"{now:%Y%m%d}/{region}/{service}/aws4_request"
+    parts = urlsplit(url)
+
+    signed = {name.lower(): value for name, value in headers.items()}
+    signed.update({"host": parts.netloc, "x-amz-date": amz_date, "x-amz-content-sha256": payload_hash})
+    signature = _sign(method, parts.path or "/", dict(parse_qsl(parts.query, keep_blank_values=True)),
+                      signed, payload_hash, secret_key, amz_date, scope)
+    signed["authorization"] = (
+        f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, "
+        f"SignedHeaders={';'.join(sorted(name for name in signed if name != 'authorization'))}, "
+        f"Signature={signature}"
+    )
+    return signed
+
+
+def presign_url(
+    method: str,
+    url: str,
+    access_key: str,
+    secret_key: str,
+    region: str,
+    expires: int,
+    service: str = "s3",
+    now: Optional[datetime] = None,
+) -> str:
+    """URL carrying its own query string signature, valid for `expires` seconds"""
+    now = now or datetime.now(timezone.utc)
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    scope = f"{now:%Y%m%d}/{region}/{service}/aws4_request"
+    parts = urlsplit(url)
+
+    query = dict(parse_qsl(parts.query, keep_blank_values=True))
+    query.update({
+        "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+        "X-Amz-Credential": f"{access_key}/{scope}",
+        "X-Amz-Date": amz_date,
+        "X-Amz-Expires": str(expires),
+        "X-Amz-SignedHeaders": "host",
+    })
+    signature = _sign(method, parts.path or "/", query, {"host": parts.netloc},
+                      UNSIGNED_PAYLOAD, secret_key, amz_date, scope)
+    query["X-Amz-Signature"] = signature
+    return f"{parts.scheme}://{parts.netloc}{quote(parts.path, safe='/-_.~')}?{urlencode(query, quote_via=quote)}"
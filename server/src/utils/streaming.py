@@ -0,0 +1,102 @@
+import asyncio
+from time import monotonic
+from pydantic_core import to_json
+from typing import Any, AsyncIterator, Dict, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def dumps_json(payload: Any) -> bytes:
+    """Serialize a payload to compact JSON bytes (pydantic-core, falls back to str for unknown types)"""
+    return to_json(payload, fallback=str)
+
+
+def format_sse(payload: Dict[str, Any], event_id: int) -> bytes:
+    """Frame a payload as a Server-Sent Event, using its status as the event name"""
+    event = payload.get("status", "message")
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (event_id, event.encode(), dumps_json(payload))
+
+
+async def prime_stream(chunks: AsyncIterator[T]) -> AsyncIterator[T]:
+    """
+    Fetch the first item of a stream now and return an iterator over the whole stream.
+    Errors raised before the first item (e.g. admission rejection) surface to the
+    caller while it can still answer with a proper status code.
+    """
+    iterator = chunks.__aiter__()
+    try:
+        first = await iterator.__anext__()
+    except StopAsyncIteration:
+        first = None
+        iterator = None
+
+    async def chained() -> AsyncIterator[T]:
+        if iterator is None:
+            return
+        yield first
+        async for item in iterator:
+            yield item
+
+    return chained()
+
+
+async def coalesce_stream(
+    chunks: AsyncIterator[Dict[str, Any]],
+    max_bytes: int,
+    max_delay: float,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Merge consecutive "streaming" chunks into larger ones.
+    Buffered content is flushed once it reaches `max_bytes` characters or has been
+    held for `max_delay` seconds (even if upstream is quiet), and before any
+    non-streaming chunk such as "completed" or "error".
+    """
+    buffer: List[str] = []
+    buffered = 0
+    first_at = 0.0
+    last_progress: Optional[float] = None
+
+    def flush() -> Dict[str, Any]:
+        nonlocal buffer, buffered
+        merged = {"status": "streaming", "content": "".join(buffer)}
+        if last_progress is not None:
+            merged["progress"] = last_progress
+        buffer, buffered = [], 0
+        return merged
+
+    iterator = chunks.__aiter__()
+    pending: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            if buffer:
+                timeout = max(first_at + max_delay - monotonic(), 0)
+                done, _ = await asyncio.wait({pending}, timeout=timeout)
+                if not done:
+                    yield flush()
+                    continue
+            try:
+                chunk = await pending
+            except StopAsyncIteration:
+                break
+            finally:
+                pending = None
+
+            if chunk.get("status") == "streaming":
+                if not buffer:
+                    first_at = monotonic()
+                buffer.append(chunk.get("content", ""))
+                buffered += len(buffer[-1])
+                last_progress = chunk.get("progress", last_progress)
+                if buffered >= max_bytes:
+                    yield flush()
+            else:
+                if buffer:
+                    yield flush()
+                yield chunk
+        if buffer:
+            yield flush()
+    finally:
+        if pending is not None:
+            pending.cancel()
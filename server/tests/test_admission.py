@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+
+from src.core.admission import AdmissionController, OverloadedError, admit
+from src.llm.resilience import UpstreamError
+
+
+def _controller(**overrides):
+    options = dict(pool="test", initial_limit=2, min_limit=1, max_limit=10, queue_size=2, queue_timeout=1.0)
+    return AdmissionController(**{**options, **overrides})
+
+
+async def _hold(controller, release, order=None, name=None):
+    async with controller.admit():
+        if order is not None:
+            order.append(name)
+        await release.wait()
+
+
+def test_queues_beyond_the_limit_and_hands_slots_over_in_order():
+    async def run():
+        controller = _controller()
+        release = asyncio.Event()
+        order = []
+        tasks = [asyncio.create_task(_hold(controller, release, order, name)) for name in "abcd"]
+        await asyncio.sleep(0)
+        assert order == ["a", "b"]
+        assert (controller.in_flight, len(controller._waiters)) == (2, 2)
+
+        with pytest.raises(OverloadedError) as rejected:
+            async with controller.admit():
+                pass
+        assert rejected.value.reason == "queue_full"
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert order == ["a", "b", "c", "d"]
+        assert (controller.in_flight, len(controller._waiters)) == (0, 0)
+
+    asyncio.run(run())
+
+
+def test_queued_requests_time_out():
+    async def run():
+        controller = _controller(initial_limit=1, queue_timeout=0.01)
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, release))
+        await asyncio.sleep(0)
+        with pytest.raises(OverloadedError) as rejected:
+            async with controller.admit():
+                pass
+        assert rejected.value.reason == "queue_timeout"
+        assert not controller._waiters
+        release.set()
+        await holder
+        assert controller.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def run():
+        controller = _controller(initial_limit=1)
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, release))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(_hold(controller, release))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert not controller._waiters and controller.in_flight == 1
+        release.set()
+        await holder
+        assert controller.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_memory_limit_sheds_requests():
+    async def run():
+        controller = _controller(max_memory_bytes=1)
+        with pytest.raises(OverloadedError) as rejected:
+            async with controller.admit():
+                pass
+        assert rejected.value.reason == "memory"
+
+    asyncio.run(run())
+
+
+def test_limit_grows_while_saturated_and_backs_off_once_per_window():
+    controller = _controller(initial_limit=4, backoff=0.5)
+    controller._adjust(0.1, failed=False)  # the limit is not the bottleneck: no growth
+    assert controller.limit == 4
+    controller.in_flight = 3  # the released call was one of four in flight
+    controller._adjust(0.1, failed=False)
+    assert controller.limit == pytest.approx(4.25)
+
+    controller._adjust(0.1, failed=True)
+    assert controller.limit == pytest.approx(2.125)
+    # A burst of failures inside the same window counts once
+    controller._adjust(0.1, failed=True)
+    controller._adjust(0.1, failed=True)
+    assert controller.limit == pytest.approx(2.125)
+    controller._adjust(0.1, failed=True)
+    assert controller.limit == pytest.approx(1.0625)
+
+
+def test_latency_spike_cuts_the_limit():
+    controller = _controller(initial_limit=8, tolerance=2.0, backoff=0.5)
+    for _ in range(20):
+        controller._adjust(0.1, failed=False)
+    limit = controller.limit
+    for _ in range(3):
+        controller._adjust(5.0, failed=False)
+    assert controller.short_latency > controller.long_latency * 2
+    assert controller.limit == pytest.approx(limit * 0.5)
+
+
+def test_only_retryable_errors_count_as_failures():
+    async def run(error):
+        controller = _controller(initial_limit=4, backoff=0.5)
+        with pytest.raises(type(error)):
+            async with controller.admit():
+                raise error
+        return controller.limit
+
+    assert asyncio.run(run(UpstreamError("bad request", 400))) == 4
+    assert asyncio.run(run(UpstreamError("unavailable", 503, retryable=True))) == 2
+
+
+def test_admit_falls_back_to_the_semaphore_when_disabled():
+    async def run():
+        cap = asyncio.Semaphore(1)
+        async with admit(None, cap) as slot:
+            assert slot is None and cap.locked()
+        assert not cap.locked()
+        async with admit(None) as slot:
+            assert slot is None
+        async with admit(_controller()) as slot:
+            assert slot is not None
+
+    asyncio.run(run())
@@ -0,0 +1,120 @@
+import asyncio
+import json
+
+import pytest
+
+from src.cli import Checkpoint, ingest, normalize_row, read_catalog
+from src.config import settings
+
+
+def _records(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_checkpoint_watermark_and_failed_rows(tmp_path):
+    checkpoint = Checkpoint(tmp_path / "ads.checkpoint")
+    for index in (0, 2, 3):
+        checkpoint.mark_done(index)
+    checkpoint.mark_done(1, failed=True)
+    checkpoint.mark_done(5)
+    assert (checkpoint.next_row, checkpoint.completed, checkpoint.failed) == (4, {5}, {1})
+    assert checkpoint.is_done(1) and not checkpoint.is_done(1, retry_failed=True)
+    assert not checkpoint.is_done(4) and checkpoint.is_done(5)
+
+    checkpoint.mark_done(1)  # retried below the watermark
+    assert (checkpoint.next_row, checkpoint.completed, checkpoint.failed) == (4, {5}, set())
+
+    checkpoint.save(output_offset=42)
+    restored = Checkpoint(tmp_path / "ads.checkpoint")
+    assert (restored.next_row, restored.completed, restored.failed, restored.output_offset) == (4, {5}, set(), 42)
+
+
+def test_checkpoint_saves_in_batches(tmp_path):
+    checkpoint = Checkpoint(tmp_path / "ads.checkpoint", save_every=3, save_interval=3600)
+    assert not checkpoint.save_due()
+    checkpoint.mark_done(0)
+    checkpoint.mark_done(1)
+    assert not checkpoint.save_due()
+    checkpoint.mark_done(2)
+    assert checkpoint.save_due()
+    checkpoint.save()
+    assert not checkpoint.save_due()
+
+    checkpoint.save_interval = 0
+    checkpoint.mark_done(3)
+    assert checkpoint.save_due()
+
+
+def test_replay_recovers_rows_written_after_the_last_save(tmp_path):
+    output = tmp_path / "ads.jsonl"
+    saved = b'{"row": 0, "status": "completed"}\n'
+    output.write_bytes(
+        saved
+        + b'{"row": 2, "status": "completed"}\n'
+        + b'{"row": 1, "status": "error", "message": "boom"}\n'
+        + b'{"row": 3, "sta'  # interrupted write
+    )
+    checkpoint = Checkpoint(tmp_path / "ads.checkpoint")
+    checkpoint.mark_done(0)
+    checkpoint.save(output_offset=len(saved))
+
+    restored = Checkpoint(tmp_path / "ads.checkpoint")
+    assert restored.replay(output) == 2
+    assert (restored.next_row, restored.failed) == (3, {1})
+    assert [record["row"] for record in _records(output)] == [0, 2, 1]
+    assert restored.output_offset == output.stat().st_size
+    assert Checkpoint(tmp_path / "none").replay(tmp_path / "missing.jsonl") == 0
+
+
+def test_read_catalog_and_normalize_row(tmp_path):
+    catalog = tmp_path / "catalog.jsonl"
+    catalog.write_text('{"product_name": "Shoe", "category": "Sport; Running"}\n\nnot json\n[1]\n')
+    rows = list(read_catalog(catalog))
+    assert rows[0] == (0, {"product_name": "Shoe", "category": "Sport; Running"})
+    assert [index for index, row in rows if isinstance(row, ValueError)] == [2, 3]
+
+    row = normalize_row({"product_name": "Shoe", "category": "Sport; Running", "price": ""}, {"ad_tone": "friendly"})
+    assert row == {"product_name": "Shoe", "category": ["Sport", "Running"], "price": None, "ad_tone": "friendly"}
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    for name, value in {
+        "LLM_PROVIDER": "fake",
+        "FAKE_LLM_TTFT": 0.0,
+        "FAKE_LLM_TOKENS_PER_SECOND": 1e6,
+        "FAKE_LLM_ERROR_RATE": 0.0,
+        "RESPONSE_CACHE_ENABLED": False,
+        # Would shed concurrent calls if the CLI went through admission control
+        "ADMISSION_ENABLED": True,
+        "ADMISSION_INITIAL_LIMIT": 1,
+        "ADMISSION_MIN_LIMIT": 1,
+        "ADMISSION_QUEUE_SIZE": 0,
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+
+
+def test_ingest_resumes_without_duplicates(tmp_path, fake_llm):
+    catalog = tmp_path / "catalog.csv"
+    catalog.write_text(
+        "product_name,brand_name,category,description\n"
+        + "".join(f"Product {i},Acme,Sport,Useful product {i}\n" for i in range(6))
+    )
+    output, checkpoint = tmp_path / "ads.jsonl", tmp_path / "ads.checkpoint"
+    defaults = {"ad_type": "social_media", "ad_tone": "friendly"}
+
+    counts = asyncio.run(ingest(catalog, output, checkpoint, concurrency=4, defaults=defaults))
+    assert counts == {"completed": 6, "failed": 0, "skipped": 0}
+    assert sorted(record["row"] for record in _records(output)) == list(range(6))
+
+    # Simulate a crash: the checkpoint only covers the first three records
+    lines = output.read_bytes().splitlines(keepends=True)
+    state = Checkpoint(checkpoint)
+    state.next_row, state.completed = 0, set()
+    for line in lines[:3]:
+        state.mark_done(json.loads(line)["row"])
+    state.save(output_offset=sum(len(line) for line in lines[:3]))
+
+    counts = asyncio.run(ingest(catalog, output, checkpoint, concurrency=4, defaults=defaults))
+    assert counts == {"completed": 0, "failed": 0, "skipped": 6}
+    assert len(_records(output)) == 6
@@ -0,0 +1,40 @@
+import asyncio
+
+import httpx
+
+from src.llm.http import SharedHTTPPool
+
+
+def test_closing_a_client_keeps_the_shared_pool_open():
+    async def run():
+        pool = SharedHTTPPool()
+        closed = []
+        original = pool._transport.aclose
+
+        async def track_close():
+            closed.append(True)
+            await original()
+
+        pool._transport.aclose = track_close
+        first, second = pool.client(), pool.client()
+        await first.aclose()
+        await second.aclose()
+        assert closed == []
+        await pool.aclose()
+        await pool.aclose()
+        assert closed == [True]
+
+    asyncio.run(run())
+
+
+def test_shared_transport_sends_through_the_pool():
+    async def run():
+        pool = SharedHTTPPool()
+        pool._transport = httpx.MockTransport(lambda request: httpx.Response(200, text=request.url.path))
+        pool.transport._transport = pool._transport
+        async with pool.client() as client:
+            response = await client.get("http://upstream/ping")
+        assert response.text == "/ping"
+        assert pool.utilization() is None  # not an httpcore pool
+
+    asyncio.run(run())
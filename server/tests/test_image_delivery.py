@@ -0,0 +1,53 @@
+import pytest
+
+from src.core.image_delivery import etag_matches, parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-9", (0, 9)),
+    ("bytes=10-", (10, 99)),
+    ("bytes=-10", (90, 99)),
+    ("bytes=-500", (0, 99)),  # suffix longer than the body
+    ("bytes=90-500", (90, 99)),  # end clamped to the body
+    ("bytes = 5 - 6", (5, 6)),
+    ("BYTES=0-0", (0, 0)),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 100) == expected
+
+
+@pytest.mark.parametrize("header", [
+    "items=0-9",
+    "bytes=0-9,20-29",  # multiple ranges are served as a full response
+    "bytes=9-0",
+    "bytes=-",
+    "bytes=a-b",
+    "bytes=0",
+    "bytes=-1-2",
+])
+def test_parse_range_ignored(header):
+    assert parse_range(header, 100) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=150-200", "bytes=-0"])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 100)
+
+
+@pytest.mark.parametrize("if_none_match, expected", [
+    (None, False),
+    ("", False),
+    ("*", True),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"xyz", "abc"', True),
+    ('"xyz"', False),
+    ('"ab"', False),
+])
+def test_etag_matches(if_none_match, expected):
+    assert etag_matches(if_none_match, '"abc"') is expected
+
+
+def test_etag_matches_weak_etag():
+    assert etag_matches('"abc"', 'W/"abc"')
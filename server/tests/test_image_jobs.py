@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.models.requests import ImageGenerationRequest
+from src.models.response import ImageResult
+from src.service import image_jobs
+from src.service.image_jobs import ImageJobStore
+
+
+REQUEST = ImageGenerationRequest(product_name="Trail shoe", brand_name="Acme", description="Light running shoe")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(image_jobs, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def store(tmp_path, clock):
+    store = ImageJobStore(str(tmp_path / "jobs.db"))
+    yield store
+    store.close()
+
+
+def _result():
+    return ImageResult(image_path="uploads/a.png", source="generated", generated=True)
+
+
+def test_only_the_lease_owner_runs_and_records_a_job(store):
+    store.create("job", REQUEST, owner="a", lease=60)
+    assert store.get("job").status == "queued"
+    assert store.get_request("job") == REQUEST
+
+    assert not store.claim("job", "b")
+    assert store.claim("job", "a")
+    assert not store.claim("job", "a")  # already running
+    assert not store.update("job", "b", "failed", error="not mine")
+    assert store.update("job", "a", "failed", error="upstream down")
+    job = store.get("job")
+    assert (job.status, job.error) == ("failed", "upstream down")
+
+
+def test_expired_leases_are_taken_over_oldest_first(store, clock):
+    store.create("first", REQUEST, owner="a", lease=60)
+    clock[0] += 1
+    store.create("second", REQUEST, owner="a", lease=60)
+    store.claim("second", "a")
+    clock[0] += 1
+    store.create("other", REQUEST, owner="b", lease=60)
+
+    assert store.take_over_expired("c", lease=60) == []
+    clock[0] += 30
+    store.renew_leases("a", lease=60)
+    clock[0] += 45  # b's lease ran out, a renewed in time
+    assert store.take_over_expired("c", lease=60) == ["other"]
+
+    clock[0] += 60
+    # The running job is reset to queued and belongs to the new owner
+    assert store.take_over_expired("c", lease=60) == ["first", "second"]
+    assert store.get("second").status == "queued"
+    assert not store.claim("second", "a")
+    assert store.claim("second", "c")
+
+
+def test_released_jobs_are_taken_over_at_once(store):
+    store.create("job", REQUEST, owner="a", lease=60)
+    store.claim("job", "a")
+    store.release("a")
+    assert store.take_over_expired("b", lease=60) == ["job"]
+
+
+def test_finished_jobs_are_deleted_after_the_retention(store, clock):
+    for job_id in ("done", "failed", "queued"):
+        store.create(job_id, REQUEST, owner="a", lease=60)
+    store.claim("done", "a")
+    store.update("done", "a", "completed", _result())
+    store.update("failed", "a", "failed", error="upstream down")
+
+    clock[0] += 100
+    store.create("recent", REQUEST, owner="a", lease=60)
+    store.update("recent", "a", "completed", _result())
+    assert store.delete_finished(older_than=50) == 2
+    assert store.get("done") is None and store.get("failed") is None
+    assert store.get("queued").status == "queued"
+    assert store.get("recent").result.image_path == "uploads/a.png"
@@ -0,0 +1,29 @@
+import pytest
+
+from src.core.image_variants import select_variant
+
+
+AVAILABLE = ["256w.webp", "512w.webp", "256w.avif", "512w.avif"]
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("image/avif,image/webp,*/*", "512w.avif"),
+    ("image/webp,*/*", "512w.webp"),
+    ("image/avif;q=0.5,image/webp", "512w.webp"),
+    ("image/avif;q=0,image/webp;q=0.8", "512w.webp"),
+    ("image/webp;q=0", None),
+    ("image/*,*/*", None),
+    ("image/png", None),
+])
+def test_select_variant_from_accept(accept, expected):
+    assert select_variant(AVAILABLE, accept=accept) == expected
+
+
+@pytest.mark.parametrize("width, expected", [(None, "512w.webp"), (100, "256w.webp"), (300, "512w.webp"), (900, "512w.webp")])
+def test_select_variant_width(width, expected):
+    assert select_variant(AVAILABLE, width, "webp") == expected
+
+
+def test_select_variant_missing_format():
+    assert select_variant(["256w.webp"], fmt="avif") is None
+    assert select_variant(["256w.webp"], accept="image/avif") is None
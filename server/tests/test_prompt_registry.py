@@ -0,0 +1,91 @@
+import asyncio
+import os
+
+import pytest
+
+from src.models.requests import AdTone, AdType
+from src.prompts.registry import PromptRegistry
+
+
+def _write(path, text, mtime=None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_builtin_prompts_cover_every_combination():
+    registry = PromptRegistry()
+    assert len(registry.list()) == len(AdType) * len(AdTone)
+    prompt = registry.get(AdType.EMAIL, AdTone.URGENT)
+    assert prompt == registry.get("email", "urgent")
+    assert "{tone_instructions}" not in prompt.text
+    assert prompt.char_length == len(prompt.text) and prompt.token_estimate >= len(prompt.text) // 4
+    assert prompt.version == PromptRegistry().get("email", "urgent").version
+
+    with pytest.raises(ValueError, match="ad type"):
+        registry.get("billboard", "urgent")
+    with pytest.raises(ValueError, match="tone"):
+        registry.get("email", "sarcastic")
+
+
+def test_directory_overrides_and_extends_templates(tmp_path):
+    _write(tmp_path / "base" / "email.txt", "Write an email. {tone_instructions}")
+    _write(tmp_path / "base" / "billboard.txt", "Write a billboard. {tone_instructions}")
+    _write(tmp_path / "tones" / "sarcastic.txt", "Be sarcastic.")
+    registry = PromptRegistry(str(tmp_path))
+
+    assert registry.get("email", "sarcastic").text == "Write an email. Be sarcastic."
+    assert registry.get("billboard", "friendly").text.startswith("Write a billboard. ")
+    assert registry.get("social_media", "urgent").text == PromptRegistry().get("social_media", "urgent").text
+    assert len(registry.list()) == (len(AdType) + 1) * (len(AdTone) + 1)
+
+
+def test_reload_picks_up_edits_and_keeps_fetched_prompts(tmp_path):
+    template = tmp_path / "base" / "email.txt"
+    _write(template, "Version one. {tone_instructions}", mtime=1000)
+    registry = PromptRegistry(str(tmp_path))
+    before = registry.get("email", "friendly")
+    assert not registry.reload_if_changed()
+
+    _write(template, "Version two. {tone_instructions}", mtime=2000)
+    assert registry.reload_if_changed()
+    after = registry.get("email", "friendly")
+    assert after.text.startswith("Version two.") and after.version != before.version
+    assert before.text.startswith("Version one.")
+
+    template.unlink()
+    assert registry.reload_if_changed()
+    assert registry.get("email", "friendly").text == PromptRegistry().get("email", "friendly").text
+
+
+def test_broken_template_keeps_the_previous_table(tmp_path):
+    template = tmp_path / "base" / "email.txt"
+    _write(template, "Good. {tone_instructions}", mtime=1000)
+    registry = PromptRegistry(str(tmp_path))
+
+    _write(template, "Broken. {unknown_placeholder}", mtime=2000)
+    assert not registry.reload_if_changed()
+    assert registry.get("email", "friendly").text.startswith("Good.")
+    assert not registry.reload_if_changed()  # not retried until the file changes again
+
+    with pytest.raises(KeyError):
+        PromptRegistry(str(tmp_path))  # a broken template fails startup
+
+
+def test_watcher_reloads_in_the_background(tmp_path):
+    template = tmp_path / "tones" / "friendly.txt"
+    _write(template, "Be nice.", mtime=1000)
+
+    async def run():
+        registry = PromptRegistry(str(tmp_path), reload_interval=0.01)
+        registry.start()
+        _write(template, "Be very nice.", mtime=2000)
+        for _ in range(100):
+            if "Be very nice." in registry.get("email", "friendly").text:
+                break
+            await asyncio.sleep(0.01)
+        await registry.stop()
+        return registry.get("email", "friendly").text
+
+    assert "Be very nice." in asyncio.run(run())
@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+import pytest
+
+from src.models.requests import AdTone, AdType
+from src.utils.rate_limit import MemoryRateLimiter, RateLimit, _take, client_key, parse_networks, request_cost
+
+
+LIMIT = RateLimit(capacity=10, window=10.0)  # one token per second
+
+
+def test_take_from_full_bucket():
+    decision, tokens = _take(10, 0.0, 0.0, LIMIT)
+    assert decision.allowed and decision.remaining == 9 and decision.retry_after == 0
+    assert tokens == 9
+
+
+def test_take_refills_over_time():
+    decision, tokens = _take(0, 0.0, 2.5, LIMIT)
+    assert decision.allowed
+    assert tokens == pytest.approx(1.5)
+
+
+def test_refill_is_capped_at_capacity():
+    _, tokens = _take(5, 0.0, 3600.0, LIMIT)
+    assert tokens == 9
+
+
+def test_empty_bucket_reports_retry_after():
+    decision, tokens = _take(0.25, 0.0, 0.0, LIMIT)
+    assert not decision.allowed
+    assert decision.retry_after == pytest.approx(0.75)
+    assert tokens == 0.25  # a rejected request takes nothing
+
+
+def test_take_with_cost():
+    decision, tokens = _take(10, 0.0, 0.0, LIMIT, cost=4)
+    assert decision.allowed and tokens == 6
+    decision, _ = _take(3, 0.0, 0.0, LIMIT, cost=4)
+    assert not decision.allowed
+    assert decision.retry_after == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize("path, body, expected", [
+    ("/api/v1/generate", b'{"product_name": "x"}', 1),
+    ("/api/v1/generate-batch", json.dumps([{}, {}, {}]).encode(), 3),
+    ("/api/v1/generate-batch", b"[]", 1),
+    ("/api/v1/generate-variants", json.dumps({"variants": [{}, {}]}).encode(), 2),
+    ("/api/v1/generate-variants", json.dumps({"variants": "all"}).encode(), len(AdType) * len(AdTone)),
+    ("/api/v1/generate-variants", b"{}", 1),
+    ("/api/v1/generate-batch", b"not json", 1),
+    ("/api/v1/generate-variants", b'"all"', 1),
+])
+def test_request_cost(path, body, expected):
+    assert request_cost(path, body) == expected
+
+
+def _scope(peer, forwarded=None):
+    headers = [(b"x-forwarded-for", value.encode()) for value in forwarded or []]
+    return {"client": (peer, 51234), "headers": headers}
+
+
+def test_client_key_trusts_forwarded_for_only_from_proxies():
+    proxies = parse_networks(["10.0.0.0/8", "::1"])
+    assert client_key(_scope("203.0.113.7", ["198.51.100.1"]), proxies) == "ip:203.0.113.7"
+    assert client_key(_scope("10.0.0.2", ["198.51.100.1"])) == "ip:10.0.0.2"
+    assert client_key(_scope("10.0.0.2", ["198.51.100.1"]), proxies) == "ip:198.51.100.1"
+    # Spoofed entries left of the last untrusted hop are ignored; proxy hops are skipped
+    assert client_key(_scope("10.0.0.2", ["1.1.1.1, 198.51.100.1, 10.0.0.9"]), proxies) == "ip:198.51.100.1"
+    assert client_key(_scope("::1", ["1.1.1.1", "198.51.100.1"]), proxies) == "ip:198.51.100.1"
+    assert client_key(_scope("10.0.0.2"), proxies) == "ip:10.0.0.2"
+    assert client_key({"headers": []}, proxies) == "ip:unknown"
+
+
+def test_memory_limiter_evicts_least_recently_used_buckets():
+    async def run():
+        limiter = MemoryRateLimiter(max_keys=2)
+        limit = RateLimit(capacity=1, window=3600.0)
+        assert (await limiter.acquire("a", limit)).allowed
+        assert (await limiter.acquire("b", limit)).allowed
+        assert not (await limiter.acquire("a", limit)).allowed  # "a" is now the most recently used
+        await limiter.acquire("c", limit)
+        assert list(limiter._buckets) == ["a", "c"]
+        assert not (await limiter.acquire("a", limit)).allowed
+
+    asyncio.run(run())
@@ -0,0 +1,149 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+
+from src.llm.resilience import AttemptBudget, LatencyTracker, ResilientCaller, UpstreamError, classify_error
+
+
+def _status_error(status, headers=None):
+    response = httpx.Response(status, headers=headers, request=httpx.Request("POST", "http://upstream/v1/chat"))
+    return openai.APIStatusError("upstream error", response=response, body=None)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record backoff delays instead of waiting them out"""
+    delays = []
+    original = asyncio.sleep
+
+    async def fake_sleep(delay, *args, **kwargs):
+        delays.append(delay)
+        await original(0)
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+    return delays
+
+
+def _caller(**overrides):
+    options = dict(max_retries=2, base_delay=0.25, max_delay=4.0, hedge_enabled=False, attempt_budget=10)
+    return ResilientCaller("test", **{**options, **overrides})
+
+
+def _flaky(errors, result="ok"):
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    return fn, calls
+
+
+def test_classify_error():
+    assert classify_error(_status_error(503)) == (True, None)
+    assert classify_error(_status_error(429, {"retry-after": "2"})) == (True, 2.0)
+    assert classify_error(_status_error(400)) == (False, None)
+    assert classify_error(TimeoutError()) == (True, None)
+    assert classify_error(openai.APIConnectionError(request=httpx.Request("POST", "http://upstream"))) == (True, None)
+    assert classify_error(UpstreamError("bad request", 400)) == (False, None)
+    assert classify_error(UpstreamError("unavailable", 503, retryable=True)) == (True, None)
+    assert classify_error(ValueError("bug")) == (False, None)
+
+
+def test_retries_retryable_errors_with_backoff(sleeps):
+    fn, calls = _flaky([TimeoutError(), _status_error(502)])
+    assert asyncio.run(_caller().call(fn)) == "ok"
+    assert len(calls) == 3
+    assert len(sleeps) == 2 and 0 <= sleeps[0] <= 0.25 and 0 <= sleeps[1] <= 0.5
+
+
+def test_honours_retry_after_capped_by_max_delay(sleeps):
+    fn, _ = _flaky([_status_error(429, {"retry-after": "1.5"}), _status_error(429, {"retry-after": "60"})])
+    assert asyncio.run(_caller().call(fn)) == "ok"
+    assert sleeps == [1.5, 4.0]
+
+
+def test_does_not_retry_client_errors(sleeps):
+    fn, calls = _flaky([_status_error(400)])
+    with pytest.raises(openai.APIStatusError):
+        asyncio.run(_caller().call(fn))
+    assert len(calls) == 1 and sleeps == []
+
+
+def test_gives_up_after_max_retries_or_budget(sleeps):
+    fn, calls = _flaky([TimeoutError()] * 5)
+    with pytest.raises(TimeoutError):
+        asyncio.run(_caller(max_retries=2).call(fn))
+    assert len(calls) == 3
+
+    fn, calls = _flaky([TimeoutError()] * 5)
+    with pytest.raises(TimeoutError):
+        asyncio.run(_caller(max_retries=5, attempt_budget=2).call(fn))
+    assert len(calls) == 2
+
+
+def test_budget_and_latency_tracker():
+    budget = AttemptBudget(2)
+    assert [budget.take() for _ in range(3)] == [True, True, False]
+
+    tracker = LatencyTracker(window=100)
+    assert tracker.percentile(0.5) is None
+    for ms in range(100):
+        tracker.observe(ms / 1000)
+    assert tracker.percentile(0.5) == pytest.approx(0.05)
+    assert tracker.percentile(1.0) == pytest.approx(0.099)
+
+
+def _hedging_caller(**overrides):
+    caller = _caller(hedge_enabled=True, hedge_percentile=0.95, hedge_min_delay=0.01, **overrides)
+    for _ in range(20):
+        caller.latency.observe(0.01)
+    return caller
+
+
+def _slow_then_fast():
+    calls, cancelled = [], []
+
+    async def fn():
+        calls.append(1)
+        if len(calls) == 1:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+            return "primary"
+        return "hedge"
+
+    return fn, calls, cancelled
+
+
+def test_hedge_wins_and_cancels_the_slow_call():
+    caller = _hedging_caller()
+    assert caller.hedge_delay() == pytest.approx(0.01)
+    fn, calls, cancelled = _slow_then_fast()
+
+    async def run():
+        result = await caller.call(fn)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run()) == "hedge"
+    assert len(calls) == 2 and cancelled == [1]
+
+
+def test_no_hedge_without_budget_latency_data_or_when_disabled_per_call():
+    async def first_finishes(caller, hedge=True):
+        fn, calls, _ = _slow_then_fast()
+        task = asyncio.create_task(caller.call(fn, hedge=hedge))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        return len(calls)
+
+    assert asyncio.run(first_finishes(_hedging_caller(attempt_budget=1))) == 1
+    assert asyncio.run(first_finishes(_hedging_caller(), hedge=False)) == 1
+    assert asyncio.run(first_finishes(_caller(hedge_enabled=True, hedge_min_delay=0.01))) == 1  # no samples yet
@@ -0,0 +1,98 @@
+import asyncio
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+from src.core import response_cache
+from src.core.response_cache import DiskResponseCache, MemoryResponseCache, TieredResponseCache, make_cache_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache, "time", SimpleNamespace(monotonic=lambda: now[0], time=lambda: now[0]))
+    return now
+
+
+def _rows(path):
+    with sqlite3.connect(path) as conn:
+        return sorted(row[0] for row in conn.execute("SELECT key FROM responses"))
+
+
+def test_cache_key_covers_model_prompts_and_sampling():
+    key = make_cache_key("m", "system", "product", 1.0, 1000)
+    assert key == make_cache_key("m", "system", "product", 1.0, 1000)
+    assert len({
+        key,
+        make_cache_key("other", "system", "product", 1.0, 1000),
+        make_cache_key("m", "system 2", "product", 1.0, 1000),
+        make_cache_key("m", "system", "product 2", 1.0, 1000),
+        make_cache_key("m", "system", "product", 0.5, 1000),
+        make_cache_key("m", "system", "product", 1.0, 500),
+        make_cache_key("m", "system", "product", 1.0, 1000, extra="seed"),
+    }) == 7
+
+
+def test_memory_cache_evicts_least_recently_used_and_expires(clock):
+    async def run():
+        cache = MemoryResponseCache(max_entries=2, ttl=60)
+        await cache.set("a", "1")
+        await cache.set("b", "2")
+        assert await cache.get("a") == "1"  # "b" is now the least recently used
+        await cache.set("c", "3")
+        assert await cache.get("b") is None
+        assert await cache.get("a") == "1" and await cache.get("c") == "3"
+
+        clock[0] += 61
+        assert await cache.get("a") is None
+        assert cache.stats() == {"hits": 3, "misses": 2, "entries": 1}
+
+    asyncio.run(run())
+
+
+def test_disk_cache_survives_restarts_and_prunes_on_write(tmp_path, clock):
+    path = str(tmp_path / "responses.db")
+
+    async def run():
+        cache = DiskResponseCache(path, ttl=60, prune_interval=30)
+        await cache.set("old", "1")
+        assert await DiskResponseCache(path, ttl=60).get("old") == "1"
+
+        clock[0] += 61
+        assert await cache.get("old") is None  # expired rows are never served
+        await cache.set("new", "2")
+        assert _rows(path) == ["new"]
+
+        clock[0] += 10
+        await cache.set("newer", "3")  # within the prune interval
+        clock[0] += 55
+        await cache.set("latest", "4")
+        assert _rows(path) == ["latest", "newer"]
+
+    asyncio.run(run())
+
+
+def test_tiered_cache_promotes_disk_hits(tmp_path, clock):
+    async def run():
+        disk = DiskResponseCache(str(tmp_path / "responses.db"), ttl=60)
+        await disk.set("key", "ad")
+        cache = TieredResponseCache(MemoryResponseCache(max_entries=8, ttl=60), disk)
+        assert await cache.get("key") == "ad"
+        assert await cache.memory.get("key") == "ad"
+        assert await cache.get("missing") is None
+        assert cache.stats()["disk_hits"] == 1
+
+    asyncio.run(run())
+
+
+def test_tiered_cache_survives_disk_errors(tmp_path):
+    async def run():
+        disk = DiskResponseCache(str(tmp_path / "responses.db"), ttl=60)
+        cache = TieredResponseCache(MemoryResponseCache(max_entries=8, ttl=60), disk)
+        disk._conn.close()
+        await cache.set("key", "ad")  # memory tier still written
+        assert await cache.get("key") == "ad"
+        assert await cache.get("missing") is None
+
+    asyncio.run(run())
@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+
+from src.config.settings import LLMBackendConfig
+from src.llm import router
+from src.llm.base import BaseLLMClient
+from src.llm.fake import FakeLLMClient
+from src.llm.resilience import UpstreamError
+from src.llm.router import Backend, CircuitBreaker, LLMRouter, build_backend
+
+
+class ScriptedClient(BaseLLMClient):
+    """LLM client that answers with its name, or raises the next scripted error"""
+
+    def __init__(self, name: str, errors=()) -> None:
+        self.model_name = f"{name}-model"
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def generate_text(self, system, data_product, max_tokens=1000, temperature=1.0, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.model_name
+
+    async def generate_text_streaming(self, system, data_product, max_tokens=1000, temperature=1.0, stream=True, **kwargs):
+        yield await self.generate_text(system, data_product)
+
+    async def health_check(self):
+        return True
+
+    def generate_image(self):
+        pass
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(router, "monotonic", lambda: now[0])
+    return now
+
+
+def _generate(llm):
+    return asyncio.run(llm.generate_text("system", "product_name: test"))
+
+
+def test_fails_over_on_backend_errors():
+    for error in (UpstreamError("unavailable", 503, retryable=True), UpstreamError("bad key", 401)):
+        primary = Backend("primary", ScriptedClient("primary", [error]))
+        backup = Backend("backup", ScriptedClient("backup"))
+        backup.latency_ewma = 10.0  # the primary is always picked first
+        llm = LLMRouter([primary, backup])
+
+        async def run():
+            return await llm.generate_text("system", "product_name: test"), llm.served_model()
+
+        assert asyncio.run(run()) == ("backup-model", "backup-model")
+        assert primary.breaker.failures == 1 and primary.error_ewma > 0
+
+
+def test_client_errors_do_not_fail_over():
+    primary = Backend("primary", ScriptedClient("primary", [UpstreamError("bad request", 400)]))
+    backup = Backend("backup", ScriptedClient("backup"))
+    backup.latency_ewma = 10.0
+    with pytest.raises(UpstreamError, match="bad request"):
+        _generate(LLMRouter([primary, backup]))
+    assert backup.client.calls == 0
+    assert primary.breaker.failures == 0
+
+
+def test_stream_fails_over_before_the_first_token():
+    primary = Backend("primary", ScriptedClient("primary", [UpstreamError("unavailable", 503, retryable=True)]))
+    backup = Backend("backup", ScriptedClient("backup"))
+    backup.latency_ewma = 10.0
+    llm = LLMRouter([primary, backup])
+
+    async def collect():
+        return [chunk async for chunk in llm.generate_text_streaming("system", "product_name: test")]
+
+    assert asyncio.run(collect()) == ["backup-model"]
+
+
+def test_breaker_opens_then_lets_one_probe_through(clock):
+    breaker = CircuitBreaker(failure_threshold=2, recovery_time=30.0)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.available() and not breaker.allow()
+
+    clock[0] += 30.0
+    assert breaker.available()
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()  # only one probe at a time
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    clock[0] += 30.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+
+
+def test_open_backends_are_skipped(clock):
+    primary = Backend("primary", ScriptedClient("primary"))
+    backup = Backend("backup", ScriptedClient("backup"))
+    for _ in range(primary.breaker.failure_threshold):
+        primary.record_failure()
+    llm = LLMRouter([primary, backup])
+    assert all(_generate(llm) == "backup-model" for _ in range(5))
+    assert primary.client.calls == 0
+
+    for backend in (primary, backup):
+        for _ in range(backend.breaker.failure_threshold):
+            backend.record_failure()
+    with pytest.raises(UpstreamError, match="No LLM backend available"):
+        _generate(llm)
+
+
+def test_picks_the_backend_with_the_lower_latency_and_error_ewma():
+    fast = Backend("fast", ScriptedClient("fast"), alpha=0.5)
+    slow = Backend("slow", ScriptedClient("slow"), alpha=0.5)
+    fast.record_success(0.2)
+    slow.record_success(1.0)
+    llm = LLMRouter([slow, fast])
+    assert all(llm._candidates() == [fast, slow] for _ in range(10))
+
+    slow.record_success(2.0)
+    assert slow.latency_ewma == pytest.approx(1.5)
+
+    # Errors inflate the score until the slower backend wins
+    fast.record_failure()
+    fast.record_failure()
+    assert fast.score() > slow.score()
+    assert llm._candidates() == [slow, fast]
+    assert _generate(llm) == "slow-model"
+
+
+def test_build_backend_fake_provider():
+    backend = build_backend(LLMBackendConfig(name="offline", provider="fake", model_name="fake-a", weight=2))
+    assert isinstance(backend.client, FakeLLMClient)
+    assert (backend.client.model_name, backend.client.provider, backend.weight) == ("fake-a", "offline", 2)
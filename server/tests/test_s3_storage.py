@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+import httpx
+import pytest
+
+from src.core.storage import S3Storage, StorageError, shard
+from src.utils.sigv4 import sign_request
+
+
+ACCESS_KEY, SECRET_KEY, REGION = "test-access", "test-secret", "eu-west-1"
+NAME = "a" * 64 + ".png"
+VARIANT = "a" * 64 + "_256w.webp"
+OTHER = "b" * 64 + ".png"
+
+
+class FakeS3:
+    """In-memory S3 stand-in: checks SigV4 signatures and serves path-style object and ListObjectsV2 requests"""
+
+    def __init__(self, bucket: str, page_size: int = 2) -> None:
+        self.bucket = bucket
+        self.page_size = page_size
+        self.objects = {}
+        self.requests = []
+
+    def _check_signature(self, request: httpx.Request) -> None:
+        authorization = request.headers["authorization"]
+        signed_names = authorization.split("SignedHeaders=", 1)[1].split(",", 1)[0].split(";")
+        headers = {name: request.headers[name] for name in signed_names if name not in ("host", "x-amz-date", "x-amz-content-sha256")}
+        payload_hash = request.headers["x-amz-content-sha256"]
+        if request.method == "PUT":
+            assert payload_hash == hashlib.sha256(request.content).hexdigest()
+        now = datetime.strptime(request.headers["x-amz-date"], "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+        expected = sign_request(request.method, str(request.url), headers, payload_hash,
+                                ACCESS_KEY, SECRET_KEY, REGION, now=now)
+        assert authorization == expected["authorization"]
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self._check_signature(request)
+        self.requests.append((request.method, request.url.path))
+        bucket, _, key = unquote(urlsplit(str(request.url)).path).lstrip("/").partition("/")
+        assert bucket == self.bucket
+        if not key:
+            return self._list(parse_qs(request.url.query.decode()))
+        if request.method == "PUT":
+            etag = f'"{hashlib.md5(request.content).hexdigest()}"'
+            self.objects[key] = (request.content, request.headers["content-type"], etag, datetime.now(timezone.utc))
+            return httpx.Response(200, headers={"etag": etag})
+        if request.method == "DELETE":
+            self.objects.pop(key, None)
+            return httpx.Response(204)
+        if key not in self.objects:
+            return httpx.Response(404, text="<Error><Code>NoSuchKey</Code></Error>")
+        data, content_type, etag, modified = self.objects[key]
+        headers = {"etag": etag, "content-type": content_type, "last-modified": format_datetime(modified, usegmt=True)}
+        if request.method == "HEAD":
+            return httpx.Response(200, headers={**headers, "content-length": str(len(data))})
+        return httpx.Response(200, content=data, headers=headers)
+
+    def _list(self, query) -> httpx.Response:
+        assert query["list-type"] == ["2"]
+        prefix = query.get("prefix", [""])[0]
+        keys = sorted(key for key in self.objects if key.startswith(prefix))
+        start = int(query.get("continuation-token", ["0"])[0])
+        page = keys[start:start + self.page_size]
+        truncated = start + self.page_size < len(keys)
+        contents = "".join(
+            f"<Contents><Key>{escape(key)}</Key><Size>{len(self.objects[key][0])}</Size>"
+            f"<ETag>{escape(self.objects[key][2])}</ETag>"
+            f"<LastModified>{self.objects[key][3].strftime('%Y-%m-%dT%H:%M:%S.000Z')}</LastModified></Contents>"
+            for key in page
+        )
+        token = f"<NextContinuationToken>{start + self.page_size}</NextContinuationToken>" if truncated else ""
+        body = (
+            '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+            f"<IsTruncated>{'true' if truncated else 'false'}</IsTruncated>{token}{contents}</ListBucketResult>"
+        )
+        return httpx.Response(200, content=body.encode(), headers={"content-type": "application/xml"})
+
+
+@pytest.fixture
+def s3():
+    fake = FakeS3("images")
+    storage = S3Storage("images", ACCESS_KEY, SECRET_KEY, REGION, endpoint_url="http://s3.local:9000", prefix="gen/")
+    storage.client = httpx.AsyncClient(transport=httpx.MockTransport(fake))
+    return storage, fake
+
+
+def test_object_lifecycle(s3):
+    storage, fake = s3
+
+    async def run():
+        assert await storage.stat(NAME) is None
+        assert await storage.read(NAME) is None
+        await storage.write(NAME, b"png-bytes", "image/png")
+        assert fake.objects[f"gen/{shard(NAME)}"][:2] == (b"png-bytes", "image/png")
+
+        stored = await storage.stat(NAME)
+        assert (stored.name, stored.size) == (NAME, 9)
+        assert stored.etag == f'"{hashlib.md5(b"png-bytes").hexdigest()}"'
+        assert stored.last_modified > 0
+        assert await storage.read(NAME) == b"png-bytes"
+        assert b"".join([chunk async for chunk in storage.stream(NAME, chunk_size=4)]) == b"png-bytes"
+
+        await storage.delete(NAME)
+        await storage.delete(NAME)  # deleting a missing object is not an error
+        assert await storage.stat(NAME) is None
+
+    asyncio.run(run())
+
+
+def test_list_pages_and_filters_by_prefix(s3):
+    storage, _ = s3
+
+    async def run():
+        for name in (NAME, VARIANT, OTHER):
+            await storage.write(name, name.encode(), "application/octet-stream")
+        listed = await storage.list()
+        assert sorted(obj.name for obj in listed) == sorted([NAME, VARIANT, OTHER])
+        assert {obj.name: obj.size for obj in listed}[NAME] == len(NAME)
+        assert sorted(obj.name for obj in await storage.list("a" * 64)) == sorted([NAME, VARIANT])
+        assert await storage.list("c" * 64) == []
+
+    asyncio.run(run())
+
+
+def test_errors_raise_storage_error(s3):
+    storage, _ = s3
+    storage.client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(403, text="denied")))
+
+    async def run():
+        with pytest.raises(StorageError, match="HTTP 403"):
+            await storage.write(NAME, b"x", "image/png")
+        with pytest.raises(StorageError):
+            await storage.read(NAME)
+
+    asyncio.run(run())
+
+
+def test_urls():
+    storage = S3Storage("images", ACCESS_KEY, SECRET_KEY, REGION, endpoint_url="http://s3.local:9000", prefix="gen/")
+    url = urlsplit(storage.url(NAME))
+    assert url.path == f"/images/gen/{shard(NAME)}"
+    assert "X-Amz-Signature=" in url.query and "X-Amz-Expires=3600" in url.query
+
+    public = S3Storage("images", ACCESS_KEY, SECRET_KEY, REGION, public_url="https://cdn.example.com/", prefix="gen/")
+    assert public.url(NAME) == f"https://cdn.example.com/gen/{shard(NAME)}"
@@ -0,0 +1,192 @@
+import asyncio
+import gc
+
+import pytest
+
+from src.llm.single_flight import SingleFlight, StreamFanout, make_flight_key
+
+
+def test_flight_key_ignores_parameter_order():
+    assert make_flight_key(model="m", temperature=1.0) == make_flight_key(temperature=1.0, model="m")
+    assert make_flight_key(model="m", temperature=1.0) != make_flight_key(model="m", temperature=0.5)
+
+
+def test_identical_calls_share_one_upstream_call():
+    async def run():
+        flight = SingleFlight()
+        calls = []
+
+        async def upstream():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "ad"
+
+        results = await asyncio.gather(*(flight.do("key", upstream) for _ in range(5)))
+        assert results == ["ad"] * 5 and len(calls) == 1 and len(flight) == 0
+        # Once finished, the next call goes upstream again
+        assert await flight.do("key", upstream) == "ad" and len(calls) == 2
+
+    asyncio.run(run())
+
+
+def test_errors_reach_every_waiter():
+    async def run():
+        flight = SingleFlight()
+
+        async def upstream():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream down")
+
+        results = await asyncio.gather(*(flight.do("key", upstream) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_call():
+    async def run():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def upstream():
+            await release.wait()
+            return "ad"
+
+        leaving = asyncio.create_task(flight.do("key", upstream))
+        staying = asyncio.create_task(flight.do("key", upstream))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        release.set()
+        assert await staying == "ad"
+        assert leaving.cancelled()
+
+    asyncio.run(run())
+
+
+def test_error_after_every_waiter_left_is_retrieved():
+    unretrieved = []
+
+    async def run():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unretrieved.append(context))
+        flight = SingleFlight()
+
+        async def upstream():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream down")
+
+        waiter = asyncio.create_task(flight.do("key", upstream))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0.05)
+        gc.collect()
+
+    asyncio.run(run())
+    gc.collect()
+    assert unretrieved == []
+
+
+async def _upstream(chunks, started, delay=0.0):
+    started.append(1)
+    for chunk in chunks:
+        await asyncio.sleep(delay)
+        yield chunk
+
+
+async def _collect(stream):
+    return [chunk async for chunk in stream]
+
+
+def test_fanout_shares_one_stream_and_replays_for_late_joiners():
+    async def run():
+        fanout = StreamFanout()
+        started = []
+        release = asyncio.Event()
+
+        async def upstream():
+            started.append(1)
+            yield "a"
+            await release.wait()
+            yield "b"
+            yield "c"
+
+        first = fanout.subscribe("key", upstream)
+        assert await anext(first) == "a"
+        late = asyncio.create_task(_collect(fanout.subscribe("key", upstream)))
+        await asyncio.sleep(0)
+        release.set()
+        assert await _collect(first) == ["b", "c"]
+        assert await late == ["a", "b", "c"]
+        assert started == [1]
+
+    asyncio.run(run())
+
+
+def test_fanout_propagates_upstream_errors():
+    async def run():
+        fanout = StreamFanout()
+
+        async def failing():
+            yield "a"
+            raise ValueError("upstream down")
+
+        results = await asyncio.gather(
+            *(_collect(fanout.subscribe("key", failing)) for _ in range(2)), return_exceptions=True
+        )
+        assert all(isinstance(result, ValueError) for result in results)
+
+    asyncio.run(run())
+
+
+def test_last_subscriber_leaving_cancels_the_upstream_and_detaches_the_key():
+    async def run():
+        fanout = StreamFanout()
+        started, cancelled = [], []
+
+        async def endless():
+            started.append(1)
+            try:
+                while True:
+                    yield "x"
+                    await asyncio.sleep(0.001)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+
+        stream = fanout.subscribe("key", endless)
+        assert await anext(stream) == "x"
+        await stream.aclose()
+        # The key is gone before the pump has processed its cancellation
+        assert fanout._streams == {}
+
+        # A request arriving right away starts a fresh upstream instead of inheriting the cancellation
+        fresh = fanout.subscribe("key", lambda: _upstream(["y"], started))
+        assert await _collect(fresh) == ["y"]
+        assert started == [1, 1] and cancelled == [1]
+
+    asyncio.run(run())
+
+
+def test_one_subscriber_leaving_keeps_the_stream_for_the_others():
+    async def run():
+        fanout = StreamFanout()
+        started = []
+        factory = lambda: _upstream(["a", "b", "c"], started, delay=0.001)
+
+        leaving = fanout.subscribe("key", factory)
+        staying = asyncio.create_task(_collect(fanout.subscribe("key", factory)))
+        assert await anext(leaving) == "a"
+        await leaving.aclose()
+        assert await staying == ["a", "b", "c"]
+        assert started == [1]
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("chunks", [[], ["only"]])
+def test_short_streams(chunks):
+    async def run():
+        fanout = StreamFanout()
+        assert await _collect(fanout.subscribe("key", lambda: _upstream(chunks, []))) == chunks
+        assert fanout._streams == {}
+
+    asyncio.run(run())
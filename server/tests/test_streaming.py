@@ -0,0 +1,77 @@
+import asyncio
+
+from src.utils.streaming import coalesce_stream
+
+
+def _chunk(content, progress=None):
+    chunk = {"status": "streaming", "content": content}
+    if progress is not None:
+        chunk["progress"] = progress
+    return chunk
+
+
+async def _source(items):
+    """Yield chunks, sleeping for any float in `items` to emulate a quiet upstream"""
+    for item in items:
+        if isinstance(item, float):
+            await asyncio.sleep(item)
+        else:
+            yield item
+
+
+def _coalesce(items, max_bytes=1000, max_delay=10.0):
+    async def run():
+        return [chunk async for chunk in coalesce_stream(_source(items), max_bytes, max_delay)]
+
+    return asyncio.run(run())
+
+
+def test_merges_chunks_and_flushes_before_other_statuses():
+    processing = {"status": "processing", "message": "Generating..."}
+    completed = {"status": "completed", "ad_content": "Hello world"}
+    result = _coalesce([processing, _chunk("Hel", 10), _chunk("lo ", 20), _chunk("world", 30), completed])
+    assert result == [processing, {"status": "streaming", "content": "Hello world", "progress": 30}, completed]
+
+
+def test_flushes_when_the_buffer_is_full():
+    result = _coalesce([_chunk("ab"), _chunk("cd"), _chunk("ef"), _chunk("g")], max_bytes=4)
+    assert [chunk["content"] for chunk in result] == ["abcd", "efg"]
+    assert "progress" not in result[0]
+
+
+def test_flushes_after_max_delay_while_upstream_is_quiet():
+    result = _coalesce([_chunk("a"), _chunk("b"), 0.2, _chunk("c"), {"status": "completed"}], max_delay=0.05)
+    assert result == [
+        {"status": "streaming", "content": "ab"},
+        {"status": "streaming", "content": "c"},
+        {"status": "completed"},
+    ]
+
+
+def test_passes_errors_through_after_flushing():
+    error = {"status": "error", "message": "upstream down"}
+    assert _coalesce([_chunk("partial"), error]) == [{"status": "streaming", "content": "partial"}, error]
+    assert _coalesce([]) == []
+
+
+def test_closing_the_stream_cancels_the_pending_read():
+    cancelled = []
+
+    async def endless():
+        yield _chunk("a")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+        yield _chunk("never")
+
+    async def run():
+        stream = coalesce_stream(endless(), max_bytes=1000, max_delay=0.01)
+        first = await anext(stream)
+        await stream.aclose()
+        await asyncio.sleep(0)
+        return first
+
+    assert asyncio.run(run()) == {"status": "streaming", "content": "a"}
+    assert cancelled == [1]